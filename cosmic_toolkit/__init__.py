@@ -1,14 +1,67 @@
-from cosmic_toolkit.message_bus import MessageBus
-from cosmic_toolkit.models import AggregateRoot, DefaultJSONSerializer, Entity, Event
-from cosmic_toolkit.repository import AbstractRepository
-from cosmic_toolkit.unit_of_work import BaseUnitOfWork
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
+# Submodules are imported on first use of their attributes (PEP 562) to keep
+# `import cosmic_toolkit` cheap for short-lived processes. E.g. pydantic is only
+# imported once models are used
+_EXPORTS = {
+    "AbstractRepository": "cosmic_toolkit.repository",
+    "AbstractSessionProvider": "cosmic_toolkit.session",
+    "AggregateRoot": "cosmic_toolkit.models",
+    "BaseUnitOfWork": "cosmic_toolkit.unit_of_work",
+    "Container": "cosmic_toolkit.dependencies",
+    "DefaultJSONSerializer": "cosmic_toolkit.models",
+    "Entity": "cosmic_toolkit.models",
+    "Event": "cosmic_toolkit.models",
+    "LightweightEvent": "cosmic_toolkit.events",
+    "MessageBus": "cosmic_toolkit.message_bus",
+    "SessionPool": "cosmic_toolkit.session",
+    "UnitOfWorkPool": "cosmic_toolkit.unit_of_work",
+}
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.dependencies import Container
+    from cosmic_toolkit.events import LightweightEvent
+    from cosmic_toolkit.message_bus import MessageBus
+    from cosmic_toolkit.models import (
+        AggregateRoot,
+        DefaultJSONSerializer,
+        Entity,
+        Event,
+    )
+    from cosmic_toolkit.repository import AbstractRepository
+    from cosmic_toolkit.session import AbstractSessionProvider, SessionPool
+    from cosmic_toolkit.unit_of_work import BaseUnitOfWork, UnitOfWorkPool
 
 __all__ = [
     "AggregateRoot",
     "AbstractRepository",
+    "AbstractSessionProvider",
     "BaseUnitOfWork",
+    "Container",
     "DefaultJSONSerializer",
     "Entity",
     "Event",
+    "LightweightEvent",
     "MessageBus",
+    "SessionPool",
+    "UnitOfWorkPool",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(module), name)
+
+    # Cache so __getattr__() isn't called again for this attribute
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,195 @@
+from time import monotonic
+from typing import TYPE_CHECKING, Dict, Hashable, Iterable, List, Optional
+
+from cosmic_toolkit.idempotency import IdempotencyKey, create_key_function
+from cosmic_toolkit.types import NormalDict
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+# Limits
+CYCLE = "cycle"
+DEPTH = "depth"
+DURATION = "duration"
+EVENTS = "events"
+
+
+class CascadeLimitExceeded(RuntimeError):
+    def __init__(self, limit: str, maximum: Optional[float], chain: List["Event"]):
+        """Raised when a cascade exceeds a limit of its CascadeBudget. chain holds the
+        events from the root event to the offending event"""
+        path = " -> ".join(event.__class__.__name__ for event in chain)
+
+        if limit == CYCLE:
+            message = f"Cascade cycle detected: {path}"
+        else:
+            message = f"Cascade {limit} limit of {maximum} exceeded: {path}"
+
+        super().__init__(message)
+
+        self.chain = chain
+        self.limit = limit
+        self.maximum = maximum
+
+
+class _Link:
+    """An event in a cascade and the event that published it"""
+
+    __slots__ = ("depth", "event", "key", "parent")
+
+    def __init__(
+        self,
+        event: "Event",
+        parent: Optional["_Link"],
+        key: Optional[Hashable],
+    ):
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.event = event
+        self.key = key
+        self.parent = parent
+
+    def chain(self) -> List["Event"]:
+        events = []
+        link = self
+
+        while link is not None:
+            events.append(link.event)
+            link = link.parent
+
+        events.reverse()
+
+        return events
+
+
+class CascadeBudget:
+    def __init__(
+        self,
+        max_depth: Optional[int] = None,
+        max_events: Optional[int] = None,
+        max_duration: Optional[float] = None,
+        aggregate_key: Optional[IdempotencyKey] = None,
+        near_limit: float = 0.8,
+    ):
+        """Limits for a cascade: how deep the chain of events published by handlers
+        can get, how many events it can handle and for how many seconds it can run
+        (checked between events, unlike MessageBus' cascade_timeout). If
+        aggregate_key (an event field name or a function) is given, an event with the
+        same type and aggregate as one of the events that led to it is a cycle.
+
+        Cascades that exceed a limit raise CascadeLimitExceeded. Cascades that use at
+        least the near_limit fraction of a limit are counted in near_limit"""
+        self.max_depth = max_depth
+        self.max_duration = max_duration
+        self.max_events = max_events
+        self.near_limit_ratio = near_limit
+
+        self._get_aggregate_key = (
+            create_key_function(aggregate_key) if aggregate_key is not None else None
+        )
+
+        self.cascades = 0
+        self.exceeded: Dict[str, int] = {CYCLE: 0, DEPTH: 0, DURATION: 0, EVENTS: 0}
+        self.max_depth_seen = 0
+        self.max_duration_seen = 0.0
+        self.max_events_seen = 0
+        self.max_usage = 0.0
+        self.near_limit = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__}, max_depth={self.max_depth}, "
+            f"max_events={self.max_events}, max_duration={self.max_duration}>"
+        )
+
+    def track(self, event: "Event") -> "CascadeTracker":
+        return CascadeTracker(self, event)
+
+    def dict(self) -> NormalDict:
+        return {
+            "cascades": self.cascades,
+            "exceeded": dict(self.exceeded),
+            "near_limit": self.near_limit,
+            "max_depth_seen": self.max_depth_seen,
+            "max_events_seen": self.max_events_seen,
+            "max_duration_seen": self.max_duration_seen,
+            "max_usage": self.max_usage,
+        }
+
+    def _get_key(self, event: "Event") -> Optional[Hashable]:
+        if self._get_aggregate_key is None:
+            return None
+
+        aggregate = self._get_aggregate_key(event)
+
+        return (event.__class__, aggregate) if aggregate is not None else None
+
+
+class CascadeTracker:
+    """Usage of a CascadeBudget by a single cascade"""
+
+    __slots__ = ("budget", "depth", "events", "exceeded", "links", "started_at")
+
+    def __init__(self, budget: CascadeBudget, event: "Event"):
+        self.budget = budget
+        self.depth = 0
+        self.events = 1
+        self.exceeded = False
+        self.links = {id(event): _Link(event, None, budget._get_key(event))}
+        self.started_at = monotonic()
+
+    def add(self, parent: "Event", events: Iterable["Event"]):
+        """Record events published while handling parent"""
+        budget = self.budget
+        parent_link = self.links.get(id(parent)) or _Link(parent, None, None)
+
+        for event in events:
+            link = _Link(event, parent_link, budget._get_key(event))
+            self.links[id(event)] = link
+            self.events += 1
+            self.depth = max(self.depth, link.depth)
+
+            if budget.max_events is not None and self.events > budget.max_events:
+                self._exceed(EVENTS, budget.max_events, link)
+            elif budget.max_depth is not None and link.depth > budget.max_depth:
+                self._exceed(DEPTH, budget.max_depth, link)
+            elif link.key is not None:
+                ancestor = link.parent
+
+                while ancestor is not None:
+                    if ancestor.key == link.key:
+                        self._exceed(CYCLE, None, link)
+
+                    ancestor = ancestor.parent
+
+        duration = monotonic() - self.started_at
+
+        if budget.max_duration is not None and duration > budget.max_duration:
+            self._exceed(DURATION, budget.max_duration, parent_link)
+
+    def finish(self):
+        budget = self.budget
+        duration = monotonic() - self.started_at
+        usage = 0.0
+
+        for value, maximum in (
+            (self.depth, budget.max_depth),
+            (self.events, budget.max_events),
+            (duration, budget.max_duration),
+        ):
+            if maximum:
+                usage = max(usage, value / maximum)
+
+        budget.cascades += 1
+        budget.max_depth_seen = max(budget.max_depth_seen, self.depth)
+        budget.max_duration_seen = max(budget.max_duration_seen, duration)
+        budget.max_events_seen = max(budget.max_events_seen, self.events)
+        budget.max_usage = max(budget.max_usage, usage)
+
+        if not self.exceeded and usage >= budget.near_limit_ratio:
+            budget.near_limit += 1
+
+    def _exceed(self, limit: str, maximum: Optional[float], link: _Link):
+        self.exceeded = True
+        self.budget.exceeded[limit] += 1
+
+        raise CascadeLimitExceeded(limit, maximum, link.chain())
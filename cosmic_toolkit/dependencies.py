@@ -0,0 +1,262 @@
+import asyncio
+from inspect import Parameter, signature
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cosmic_toolkit.utils import maybe_await
+
+# Provider lifetimes
+SINGLETON = "singleton"
+SCOPED = "scoped"
+TRANSIENT = "transient"
+
+Teardown = Callable[[Any], Any]
+
+
+class Provider:
+    def __init__(
+        self,
+        name: str,
+        factory: Callable,
+        lifetime: str,
+        teardown: Optional[Teardown] = None,
+    ):
+        if lifetime not in (SINGLETON, SCOPED, TRANSIENT):
+            raise ValueError(f"Unknown lifetime {lifetime!r}")
+
+        self.factory = factory
+        self.lifetime = lifetime
+        self.name = name
+        self.teardown = teardown
+
+        # Factories can depend on other providers and on the bus' dependencies,
+        # which are resolved by parameter name
+        self.dependency_names: Tuple[str, ...] = tuple(
+            name
+            for name, param in signature(factory).parameters.items()
+            if param.kind in (Parameter.POSITIONAL_OR_KEYWORD, Parameter.KEYWORD_ONLY)
+        )
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, name={self.name!r}, {self.lifetime}>"
+
+
+class Container:
+    def __init__(self):
+        """Dependency container. Dependencies are created lazily, upon first use, by
+        factories which can be plain functions or coroutine functions:
+
+        - singleton dependencies are created once and shared
+        - scoped dependencies are created once per scope (MessageBus creates a scope
+          for every cascade)
+        - transient dependencies are created every time they're resolved
+
+        Singletons outlive scopes, so they can only depend on other singletons and
+        on the plain dependencies given for singletons (MessageBus gives its own
+        dependencies, not those passed to handle()).
+
+        Teardown hooks of scoped and transient dependencies run when the scope is
+        closed; teardown hooks of singletons run when the container is closed"""
+        self._providers: Dict[str, Provider] = {}
+        self._singleton_locks: Dict[str, asyncio.Lock] = {}
+        self._singletons: Dict[str, Any] = {}
+        self._teardowns: List[Tuple[Teardown, Any]] = []
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._providers
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, providers={list(self._providers)}>"
+
+    def get_provider(self, name: str) -> Optional[Provider]:
+        return self._providers.get(name)
+
+    def register(
+        self,
+        name: str,
+        factory: Callable,
+        lifetime: str,
+        teardown: Optional[Teardown] = None,
+    ):
+        """Register a provider. Providers should be registered before the container
+        is used by MessageBus since handlers' resolution plans are cached"""
+        self._providers[name] = Provider(name, factory, lifetime, teardown)
+
+    def scoped(self, name: str, factory: Callable, teardown: Optional[Teardown] = None):
+        self.register(name, factory, SCOPED, teardown)
+
+    def singleton(
+        self, name: str, factory: Callable, teardown: Optional[Teardown] = None
+    ):
+        self.register(name, factory, SINGLETON, teardown)
+
+    def transient(
+        self, name: str, factory: Callable, teardown: Optional[Teardown] = None
+    ):
+        self.register(name, factory, TRANSIENT, teardown)
+
+    def scope(
+        self,
+        dependencies: Optional[Dict[str, Any]] = None,
+        singleton_dependencies: Optional[Dict[str, Any]] = None,
+    ) -> "Scope":
+        """Create a scope. dependencies are plain values that factories can depend
+        on, and singleton_dependencies those that singleton factories can depend on"""
+        return Scope(self, dependencies or {}, singleton_dependencies or {})
+
+    async def aclose(self):
+        """Tear down singletons in reverse order of creation"""
+        teardowns, self._teardowns = self._teardowns, []
+        self._singletons.clear()
+
+        await _run_teardowns(teardowns)
+
+    def _check_singleton(self, provider: Provider, chain: Tuple[str, ...] = ()):
+        # Checked before taking locks, since a singleton that depends on itself would
+        # otherwise wait for its own lock
+        chain += (provider.name,)
+
+        for name in provider.dependency_names:
+            dependency = self._providers.get(name)
+
+            if dependency is None:
+                continue
+            elif name in chain:
+                cycle = " -> ".join(chain + (name,))
+
+                raise RuntimeError(f"Circular dependency detected: {cycle}")
+            elif dependency.lifetime != SINGLETON:
+                raise RuntimeError(
+                    f"Singleton {provider.name!r} can't depend on "
+                    f"{dependency.lifetime} {name!r}"
+                )
+
+            self._check_singleton(dependency, chain)
+
+    async def _get_singleton(
+        self, provider: Provider, dependencies: Dict[str, Any]
+    ) -> Any:
+        try:
+            return self._singletons[provider.name]
+        except KeyError:
+            pass
+
+        self._check_singleton(provider)
+
+        # Avoid creating a singleton twice if it's resolved concurrently
+        lock = self._singleton_locks.setdefault(provider.name, asyncio.Lock())
+
+        async with lock:
+            if provider.name not in self._singletons:
+                # Resolved outside of the calling scope so that the singleton doesn't
+                # capture anything that is torn down with it
+                scope = Scope(self, dependencies, dependencies)
+                instance = await scope._create(provider)
+                self._singletons[provider.name] = instance
+
+                if provider.teardown:
+                    self._teardowns.append((provider.teardown, instance))
+
+        return self._singletons[provider.name]
+
+
+class Scope:
+    def __init__(
+        self,
+        container: Container,
+        dependencies: Dict[str, Any],
+        singleton_dependencies: Optional[Dict[str, Any]] = None,
+    ):
+        self._container = container
+        self._dependencies = dependencies
+        self._singleton_dependencies = singleton_dependencies or {}
+        self._instances: Dict[str, Any] = {}
+        self._resolving: List[str] = []
+        self._teardowns: List[Tuple[Teardown, Any]] = []
+
+    async def __aenter__(self) -> "Scope":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def get_resolved(self, name: str, default: Any = None) -> Any:
+        """Return a scoped dependency if it has been resolved, without creating it"""
+        return self._instances.get(name, default)
+
+    async def resolve(self, name: str) -> Any:
+        provider = self._container.get_provider(name)
+
+        if provider is None:
+            raise KeyError(f"No provider registered for {name!r}")
+
+        return await self.resolve_provider(provider)
+
+    async def resolve_provider(self, provider: Provider) -> Any:
+        if provider.lifetime == SINGLETON:
+            return await self._container._get_singleton(
+                provider, self._singleton_dependencies
+            )
+        elif provider.lifetime == TRANSIENT:
+            instance = await self._create(provider)
+
+            if provider.teardown:
+                self._teardowns.append((provider.teardown, instance))
+
+            return instance
+
+        try:
+            return self._instances[provider.name]
+        except KeyError:
+            pass
+
+        instance = await self._create(provider)
+        self._instances[provider.name] = instance
+
+        if provider.teardown:
+            self._teardowns.append((provider.teardown, instance))
+
+        return instance
+
+    async def aclose(self):
+        """Tear down scoped and transient dependencies in reverse order of creation"""
+        teardowns, self._teardowns = self._teardowns, []
+        self._instances.clear()
+
+        await _run_teardowns(teardowns)
+
+    async def _create(self, provider: Provider) -> Any:
+        if provider.name in self._resolving:
+            chain = " -> ".join(self._resolving + [provider.name])
+
+            raise RuntimeError(f"Circular dependency detected: {chain}")
+
+        self._resolving.append(provider.name)
+
+        try:
+            kwargs = {}
+
+            for name in provider.dependency_names:
+                dependency = self._container.get_provider(name)
+
+                if dependency is not None:
+                    kwargs[name] = await self.resolve_provider(dependency)
+                elif name in self._dependencies:
+                    kwargs[name] = self._dependencies[name]
+
+            return await maybe_await(provider.factory(**kwargs))
+        finally:
+            self._resolving.pop()
+
+
+async def _run_teardowns(teardowns: List[Tuple[Teardown, Any]]):
+    # Attempt every teardown even if one fails, then raise the first error
+    error = None
+
+    for teardown, instance in reversed(teardowns):
+        try:
+            await maybe_await(teardown(instance))
+        except Exception as e:
+            error = error or e
+
+    if error:
+        raise error
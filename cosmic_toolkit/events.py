@@ -0,0 +1,188 @@
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Mapping,
+    Tuple,
+    Union,
+    get_type_hints,
+)
+
+from cosmic_toolkit.registry import event_registry
+
+_MISSING = object()
+
+
+class EventValidationError(ValueError):
+    ...
+
+
+def _is_class_var(annotation: Any) -> bool:
+    if isinstance(annotation, str):
+        return annotation.startswith(("ClassVar", "typing.ClassVar"))
+
+    return getattr(annotation, "__origin__", None) is ClassVar
+
+
+def _make_init(fields: Tuple[str, ...], defaults: Dict[str, Any]) -> Callable:
+    """Generate an __init__() with keyword-only arguments that sets slots directly,
+    bypassing __setattr__() which makes events immutable"""
+    namespace = {"_defaults": defaults, "_setattr": object.__setattr__}
+
+    if fields:
+        params = ", ".join(
+            f"{name}=_defaults[{name!r}]" if name in defaults else name
+            for name in fields
+        )
+        body = "".join(f"    _setattr(self, {name!r}, {name})\n" for name in fields)
+        source = f"def __init__(self, *, {params}):\n{body}"
+    else:
+        source = "def __init__(self):\n    pass\n"
+
+    exec(source, namespace)
+
+    return namespace["__init__"]
+
+
+def _restore(cls: type, data: Dict[str, Any]) -> "LightweightEvent":
+    return cls(**data)
+
+
+class _LightweightEventMeta(type):
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        annotations = namespace.get("__annotations__", {})
+        own_fields = tuple(
+            field
+            for field, annotation in annotations.items()
+            if not field.startswith("_") and not _is_class_var(annotation)
+        )
+
+        # Defaults can't be class attributes since they'd conflict with slots
+        defaults = {}
+
+        for field in own_fields:
+            if field in namespace:
+                defaults[field] = namespace.pop(field)
+
+        namespace["__slots__"] = own_fields
+        cls = super().__new__(mcs, name, bases, namespace, **kwargs)
+
+        inherited_fields = getattr(cls, "__fields__", ())
+        cls.__fields__ = inherited_fields + tuple(
+            f for f in own_fields if f not in inherited_fields
+        )
+        cls.__field_defaults__ = {**getattr(cls, "__field_defaults__", {}), **defaults}
+        cls.__field_types__ = None
+        cls.__init__ = _make_init(cls.__fields__, cls.__field_defaults__)
+
+        return cls
+
+
+class LightweightEvent(metaclass=_LightweightEventMeta):
+    """Event base for high volume events. Unlike Event, which is a pydantic model,
+    fields are stored in slots and aren't validated when events are created by the
+    application. Use parse_obj() to validate data that comes from outside the system.
+    Events are immutable, and thus hashable if their field values are hashable.
+
+    class TelemetryReceived(LightweightEvent):
+        message: str
+        quality: int = 100
+    """
+
+    __fields__: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Register with a discriminator, __event_type__ or the class name, for
+        # decoding (see EventRegistry)
+        event_registry.register(cls)
+
+    def __eq__(self, other: Any) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+
+        return self._values() == other._values()
+
+    def __hash__(self) -> int:
+        return hash((self.__class__, self._values()))
+
+    def __reduce__(self):
+        return _restore, (self.__class__, self.dict())
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__fields__)
+
+        return f"{self.__class__.__name__}({fields})"
+
+    def __setattr__(self, name: str, value: Any):
+        raise TypeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name: str):
+        raise TypeError(f"{self.__class__.__name__} is immutable")
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, f) for f in self.__fields__)
+
+    def copy(self, **changes: Any) -> "LightweightEvent":
+        """Create a copy of the event with some fields changed"""
+        return self.__class__(**{**self.dict(), **changes})
+
+    def dict(self) -> Dict[str, Any]:
+        return {f: getattr(self, f) for f in self.__fields__}
+
+    @classmethod
+    def trusted(cls, **data: Any) -> "LightweightEvent":
+        """Create an event from trusted data. Same as calling the class, for parity
+        with Event.trusted()"""
+        return cls(**data)
+
+    @classmethod
+    def parse_obj(cls, data: Mapping[str, Any]) -> "LightweightEvent":
+        """Validate data and create an event. Checks for missing and unknown fields,
+        and checks types of fields annotated with classes, Optional/Union of classes
+        and generic containers (e.g. List[int] is checked to be a list)"""
+        if cls.__field_types__ is None:
+            hints = get_type_hints(cls)
+            cls.__field_types__ = {f: hints.get(f, Any) for f in cls.__fields__}
+
+        errors = [f"unknown field {f!r}" for f in data if f not in cls.__fields__]
+
+        for field in cls.__fields__:
+            value = data.get(field, _MISSING)
+
+            if value is _MISSING:
+                if field not in cls.__field_defaults__:
+                    errors.append(f"field {field!r} is required")
+            elif not _check_type(value, cls.__field_types__[field]):
+                errors.append(
+                    f"field {field!r} expects {cls.__field_types__[field]}, "
+                    f"got {type(value).__name__}"
+                )
+
+        if errors:
+            raise EventValidationError(f"{cls.__name__}: {'; '.join(errors)}")
+
+        return cls(**data)
+
+
+def _check_type(value: Any, annotation: Any) -> bool:
+    if annotation is Any:
+        return True
+    elif isinstance(annotation, type):
+        # Like pydantic, accept ints for floats
+        if annotation is float:
+            return isinstance(value, (int, float))
+
+        return isinstance(value, annotation)
+
+    origin = getattr(annotation, "__origin__", None)
+
+    if origin is Union:
+        return any(_check_type(value, arg) for arg in annotation.__args__)
+    elif isinstance(origin, type):
+        return isinstance(value, origin)
+
+    # Annotations that can't be checked cheaply are accepted
+    return True
@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Hashable, Optional, Union
+
+from cosmic_toolkit.types import NormalDict
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+# Name of an event field, or a function that returns an event's key. Events whose key
+# is None aren't deduplicated
+IdempotencyKey = Union[str, Callable[["Event"], Optional[Hashable]]]
+
+
+def create_key_function(
+    key: IdempotencyKey,
+) -> Callable[["Event"], Optional[Hashable]]:
+    if not isinstance(key, str):
+        return key
+
+    def get_key(event: "Event") -> Optional[Hashable]:
+        return getattr(event, key, None)
+
+    return get_key
+
+
+class DedupIndex:
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = monotonic,
+    ):
+        """Keys seen within the last ttl seconds (or forever if ttl is None). Holds up
+        to max_size keys, evicting the least recently seen"""
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+
+        self.evicted = 0
+        self.expired = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self._entries.get(key)
+
+        return expires_at is not None and expires_at > self._clock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__}, size={len(self._entries)}, "
+            f"max_size={self._max_size}, ttl={self._ttl}>"
+        )
+
+    def check(self, key: Hashable) -> bool:
+        """Record key. Returns True if it's a duplicate, i.e. it was already seen"""
+        now = self._clock()
+        entries = self._entries
+        expires_at = entries.get(key)
+
+        if expires_at is not None:
+            if expires_at > now:
+                self.hits += 1
+                entries.move_to_end(key)
+
+                return True
+
+            self.expired += 1
+            del entries[key]
+
+        self.misses += 1
+        entries[key] = now + self._ttl if self._ttl is not None else float("inf")
+
+        # Expired keys are removed from the front, i.e. least recently seen, so
+        # that the index doesn't hold on to stale keys until it's full
+        while entries:
+            oldest, oldest_expires_at = next(iter(entries.items()))
+
+            if len(entries) > self._max_size:
+                self.evicted += 1
+            elif oldest_expires_at <= now:
+                self.expired += 1
+            else:
+                break
+
+            del entries[oldest]
+
+        return False
+
+    def discard(self, key: Hashable):
+        """Forget key, e.g. if handling its event failed and it should be handled
+        when it's delivered again"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def dict(self) -> NormalDict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
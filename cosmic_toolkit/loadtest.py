@@ -0,0 +1,612 @@
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import random
+import sys
+import tracemalloc
+from functools import partial
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from cosmic_toolkit.events import LightweightEvent
+from cosmic_toolkit.message_bus import MessageBus
+from cosmic_toolkit.models import AggregateRoot
+from cosmic_toolkit.repository import AbstractRepository
+from cosmic_toolkit.types import NormalDict
+from cosmic_toolkit.unit_of_work import BaseUnitOfWork, UnitOfWorkPool
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Returns a handler latency, in seconds, using the load test's random generator
+Distribution = Callable[[random.Random], float]
+
+# Creates the bus under test from a handlers map and a Unit of Work factory
+BusFactory = Callable[[Dict[type, List[Callable]], UnitOfWorkPool], MessageBus]
+
+
+def constant(value: float) -> Distribution:
+    return lambda rng: value
+
+
+def uniform(low: float, high: float) -> Distribution:
+    return lambda rng: rng.uniform(low, high)
+
+
+def exponential(mean: float) -> Distribution:
+    return lambda rng: rng.expovariate(1 / mean)
+
+
+def lognormal(median: float, sigma: float) -> Distribution:
+    """Long tailed latencies, typical of I/O"""
+    mu = math.log(median)
+
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+_DISTRIBUTIONS = {
+    "constant": constant,
+    "uniform": uniform,
+    "exp": exponential,
+    "lognormal": lognormal,
+}
+
+
+def parse_distribution(text: str) -> Distribution:
+    """Parse a distribution such as 0.001, uniform:0.001:0.005, exp:0.002 or
+    lognormal:0.001:0.5"""
+    name, *args = text.split(":")
+
+    if name not in _DISTRIBUTIONS:
+        return constant(float(name))
+
+    return _DISTRIBUTIONS[name](*map(float, args))
+
+
+class SyntheticEvent(LightweightEvent):
+    aggregate_id: int
+    depth: int = 0
+
+
+class EventSpec:
+    def __init__(
+        self,
+        name: str,
+        weight: float = 1.0,
+        fan_out: int = 0,
+        child: Optional[str] = None,
+        latency: Distribution = constant(0),
+        handlers: int = 1,
+    ):
+        """Event type of a workload. weight is its share of the events that are
+        generated. Handling an event cascades fan_out events of type child (by
+        default, the same type) until the workload's max_depth. Each of the type's
+        handlers waits for latency, then updates an aggregate"""
+        self.name = name
+        self.weight = weight
+        self.fan_out = fan_out
+        self.child = child
+        self.latency = latency
+        self.handlers = handlers
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, name={self.name!r}>"
+
+    @classmethod
+    def parse(cls, text: str) -> "EventSpec":
+        """Parse a spec such as created,weight=3,fan_out=2,child=updated,
+        latency=exp:0.001,handlers=2"""
+        name, *options = text.split(",")
+        kwargs: Dict[str, Any] = {}
+
+        for option in options:
+            key, _, value = option.partition("=")
+
+            if key == "latency":
+                kwargs[key] = parse_distribution(value)
+            elif key == "child":
+                kwargs[key] = value
+            elif key in ("fan_out", "handlers"):
+                kwargs[key] = int(value)
+            elif key == "weight":
+                kwargs[key] = float(value)
+            else:
+                raise ValueError(f"Unknown event spec option {key!r}")
+
+        return cls(name, **kwargs)
+
+
+class Workload:
+    def __init__(
+        self,
+        events: Sequence[EventSpec],
+        duration: float = 10.0,
+        rate: Optional[float] = None,
+        concurrency: int = 16,
+        aggregates: int = 1000,
+        max_depth: int = 3,
+        seed: Optional[int] = None,
+    ):
+        """Events are generated at rate events per second (open loop, so latencies
+        include time spent queued when the bus can't keep up) or, if rate is None,
+        as fast as concurrency workers handle them. Events are spread over
+        aggregates aggregate ids"""
+        if not events:
+            raise ValueError("Workload requires at least one event spec")
+
+        names = {spec.name for spec in events}
+
+        for spec in events:
+            if spec.child is not None and spec.child not in names:
+                raise ValueError(f"Unknown child event type {spec.child!r}")
+
+        self.events = list(events)
+        self.duration = duration
+        self.rate = rate
+        self.concurrency = concurrency
+        self.aggregates = aggregates
+        self.max_depth = max_depth
+        self.seed = seed
+
+
+class Tally(AggregateRoot):
+    def __init__(self, id: int):
+        super().__init__()
+
+        self.id = id
+        self.count = 0
+
+    def record(self, events: List[SyntheticEvent]):
+        self.count += 1
+
+        for event in events:
+            self._add_event(event)
+
+
+class TallyRepository(AbstractRepository, entity_type=Tally):
+    def __init__(self, store: Dict[int, Tally]):
+        """In-memory repository. store is shared by units of work"""
+        super().__init__()
+
+        self._store = store
+
+    async def _add(self, entity: Tally):
+        self._store[entity.id] = entity
+
+    async def _get(self, id: int) -> Tally:
+        try:
+            return self._store[id]
+        except KeyError:
+            tally = self._store[id] = Tally(id)
+
+            return tally
+
+    async def _update(self, entity: Tally):
+        self._store[entity.id] = entity
+
+
+class LoadTestUnitOfWork(BaseUnitOfWork, tallies=TallyRepository):
+    async def commit(self):
+        ...
+
+    async def rollback(self):
+        ...
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values, q between 0 and 100"""
+    if not values:
+        return 0.0
+
+    rank = math.ceil(q * len(values) / 100)
+
+    return values[max(rank, 1) - 1]
+
+
+class LatencySummary:
+    def __init__(self, latencies: Sequence[float]):
+        """Percentiles of cascade latencies, in seconds"""
+        latencies = sorted(latencies)
+
+        self.count = len(latencies)
+        self.mean = sum(latencies) / self.count if latencies else 0.0
+        self.p50 = percentile(latencies, 50)
+        self.p99 = percentile(latencies, 99)
+        self.p999 = percentile(latencies, 99.9)
+        self.max = latencies[-1] if latencies else 0.0
+
+    def dict(self) -> NormalDict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.p50,
+            "p99": self.p99,
+            "p999": self.p999,
+            "max": self.max,
+        }
+
+
+class Sample:
+    __slots__ = ("elapsed", "completed", "throughput", "queued", "in_flight", "memory")
+
+    def __init__(
+        self,
+        elapsed: float,
+        completed: int,
+        throughput: float,
+        queued: int,
+        in_flight: int,
+        memory: int,
+    ):
+        """Load test state at elapsed seconds. throughput is cascades per second
+        since the previous sample and memory is in bytes"""
+        self.elapsed = elapsed
+        self.completed = completed
+        self.throughput = throughput
+        self.queued = queued
+        self.in_flight = in_flight
+        self.memory = memory
+
+    def dict(self) -> NormalDict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class LoadTestReport:
+    def __init__(
+        self,
+        duration: float,
+        completed: int,
+        failed: int,
+        handled: int,
+        backlog: int,
+        latency: LatencySummary,
+        samples: List[Sample],
+    ):
+        self.duration = duration
+        self.completed = completed
+        self.failed = failed
+        self.handled = handled
+        self.backlog = backlog
+        self.latency = latency
+        self.samples = samples
+
+    @property
+    def throughput(self) -> float:
+        """Cascades completed per second"""
+        return self.completed / self.duration if self.duration else 0.0
+
+    @property
+    def event_throughput(self) -> float:
+        """Events handled per second, including cascaded events"""
+        return self.handled / self.duration if self.duration else 0.0
+
+    def dict(self) -> NormalDict:
+        return {
+            "duration": self.duration,
+            "completed": self.completed,
+            "failed": self.failed,
+            "handled": self.handled,
+            "backlog": self.backlog,
+            "throughput": self.throughput,
+            "event_throughput": self.event_throughput,
+            "latency": self.latency.dict(),
+            "samples": [sample.dict() for sample in self.samples],
+        }
+
+    def format(self) -> str:
+        latency = self.latency
+        lines = [
+            f"cascades: {self.completed} completed, {self.failed} failed, "
+            f"{self.backlog} queued at the end",
+            f"throughput: {self.throughput:.1f} cascades/s, "
+            f"{self.event_throughput:.1f} events/s",
+            f"latency (ms): p50={latency.p50 * 1000:.3f} p99={latency.p99 * 1000:.3f} "
+            f"p999={latency.p999 * 1000:.3f} max={latency.max * 1000:.3f}",
+            "",
+            f"{'elapsed':>8} {'cascades/s':>11} {'queued':>8} {'in flight':>9} "
+            f"{'memory MB':>10}",
+        ]
+
+        for sample in self.samples:
+            lines.append(
+                f"{sample.elapsed:>8.1f} {sample.throughput:>11.1f} "
+                f"{sample.queued:>8} {sample.in_flight:>9} "
+                f"{sample.memory / 1_000_000:>10.1f}"
+            )
+
+        return "\n".join(lines)
+
+
+def create_bus(
+    handlers: Dict[type, List[Callable]], unit_of_work_factory: UnitOfWorkPool
+) -> MessageBus:
+    """Default bus factory"""
+    return MessageBus(handlers, unit_of_work_factory=unit_of_work_factory)
+
+
+def _memory_usage() -> int:
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+
+    if resource is None:
+        return 0
+
+    # Resident set size. Falls back to the peak where /proc isn't available
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class LoadTest:
+    def __init__(
+        self,
+        workload: Workload,
+        bus_factory: BusFactory = create_bus,
+        interval: float = 1.0,
+        trace_memory: bool = False,
+    ):
+        """Drives a synthetic workload through a bus created by bus_factory, to size
+        deployments and compare bus configurations (see also python -m
+        cosmic_toolkit.loadtest --help). Samples throughput, queue depth and memory
+        every interval seconds. If trace_memory is True, memory is measured with
+        tracemalloc (Python allocations only, and slower) rather than the resident
+        set size"""
+        self._workload = workload
+        self._interval = interval
+        self._trace_memory = trace_memory
+        self._rng = random.Random(workload.seed)
+
+        self._event_types = {
+            spec.name: type(
+                spec.name,
+                (SyntheticEvent,),
+                {"__event_type__": f"loadtest.{spec.name}", "__module__": __name__},
+            )
+            for spec in workload.events
+        }
+        self._store: Dict[int, Tally] = {}
+        self._bus = bus_factory(
+            self._create_handlers(),
+            UnitOfWorkPool(partial(LoadTestUnitOfWork, self._store)),
+        )
+
+        self._completed = 0
+        self._failed = 0
+        self._handled = 0
+        self._in_flight = 0
+        self._latencies: List[float] = []
+        self._samples: List[Sample] = []
+
+    @property
+    def bus(self) -> MessageBus:
+        return self._bus
+
+    def _create_handlers(self) -> Dict[type, List[Callable]]:
+        handlers = {}
+
+        for spec in self._workload.events:
+            child_type = self._event_types[spec.child or spec.name]
+            handlers[self._event_types[spec.name]] = [
+                self._create_handler(spec, child_type if i == 0 else None)
+                for i in range(spec.handlers)
+            ]
+
+        return handlers
+
+    def _create_handler(self, spec: EventSpec, child_type: Optional[type]) -> Callable:
+        fan_out = spec.fan_out if child_type is not None else 0
+        latency = spec.latency
+        max_depth = self._workload.max_depth
+        rng = self._rng
+
+        async def handle_synthetic_event(event: SyntheticEvent, uow: BaseUnitOfWork):
+            self._handled += 1
+            delay = latency(rng)
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if event.depth < max_depth:
+                depth = event.depth + 1
+                children = [
+                    child_type(aggregate_id=event.aggregate_id, depth=depth)
+                    for _ in range(fan_out)
+                ]
+            else:
+                children = []
+
+            async with uow:
+                tally = await uow.tallies.get(event.aggregate_id)
+                tally.record(children)
+
+                await uow.tallies.update(tally)
+                await uow.commit()
+
+        return handle_synthetic_event
+
+    def _create_event(self) -> SyntheticEvent:
+        specs = self._workload.events
+        spec = self._rng.choices(specs, weights=[s.weight for s in specs])[0]
+
+        return self._event_types[spec.name](
+            aggregate_id=self._rng.randrange(self._workload.aggregates)
+        )
+
+    async def _generate(self, queue: asyncio.Queue, started_at: float):
+        rate = self._workload.rate
+        ends_at = started_at + self._workload.duration
+
+        if rate is None:
+            while monotonic() < ends_at:
+                await queue.put((monotonic(), self._create_event()))
+
+            return
+
+        # Events are scheduled at fixed times, so latencies include the time an
+        # event waits when the bus falls behind
+        sent = 0
+
+        while True:
+            now = monotonic()
+
+            if now >= ends_at:
+                return
+
+            due = int((now - started_at) * rate) + 1
+
+            while sent < due:
+                queue.put_nowait((started_at + sent / rate, self._create_event()))
+                sent += 1
+
+            await asyncio.sleep(min(1 / rate, ends_at - now))
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            scheduled_at, event = await queue.get()
+            self._in_flight += 1
+
+            try:
+                await self._bus.handle(event)
+            except Exception:
+                self._failed += 1
+            else:
+                self._completed += 1
+                self._latencies.append(monotonic() - scheduled_at)
+            finally:
+                self._in_flight -= 1
+                queue.task_done()
+
+    def _take_sample(self, started_at: float, queue: asyncio.Queue, previous: Sample):
+        now = monotonic()
+        elapsed = now - started_at
+        completed = self._completed
+        interval = elapsed - previous.elapsed
+        sample = Sample(
+            elapsed,
+            completed,
+            (completed - previous.completed) / interval if interval else 0.0,
+            queue.qsize(),
+            self._in_flight,
+            _memory_usage(),
+        )
+        self._samples.append(sample)
+
+        return sample
+
+    async def _sample(self, queue: asyncio.Queue, started_at: float):
+        sample = Sample(0.0, 0, 0.0, 0, 0, _memory_usage())
+
+        while True:
+            await asyncio.sleep(self._interval)
+            sample = self._take_sample(started_at, queue, sample)
+
+    async def run(self) -> LoadTestReport:
+        workload = self._workload
+        started_tracing = self._trace_memory and not tracemalloc.is_tracing()
+
+        if started_tracing:
+            tracemalloc.start()
+
+        # Without a rate, a bounded queue keeps generation in step with handling
+        queue: asyncio.Queue = asyncio.Queue(
+            workload.concurrency if workload.rate is None else 0
+        )
+        started_at = monotonic()
+        tasks = [
+            asyncio.ensure_future(self._work(queue))
+            for _ in range(workload.concurrency)
+        ]
+        tasks.append(asyncio.ensure_future(self._sample(queue, started_at)))
+
+        try:
+            await self._generate(queue, started_at)
+        finally:
+            duration = monotonic() - started_at
+
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            if started_tracing:
+                tracemalloc.stop()
+
+        return LoadTestReport(
+            duration,
+            self._completed,
+            self._failed,
+            self._handled,
+            queue.qsize(),
+            LatencySummary(self._latencies),
+            self._samples,
+        )
+
+
+def _load_bus_factory(path: str) -> BusFactory:
+    module, _, name = path.partition(":")
+
+    return getattr(importlib.import_module(module), name)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m cosmic_toolkit.loadtest",
+        description="Drive a synthetic workload through MessageBus",
+    )
+    parser.add_argument(
+        "--event",
+        action="append",
+        dest="events",
+        metavar="SPEC",
+        help="event type, e.g. created,weight=3,fan_out=2,child=updated,"
+        "latency=exp:0.001,handlers=2 (repeat for a mix). Latencies are seconds: "
+        "0.001, uniform:LOW:HIGH, exp:MEAN or lognormal:MEDIAN:SIGMA",
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument(
+        "--rate", type=float, help="events per second (default: as fast as possible)"
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--aggregates", type=int, default=1000)
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--interval", type=float, default=1.0, help="sample interval")
+    parser.add_argument(
+        "--bus",
+        metavar="MODULE:FUNCTION",
+        help="bus factory called with handlers and a Unit of Work factory",
+    )
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    args = parser.parse_args(argv)
+
+    workload = Workload(
+        [EventSpec.parse(spec) for spec in args.events or ["event"]],
+        duration=args.duration,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        aggregates=args.aggregates,
+        max_depth=args.max_depth,
+        seed=args.seed,
+    )
+    load_test = LoadTest(
+        workload,
+        _load_bus_factory(args.bus) if args.bus else create_bus,
+        interval=args.interval,
+        trace_memory=args.trace_memory,
+    )
+    report = asyncio.run(load_test.run())
+
+    print(json.dumps(report.dict(), indent=2) if args.json else report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import asyncio
+from collections import Counter, deque
+from time import monotonic
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+
+from cosmic_toolkit.types import NormalDict
+
+
+class LockTimeoutError(asyncio.TimeoutError):
+    def __init__(self, keys: Tuple[Hashable, ...], timeout: float):
+        super().__init__(f"Timed out after {timeout}s acquiring locks {list(keys)}")
+
+        self.keys = keys
+        self.timeout = timeout
+
+
+class DeadlockError(RuntimeError):
+    def __init__(self, key: Hashable, cycle: List[Hashable]):
+        """Raised in the task whose wait would complete a cycle of tasks waiting for
+        each other's locks. cycle holds the keys of the cycle, starting with key"""
+        super().__init__(
+            f"Deadlock acquiring lock {key!r}: {' -> '.join(map(repr, cycle))}"
+        )
+
+        self.cycle = cycle
+        self.key = key
+
+
+class _KeyLock:
+    """Owner and waiters of a key's lock"""
+
+    __slots__ = ("count", "owner", "waiters")
+
+    def __init__(self, owner: asyncio.Task):
+        # Number of times the owner has acquired the lock (locks are reentrant)
+        self.count = 1
+        self.owner = owner
+        self.waiters: Deque[Tuple[asyncio.Task, asyncio.Future]] = deque()
+
+
+class LockManager:
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        detect_deadlocks: bool = True,
+    ):
+        """Async locks by key (e.g. aggregate id) to serialize handlers that contend
+        for the same aggregates, where optimistic retries would be wasteful. Locks
+        are owned by tasks and reentrant, and are discarded once they're neither
+        held nor waited for, so any number of keys can be used. timeout is the
+        default acquire timeout in seconds.
+
+        Keys acquired together are acquired in a consistent order, so lock() calls
+        can't deadlock each other. Tasks that acquire more keys while holding locks
+        still can; if detect_deadlocks is True, the task whose wait would complete a
+        cycle gets DeadlockError instead"""
+        self._detect_deadlocks = detect_deadlocks
+        self._locks: Dict[Hashable, _KeyLock] = {}
+        self._timeout = timeout
+
+        # Key that each waiting task waits for, to detect deadlocks
+        self._waiting: Dict[asyncio.Task, Hashable] = {}
+
+        self.acquired = 0
+        self.contended = 0
+
+        # Number of times each key had to be waited for
+        self.contended_keys: Counter = Counter()
+        self.deadlocks = 0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self.total_wait = 0.0
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, locks={len(self._locks)}>"
+
+    def lock(self, *keys: Hashable, timeout: Optional[float] = None) -> "_Locked":
+        """Async context manager that holds the locks of keys"""
+        return _Locked(self, keys, timeout)
+
+    def locked(self, key: Hashable) -> bool:
+        return key in self._locks
+
+    async def acquire(self, *keys: Hashable, timeout: Optional[float] = None):
+        """Acquire the locks of keys, in a consistent order, waiting up to timeout
+        seconds for all of them. Raises LockTimeoutError or DeadlockError, in which
+        case none of the locks are held"""
+        timeout = self._timeout if timeout is None else timeout
+        deadline = None if timeout is None else monotonic() + timeout
+        task = asyncio.current_task()
+        acquired = []
+
+        try:
+            for key in _order(keys):
+                remaining = None if deadline is None else deadline - monotonic()
+                await self._acquire(task, key, remaining)
+                acquired.append(key)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._release(task, acquired)
+
+            raise LockTimeoutError(keys, timeout) from None
+        except BaseException:
+            self._release(task, acquired)
+
+            raise
+
+    def release(self, *keys: Hashable):
+        """Release locks of keys that are held by the current task"""
+        self._release(asyncio.current_task(), list(dict.fromkeys(keys)))
+
+    async def _acquire(
+        self, task: asyncio.Task, key: Hashable, timeout: Optional[float]
+    ):
+        lock = self._locks.get(key)
+
+        if lock is None:
+            self._locks[key] = _KeyLock(task)
+            self.acquired += 1
+
+            return
+        elif lock.owner is task:
+            lock.count += 1
+
+            return
+
+        if self._detect_deadlocks:
+            self._check_deadlock(task, key)
+
+        self.contended += 1
+        self.contended_keys[key] += 1
+
+        future = asyncio.get_event_loop().create_future()
+        lock.waiters.append((task, future))
+        self._waiting[task] = key
+        started_at = monotonic()
+
+        try:
+            if timeout is not None and timeout <= 0:
+                raise asyncio.TimeoutError()
+
+            await asyncio.wait_for(future, timeout)
+        except BaseException:
+            # The lock may have been handed over just as the wait was cancelled
+            if future.done() and not future.cancelled():
+                self._release(task, [key])
+            else:
+                future.cancel()
+                lock.waiters = deque(w for w in lock.waiters if w[1] is not future)
+
+            raise
+        finally:
+            del self._waiting[task]
+
+            waited = monotonic() - started_at
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+        self.acquired += 1
+
+    def _check_deadlock(self, task: asyncio.Task, key: Hashable):
+        # Follow the chain of owners and the keys they wait for. If it leads back to
+        # this task, waiting would deadlock
+        cycle = [key]
+        owner = self._locks[key].owner
+
+        while owner in self._waiting:
+            waited_key = self._waiting[owner]
+            waited_lock = self._locks.get(waited_key)
+
+            if waited_lock is None:
+                return
+
+            cycle.append(waited_key)
+            owner = waited_lock.owner
+
+            if owner is task:
+                self.deadlocks += 1
+
+                raise DeadlockError(key, cycle)
+
+    def _release(self, task: asyncio.Task, keys):
+        for key in keys:
+            lock = self._locks.get(key)
+
+            if lock is None or lock.owner is not task:
+                raise RuntimeError(f"Lock {key!r} isn't held by the current task")
+
+            lock.count -= 1
+
+            if lock.count:
+                continue
+
+            # Hand the lock over to the next waiter that's still waiting
+            while lock.waiters:
+                waiter, future = lock.waiters.popleft()
+
+                if not future.done():
+                    lock.owner = waiter
+                    lock.count = 1
+                    future.set_result(None)
+                    break
+            else:
+                del self._locks[key]
+
+    def dict(self) -> NormalDict:
+        return {
+            "locks": len(self._locks),
+            "waiting": len(self._waiting),
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "timeouts": self.timeouts,
+            "deadlocks": self.deadlocks,
+            "total_wait": self.total_wait,
+            "max_wait": self.max_wait,
+            "most_contended": self.contended_keys.most_common(10),
+        }
+
+
+class _Locked:
+    __slots__ = ("keys", "manager", "timeout")
+
+    def __init__(
+        self,
+        manager: LockManager,
+        keys: Tuple[Hashable, ...],
+        timeout: Optional[float],
+    ):
+        self.keys = keys
+        self.manager = manager
+        self.timeout = timeout
+
+    async def __aenter__(self):
+        await self.manager.acquire(*self.keys, timeout=self.timeout)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.manager.release(*self.keys)
+
+
+def _order(keys: Tuple[Hashable, ...]) -> List[Hashable]:
+    # Any consistent total order prevents deadlocks between multi-key acquisitions;
+    # sort by type first since keys of different types may not be comparable
+    unique = list(dict.fromkeys(keys))
+
+    try:
+        return sorted(unique, key=lambda k: (type(k).__name__, k))
+    except TypeError:
+        return sorted(unique, key=lambda k: (type(k).__name__, repr(k)))
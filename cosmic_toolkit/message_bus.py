@@ -1,22 +1,148 @@
+import asyncio
 import logging
+from collections import deque
 from functools import lru_cache
-from inspect import Parameter, signature
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+from heapq import heappop, heappush
+from inspect import Parameter, isawaitable, signature
+from itertools import count
+from time import monotonic
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
-from cosmic_toolkit.models import Event
+from cosmic_toolkit.budget import CascadeBudget, CascadeTracker
+from cosmic_toolkit.dependencies import Container, Provider, Scope
+from cosmic_toolkit.idempotency import DedupIndex, IdempotencyKey, create_key_function
+from cosmic_toolkit.middleware import (
+    CascadeCall,
+    HandlerCall,
+    Middleware,
+    compose_cascade,
+    compose_handler,
+)
+from cosmic_toolkit.rate_limiting import RateLimiter
+from cosmic_toolkit.retry import DeadLetter, DeadLetterStore, RetryPolicy
+from cosmic_toolkit.scheduling import AsyncEventQueue, EventScheduler
+from cosmic_toolkit.streaming import Consumer, ConsumeStats, Source
+from cosmic_toolkit.utils import maybe_await
+
+# Imported for type checking only so that importing the bus doesn't import pydantic
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+    from cosmic_toolkit.transport import AbstractTransport
+    from cosmic_toolkit.unit_of_work import BaseUnitOfWork, UnitOfWorkPool
+
+    UnitOfWorkFactory = Union[Callable[[], BaseUnitOfWork], UnitOfWorkPool]
 
 logger = logging.getLogger(__name__)
 
+# Unit of work scopes, used when MessageBus creates units of work with a factory
+CASCADE = "cascade"
+HANDLER = "handler"
+
+_KEYWORD_KINDS = (Parameter.POSITIONAL_OR_KEYWORD, Parameter.KEYWORD_ONLY)
+
+
+class HandlerTimeoutError(asyncio.TimeoutError):
+    def __init__(
+        self, handler: Callable, event: "Event", timeout: float, elapsed: float
+    ):
+        super().__init__(
+            f"{getattr(handler, '__qualname__', handler)} timed out after "
+            f"{elapsed:.3f}s handling {event!r} (timeout is {timeout}s)"
+        )
+        self.elapsed = elapsed
+        self.event = event
+        self.handler = handler
+        self.timeout = timeout
+
+
+class CascadeTimeoutError(asyncio.TimeoutError):
+    def __init__(self, event: "Event", timeout: float, elapsed: float):
+        super().__init__(
+            f"Cascade of {event!r} timed out after {elapsed:.3f}s "
+            f"(timeout is {timeout}s)"
+        )
+        self.elapsed = elapsed
+        self.event = event
+        self.timeout = timeout
+
+
+# Names of a handler's arguments paired with the container's providers for them
+ResolutionPlan = Tuple[Tuple[str, Optional[Provider]], ...]
+
+
+class _Cascade:
+    """State of a single call to MessageBus.handle()"""
+
+    __slots__ = (
+        "budget",
+        "dedup_keys",
+        "dependencies",
+        "retries",
+        "scope",
+        "unit_of_work_per_handler",
+    )
+
+    def __init__(
+        self,
+        dependencies: Dict[str, Any],
+        scope: Optional[Scope],
+        unit_of_work_per_handler: bool,
+        budget: Optional[CascadeTracker] = None,
+    ):
+        self.budget = budget
+        self.dependencies = dependencies
+        self.scope = scope
+        self.unit_of_work_per_handler = unit_of_work_per_handler
+
+        # Idempotency keys recorded during the cascade, forgotten if it fails
+        self.dedup_keys: List[Hashable] = []
+
+        # Heap of (ready at, sequence, event, handler, attempt) for failed handlers
+        self.retries: List[Tuple[float, int, "Event", Callable, int]] = []
+
 
 class MessageBus:
     def __init__(
         self,
-        handlers: Dict[Type[Event], List[Callable]],
+        handlers: Dict[Type["Event"], List[Callable]],
         ignore_missing_handlers: Optional[bool] = False,
         lru_cache_size: Optional[int] = 64,
         unit_of_work_kwarg_name: Optional[str] = "uow",
+        unit_of_work_factory: Optional["UnitOfWorkFactory"] = None,
+        unit_of_work_scope: str = CASCADE,
+        container: Optional[Container] = None,
+        priorities: Optional[Dict[Type["Event"], float]] = None,
+        priority_aging: float = 0.01,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policies: Optional[Dict[Callable, RetryPolicy]] = None,
+        default_retry_policy: Optional[RetryPolicy] = None,
+        dead_letters: Optional[DeadLetterStore] = None,
+        handler_timeouts: Optional[Dict[Callable, float]] = None,
+        default_handler_timeout: Optional[float] = None,
+        cascade_timeout: Optional[float] = None,
+        on_timeout: Optional[Callable[[asyncio.TimeoutError], Any]] = None,
+        idempotency_key: Optional[IdempotencyKey] = None,
+        dedup_index: Optional[DedupIndex] = None,
+        cascade_budget: Optional[CascadeBudget] = None,
         **dependencies,
     ):
+        if unit_of_work_scope not in (CASCADE, HANDLER):
+            raise ValueError(f"Unknown unit of work scope {unit_of_work_scope!r}")
+        elif dedup_index is not None and idempotency_key is None:
+            raise ValueError("dedup_index requires idempotency_key")
+
+        self._container = container
         self._dependencies = dependencies
         self._handlers = handlers
 
@@ -25,32 +151,122 @@ class MessageBus:
         self._ignore_missing_handlers = ignore_missing_handlers
         self._unit_of_work_kwarg_name = unit_of_work_kwarg_name
 
+        # If a factory is given, a new Unit of Work is created for every cascade
+        # (i.e. call to handle()) or for every handler call, so that concurrent
+        # cascades don't share identity state or collect each other's events
+        self._unit_of_work_factory = unit_of_work_factory
+        self._unit_of_work_pool = None
+        self._unit_of_work_scope = unit_of_work_scope
+
+        if unit_of_work_factory is not None:
+            from cosmic_toolkit.unit_of_work import UnitOfWorkPool
+
+            if isinstance(unit_of_work_factory, UnitOfWorkPool):
+                self._unit_of_work_pool = unit_of_work_factory
+
+        # If priorities are given, events queued during a cascade or in a queue
+        # created with create_queue() are handled in order of priority rather than
+        # FIFO. Priority of an event is found in priorities using its type and
+        # parents' types, falling back to the event's priority attribute (pass an
+        # empty dict to only use priority attributes)
+        self._priorities = priorities
+        self._priority_aging = priority_aging
+
+        # Rate limits per event type or handler
+        self._rate_limiter = rate_limiter
+
+        # By default, an exception raised by a handler aborts the cascade. Handlers
+        # with a retry policy are retried later in the cascade, without blocking
+        # other events, and if a dead letter store is given, events that a handler
+        # fails to handle are stored there and the cascade carries on
+        self._dead_letters = dead_letters
+        self._default_retry_policy = default_retry_policy
+        self._retry_counter = count()
+        self._retry_policies = retry_policies or {}
+
+        # Timeouts, in seconds, for handler calls and for whole cascades. Handlers
+        # that time out are cancelled (so a Unit of Work used as a context manager
+        # rolls back) and HandlerTimeoutError is raised, which is retried or
+        # dead-lettered like any other exception. on_timeout is called with
+        # HandlerTimeoutError or CascadeTimeoutError to report timeouts
+        self._cascade_timeout = cascade_timeout
+        self._default_handler_timeout = default_handler_timeout
+        self._handler_timeouts = handler_timeouts or {}
+        self._on_timeout = on_timeout
+
+        # If an idempotency key (an event field name or a function) is given, events,
+        # including events published during a cascade, whose key has already been
+        # seen are skipped. Keys recorded by a cascade that fails, and keys of events
+        # that are dropped or spilled by the rate limiter, are forgotten so that the
+        # events are handled when delivered again
+        self._dedup_index = None
+        self._get_idempotency_key = None
+
+        if idempotency_key is not None:
+            self._dedup_index = dedup_index if dedup_index is not None else DedupIndex()
+            self._get_idempotency_key = create_key_function(idempotency_key)
+
+        # Limits on cascade depth, number of events and duration, and detection of
+        # cycles. Exceeding a limit raises CascadeLimitExceeded
+        self._cascade_budget = cascade_budget
+
+        # Middleware, and handler calls and cascade call wrapped with it. Wrapping
+        # is done when middleware is registered so calls don't walk the middleware
+        self._middleware: List[Middleware] = []
+        self._cascade_call: Optional[CascadeCall] = None
+        self._handler_calls: Dict[Callable, HandlerCall] = {}
+
         # LRU caching
         self._cached_get_handlers_for_event = lru_cache(lru_cache_size)(
             self._get_handlers_for_event
         )
-        self._cached_resolve_dependencies = lru_cache(lru_cache_size)(
-            self._resolve_dependencies
+        self._cached_get_type_priority = lru_cache(lru_cache_size)(
+            self._get_type_priority
         )
+        self._cached_get_resolution_plan = lru_cache(lru_cache_size)(
+            self._get_resolution_plan
+        )
+
+    @property
+    def cascade_budget(self) -> Optional[CascadeBudget]:
+        return self._cascade_budget
+
+    @property
+    def container(self) -> Optional[Container]:
+        return self._container
+
+    @property
+    def dead_letters(self) -> Optional[DeadLetterStore]:
+        return self._dead_letters
+
+    @property
+    def dedup_index(self) -> Optional[DedupIndex]:
+        return self._dedup_index
+
+    @property
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        return self._rate_limiter
 
     @property
     def dependencies(self) -> Dict[str, Any]:
         return self._dependencies
 
-    @staticmethod
-    def _cull_dependencies(
-        parameters: Dict[str, Parameter], dependencies: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """Find arguments for a handler using signature parameters. Skips the
-        event argument since that's expected to be the first argument and is explicitly
+    def _get_resolution_plan(self, handler: Callable) -> ResolutionPlan:
+        """Find arguments for a handler using signature parameters. Skips the event
+        argument since that's expected to be the first argument and is explicitly
         passed by _handle_event()"""
-        return {
-            name: dependencies.get(name)
-            for name, param in parameters.items()
-            if name != "event"
-        }
+        plan = []
 
-    def _get_handlers_for_event(self, event_type: Type[Event]) -> List[Callable]:
+        for name, param in signature(handler).parameters.items():
+            if name == "event" or param.kind not in _KEYWORD_KINDS:
+                continue
+
+            provider = self._container.get_provider(name) if self._container else None
+            plan.append((name, provider))
+
+        return tuple(plan)
+
+    def _get_handlers_for_event(self, event_type: Type["Event"]) -> List[Callable]:
         """Return the first list of handlers found for event.
         Searches for handlers using event type and parents' types."""
 
@@ -62,21 +278,149 @@ class MessageBus:
 
         raise RuntimeError(f"No handlers found for {event_type}")
 
-    def _resolve_dependencies(
-        self, handler: Callable, **dependencies
-    ) -> Tuple[list, dict]:
-        # Combine all dependencies
-        all_provided_deps = {**self._dependencies, **dependencies}
+    def _get_type_priority(self, event_type: Type["Event"]) -> Optional[float]:
+        for klass in [event_type] + [t for t in event_type.__bases__]:
+            if klass in self._priorities:
+                return self._priorities[klass]
+
+        return None
+
+    def _get_priority(self, event: "Event") -> float:
+        priority = self._cached_get_type_priority(event.__class__)
+
+        if priority is None:
+            return getattr(event, "priority", 0)
+
+        return priority
+
+    async def _resolve_dependencies(
+        self, handler: Callable, dependencies: Dict[str, Any], scope: Optional[Scope]
+    ) -> Dict[str, Any]:
+        kwargs = {}
+
+        # Dependencies passed to the bus take precedence over the container's
+        for name, provider in self._cached_get_resolution_plan(handler):
+            if provider is None or name in dependencies:
+                kwargs[name] = dependencies.get(name)
+            else:
+                kwargs[name] = await scope.resolve_provider(provider)
+
+        return kwargs
+
+    def _create_unit_of_work(self) -> "BaseUnitOfWork":
+        if self._unit_of_work_pool is not None:
+            return self._unit_of_work_pool.acquire()
+
+        return self._unit_of_work_factory()
+
+    def _release_unit_of_work(self, uow: "BaseUnitOfWork"):
+        if self._unit_of_work_pool is not None:
+            self._unit_of_work_pool.release(uow)
+
+    async def _call_handler(
+        self,
+        handler: Callable,
+        event: "Event",
+        dependencies: Dict[str, Any],
+        scope: Optional[Scope],
+    ) -> List["Event"]:
+        logger.debug("Using %s to handle %s", handler, event)
+        kwargs = await self._resolve_dependencies(handler, dependencies, scope)
+
+        # Attempt to collect new events published by handler
+        # We need a Unit of Work dependency for this
+        # Not all use cases require UoW, so if UoW isn't in deps,
+        # it's not an issue
+        uow_name = self._unit_of_work_kwarg_name
+        uow = dependencies.get(uow_name)
+
+        # Otherwise the Unit of Work that the container gave the handler, whatever
+        # its lifetime, or one resolved earlier in the cascade
+        if uow is None:
+            uow = kwargs.get(uow_name)
+
+        if uow is None and scope is not None:
+            uow = scope.get_resolved(uow_name)
+
+        try:
+            await self._call_with_timeout(handler, event, kwargs)
+        except BaseException:
+            # Events of a failed handler mustn't be published, neither by the next
+            # handler that shares the Unit of Work nor by a retry that adds them again
+            if uow and hasattr(uow, "discard_new_events"):
+                uow.discard_new_events()
+
+            raise
+
+        if uow:
+            return list(uow.collect_new_events())
+
+        return []
+
+    async def _call_with_timeout(
+        self, handler: Callable, event: "Event", kwargs: Dict[str, Any]
+    ):
+        if self._middleware:
+            call = self._get_handler_call(handler)(event, kwargs)
+        else:
+            call = handler(event, **kwargs)
+
+        timeout = self._handler_timeouts.get(handler, self._default_handler_timeout)
+
+        if not isawaitable(call):
+            # Handler is a plain function, which has already run. Timeouts can't be
+            # applied to plain functions
+            pass
+        elif timeout is None:
+            await call
+        else:
+            start = monotonic()
+
+            try:
+                await asyncio.wait_for(call, timeout)
+            except asyncio.TimeoutError:
+                elapsed = monotonic() - start
+
+                # The handler may have raised TimeoutError itself
+                if elapsed < timeout:
+                    raise
+
+                error = HandlerTimeoutError(handler, event, timeout, elapsed)
+                await self._report_timeout(error)
+
+                raise error from None
+
+    async def _handle_event(self, event: "Event", cascade: _Cascade) -> List["Event"]:
+        key = None
+
+        if self._dedup_index is not None:
+            key = self._get_idempotency_key(event)
 
-        # Bind dependencies
-        sig = signature(handler)
-        culled_deps = self._cull_dependencies(sig.parameters, all_provided_deps)
-        bounded = sig.bind_partial(**culled_deps)
+        if key is not None:
+            key = (event.__class__, key)
 
-        # Return args + kwargs
-        return list(bounded.args), bounded.kwargs
+            if self._dedup_index.check(key):
+                logger.debug("Skipping duplicate %s", event)
 
-    async def _handle_event(self, event: Event, **dependencies) -> List[Event]:
+                return []
+
+            cascade.dedup_keys.append(key)
+
+        rate_limiter = self._rate_limiter
+
+        if rate_limiter is not None and not await rate_limiter.acquire(event):
+            # Dropped and spilled events haven't been handled
+            if key is not None:
+                self._dedup_index.discard(key)
+                cascade.dedup_keys.remove(key)
+
+            return []
+
+        return await self._handle_new_event(event, cascade)
+
+    async def _handle_new_event(
+        self, event: "Event", cascade: _Cascade
+    ) -> List["Event"]:
         events = []
         handlers = []
 
@@ -90,32 +434,356 @@ class MessageBus:
             if not self._ignore_missing_handlers:
                 raise
 
+        rate_limiter = self._rate_limiter
+
         for handler in handlers:
-            args, kwargs = self._cached_resolve_dependencies(handler, **dependencies)
+            if rate_limiter is not None:
+                if not await rate_limiter.acquire_for_handler(handler, event):
+                    continue
+
+            events.extend(await self._dispatch(handler, event, cascade))
 
-            logger.debug("Using %s to handle %s", handler, event)
-            await handler(event, *args, **kwargs)
+        return events
+
+    async def _dispatch(
+        self, handler: Callable, event: "Event", cascade: _Cascade, attempt: int = 1
+    ) -> List["Event"]:
+        """Call handler, with its own Unit of Work if units of work are scoped to
+        handlers"""
+        try:
+            if not cascade.unit_of_work_per_handler:
+                return await self._call_handler(
+                    handler, event, cascade.dependencies, cascade.scope
+                )
 
-            # Attempt to collect new events published by handler
-            # We need a Unit of Work dependency for this
-            # Not all use cases require UoW, so if UoW isn't in deps,
-            # it's not an issue
-            uow = {**self._dependencies, **dependencies}.get(
-                self._unit_of_work_kwarg_name
+            uow = self._create_unit_of_work()
+
+            try:
+                return await self._call_handler(
+                    handler,
+                    event,
+                    {**cascade.dependencies, self._unit_of_work_kwarg_name: uow},
+                    cascade.scope,
+                )
+            finally:
+                self._release_unit_of_work(uow)
+        except Exception as e:
+            if not self._handle_failure(handler, event, cascade, attempt, e):
+                raise
+
+        return []
+
+    def _handle_failure(
+        self,
+        handler: Callable,
+        event: "Event",
+        cascade: _Cascade,
+        attempt: int,
+        exception: Exception,
+    ) -> bool:
+        """Schedule a retry or dead-letter the event. Returns False if neither
+        applies, in which case the exception should be raised"""
+        policy = self._retry_policies.get(handler, self._default_retry_policy)
+
+        if policy is not None and policy.should_retry(exception, attempt):
+            delay = policy.get_delay(attempt)
+            logger.warning(
+                "%s failed to handle %s (attempt %d), retrying in %.3fs: %r",
+                handler,
+                event,
+                attempt,
+                delay,
+                exception,
+            )
+            heappush(
+                cascade.retries,
+                (
+                    monotonic() + delay,
+                    next(self._retry_counter),
+                    event,
+                    handler,
+                    attempt + 1,
+                ),
             )
 
-            if uow:
-                events.extend(uow.collect_new_events())
+            return True
+        elif self._dead_letters is not None:
+            logger.error(
+                "%s failed to handle %s after %d attempt(s): %r",
+                handler,
+                event,
+                attempt,
+                exception,
+            )
+            self._dead_letters.add(DeadLetter(event, handler, exception, attempt))
 
-        return events
+            return True
+
+        return False
+
+    def _create_cascade_queue(self) -> Union[deque, EventScheduler]:
+        if self._priorities is None:
+            return deque()
+
+        return EventScheduler(self._get_priority, self._priority_aging)
 
     def add_dependencies(self, **dependencies):
         self._dependencies.update(dependencies)
 
-    async def handle(self, event: Event, **dependencies):
-        queue = [event]
+    async def _process_queue(
+        self, queue: Union[deque, EventScheduler], cascade: _Cascade
+    ):
+        budget = cascade.budget
+        retries = cascade.retries
 
         # Domain models can publish new events which is why we use a queue here
-        while queue:
-            new_events = await self._handle_event(queue.pop(0), **dependencies)
-            queue.extend(new_events)
+        while queue or retries:
+            # Retries run once their delay has passed, queued events are handled in
+            # the meantime
+            if retries and (not queue or retries[0][0] <= monotonic()):
+                ready_at, _, event, handler, attempt = heappop(retries)
+                delay = ready_at - monotonic()
+
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                events = await self._dispatch(handler, event, cascade, attempt)
+            else:
+                event = queue.popleft()
+                events = await self._handle_event(event, cascade)
+
+            if budget is not None:
+                budget.add(event, events)
+
+            queue.extend(events)
+
+    async def _report_timeout(self, error: asyncio.TimeoutError):
+        logger.warning("%s", error)
+
+        if self._on_timeout is not None:
+            await maybe_await(self._on_timeout(error))
+
+    async def _drive_cascade(
+        self,
+        event: "Event",
+        handler: Optional[Callable],
+        queue: Union[deque, EventScheduler],
+        cascade: _Cascade,
+    ):
+        # If a handler is given, only that handler handles the first event
+        if handler is None:
+            queue.append(event)
+        else:
+            events = await self._dispatch(handler, event, cascade)
+
+            if cascade.budget is not None:
+                cascade.budget.add(event, events)
+
+            queue.extend(events)
+
+        await self._process_queue(queue, cascade)
+
+    async def _run_cascade(
+        self,
+        event: "Event",
+        handler: Optional[Callable],
+        dependencies: Dict[str, Any],
+    ):
+        uow = None
+        uow_name = self._unit_of_work_kwarg_name
+        unit_of_work_per_handler = False
+
+        # A Unit of Work passed in takes precedence over one created by the factory
+        if self._unit_of_work_factory is not None and uow_name not in dependencies:
+            if self._unit_of_work_scope == CASCADE:
+                uow = self._create_unit_of_work()
+                dependencies[uow_name] = uow
+            else:
+                unit_of_work_per_handler = True
+
+        # Dependencies passed in take precedence over the bus' dependencies
+        dependencies = {**self._dependencies, **dependencies}
+        scope = (
+            self._container.scope(dependencies, self._dependencies)
+            if self._container
+            else None
+        )
+        budget = self._cascade_budget.track(event) if self._cascade_budget else None
+        cascade = _Cascade(dependencies, scope, unit_of_work_per_handler, budget)
+        queue = self._create_cascade_queue()
+
+        try:
+            if self._cascade_timeout is None:
+                await self._drive_cascade(event, handler, queue, cascade)
+            else:
+                start = monotonic()
+
+                try:
+                    await asyncio.wait_for(
+                        self._drive_cascade(event, handler, queue, cascade),
+                        self._cascade_timeout,
+                    )
+                except asyncio.TimeoutError as e:
+                    elapsed = monotonic() - start
+
+                    if isinstance(e, HandlerTimeoutError):
+                        raise
+                    elif elapsed < self._cascade_timeout:
+                        raise
+
+                    error = CascadeTimeoutError(event, self._cascade_timeout, elapsed)
+                    await self._report_timeout(error)
+
+                    raise error from None
+        except BaseException:
+            # Events whose keys were recorded may not have been fully handled, e.g.
+            # if an event they published failed
+            if self._dedup_index is not None:
+                for key in cascade.dedup_keys:
+                    self._dedup_index.discard(key)
+
+            raise
+        finally:
+            if budget is not None:
+                budget.finish()
+
+            if uow is not None:
+                self._release_unit_of_work(uow)
+
+            if scope is not None:
+                await scope.aclose()
+
+    def use(self, middleware: Middleware):
+        """Register middleware. Middleware registered first is the outermost"""
+        self._middleware.append(middleware)
+        self._cascade_call = compose_cascade(self._middleware, self._handle_cascade)
+        self._handler_calls = {
+            handler: compose_handler(self._middleware, handler)
+            for handlers in self._handlers.values()
+            for handler in handlers
+        }
+
+    def _get_handler_call(self, handler: Callable) -> HandlerCall:
+        try:
+            return self._handler_calls[handler]
+        except KeyError:
+            # E.g. a handler of a dead letter that isn't in the handlers map
+            call = self._handler_calls[handler] = compose_handler(
+                self._middleware, handler
+            )
+
+            return call
+
+    async def _handle_cascade(self, event: "Event", dependencies: Dict[str, Any]):
+        await self._run_cascade(event, None, dependencies)
+
+    async def handle(self, event: "Event", **dependencies):
+        if self._cascade_call is None:
+            await self._run_cascade(event, None, dependencies)
+        else:
+            await self._cascade_call(event, dependencies)
+
+    async def replay(self, dead_letter: DeadLetter, **dependencies):
+        """Re-run the handler that failed to handle a dead letter's event, and handle
+        the events it publishes"""
+        if self._cascade_call is None:
+            await self._run_cascade(
+                dead_letter.event, dead_letter.handler, dependencies
+            )
+
+            return
+
+        async def replay(event: "Event", dependencies: Dict[str, Any]):
+            await self._run_cascade(event, dead_letter.handler, dependencies)
+
+        await compose_cascade(self._middleware, replay)(dead_letter.event, dependencies)
+
+    def create_queue(self, maxsize: int = 0) -> AsyncEventQueue:
+        """Create a queue for run() that uses the bus' priorities"""
+        return AsyncEventQueue(
+            maxsize,
+            priority=None if self._priorities is None else self._get_priority,
+            aging=self._priority_aging,
+        )
+
+    async def run(self, queue: AsyncEventQueue, **dependencies):
+        """Handle events put in queue until cancelled. Errors are logged so that one
+        failing cascade doesn't stop the worker"""
+        while True:
+            event = await queue.get()
+
+            try:
+                await self.handle(event, **dependencies)
+            except Exception:
+                logger.exception("Failed to handle %s", event)
+            finally:
+                queue.task_done()
+
+    async def run_transport(
+        self,
+        transport: "AbstractTransport",
+        batch_size: int = 100,
+        nack_failed: bool = True,
+        redelivery_policy: Optional[RetryPolicy] = None,
+        **dependencies,
+    ):
+        """Handle batches of events received from transport until cancelled. Batches
+        are acknowledged once their events have been handled. Errors are logged like
+        in run(), and batches with events that failed are rejected so that they're
+        delivered again, with their other events, unless nack_failed is False.
+
+        redelivery_policy (defaults to RetryPolicy()) limits how many times a batch
+        is delivered, and how long to wait before rejecting it; batches that fail on
+        their last delivery are acknowledged, dropping their failed events. Use retry
+        policies and dead letters to keep failed events without rejecting batches"""
+        policy = redelivery_policy or RetryPolicy()
+
+        async for batch in transport.subscribe(batch_size):
+            error = None
+
+            for event in batch:
+                try:
+                    await self.handle(event, **dependencies)
+                except Exception as e:
+                    logger.exception("Failed to handle %s", event)
+                    error = error or e
+
+            if error is None or not nack_failed:
+                batch.ack()
+            elif policy.should_retry(error, batch.deliveries):
+                await asyncio.sleep(policy.get_delay(batch.deliveries))
+                batch.nack()
+            else:
+                logger.error(
+                    "Dropping failed events of %s after %d deliveries",
+                    batch,
+                    batch.deliveries,
+                )
+                batch.ack()
+
+    async def consume(
+        self,
+        source: Source,
+        batch_size: int = 100,
+        max_in_flight: int = 1,
+        on_checkpoint: Optional[Callable[[int], Any]] = None,
+        start_offset: int = 0,
+        skip_failed: bool = False,
+        **dependencies,
+    ) -> ConsumeStats:
+        """Handle events from an iterable or async iterable, e.g. tail_file(), until
+        it's exhausted. Up to max_in_flight cascades run concurrently (they need
+        separate units of work, e.g. with a factory), and the source isn't read while
+        that many are in flight. Offsets count events from the start of the source:
+        on_checkpoint is called with the offset up to which every cascade has
+        completed, after every batch_size events and at the end. Pass the last
+        checkpoint as start_offset to resume.
+
+        Errors are logged like in run(). The checkpoint stays before the first event
+        whose cascade failed, so that resuming handles it again, unless skip_failed
+        is True (e.g. with retry policies and dead letters keeping failed events)"""
+        consumer = Consumer(
+            self, batch_size, max_in_flight, on_checkpoint, start_offset, skip_failed
+        )
+
+        return await consumer.consume(source, **dependencies)
@@ -0,0 +1,44 @@
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Sequence
+
+from cosmic_toolkit.utils import maybe_await
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+# Calls a handler with an event and the handler's resolved dependencies
+HandlerCall = Callable[["Event", Dict[str, Any]], Awaitable[Any]]
+
+# Handles an event and the events it publishes, with the cascade's dependencies
+CascadeCall = Callable[["Event", Dict[str, Any]], Awaitable[None]]
+
+
+class Middleware:
+    """Wraps handler calls and cascades, e.g. for logging, timing or transactions.
+    Register with MessageBus.use(). Wrappers are created once per handler (and once
+    for cascades) and reused for every event, so setup work belongs in the wrap
+    methods rather than in the calls they return"""
+
+    def wrap_handler(self, handler: Callable, call_next: HandlerCall) -> HandlerCall:
+        return call_next
+
+    def wrap_cascade(self, call_next: CascadeCall) -> CascadeCall:
+        return call_next
+
+
+def compose_handler(middleware: Sequence[Middleware], handler: Callable) -> HandlerCall:
+    """Wrap handler with middleware. The first middleware is the outermost"""
+
+    async def call(event: "Event", dependencies: Dict[str, Any]) -> Any:
+        return await maybe_await(handler(event, **dependencies))
+
+    for item in reversed(middleware):
+        call = item.wrap_handler(handler, call)
+
+    return call
+
+
+def compose_cascade(middleware: Sequence[Middleware], call: CascadeCall) -> CascadeCall:
+    for item in reversed(middleware):
+        call = item.wrap_cascade(call)
+
+    return call
@@ -8,16 +8,40 @@ from uuid import UUID
 
 from pydantic import BaseModel
 
+from cosmic_toolkit.registry import event_registry
 from cosmic_toolkit.types import JSONSerializer, NormalDict
 
+# pydantic 1 validates in Python, so skipping validation pays off. pydantic 2 validates
+# in compiled code which is faster than its pure Python model_construct()
+_SKIP_VALIDATION = not hasattr(BaseModel, "model_construct")
+
 
 class Event(BaseModel):
-    ...
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Register with a discriminator, __event_type__ or the class name, for
+        # decoding (see EventRegistry)
+        event_registry.register(cls)
+
+    @classmethod
+    def trusted(cls, **data: Any) -> "Event":
+        """Create an event from trusted data, such as events that are published by
+        aggregates. Validation is skipped when that's faster. See LightweightEvent for
+        high volume events"""
+        if _SKIP_VALIDATION:
+            return cls.construct(**data)
+
+        return cls(**data)
 
 
 class AggregateRoot:
     _events: List[Event]
 
+    # Version the aggregate was loaded at, for optimistic concurrency control with
+    # versioned repositories (see AbstractRepository)
+    version: int = 0
+
     def __init__(self, *args, **kwargs):
         self._events = []
 
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Hashable, List, Optional
+from zlib import crc32
+
+from cosmic_toolkit.scheduling import AsyncEventQueue
+from cosmic_toolkit.types import NormalDict
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.message_bus import MessageBus
+    from cosmic_toolkit.models import Event
+
+logger = logging.getLogger(__name__)
+
+KeyFunction = Callable[["Event"], Hashable]
+
+
+def stable_hash(key: Hashable) -> int:
+    """Hash that's the same in every process, unlike hash() of str and bytes"""
+    if isinstance(key, int):
+        return key
+    elif isinstance(key, bytes):
+        return crc32(key)
+
+    return crc32(str(key).encode())
+
+
+class Shard:
+    def __init__(self, index: int, queue: AsyncEventQueue):
+        self.index = index
+        self.queue = queue
+
+        self.failed = 0
+        self.max_depth = 0
+        self.processed = 0
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, {self.dict()}>"
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def dict(self) -> NormalDict:
+        return {
+            "index": self.index,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+
+class PartitionedDispatcher:
+    def __init__(
+        self,
+        bus: "MessageBus",
+        key: KeyFunction,
+        partitions: int = 4,
+        maxsize: int = 0,
+    ):
+        """Dispatch events to a fixed number of shards by key (e.g. building or device
+        id). Each shard has a queue and a worker that handles its events in order, so
+        events with the same key are handled in order while events with different
+        keys are handled concurrently. Events published during a cascade are handled
+        by the worker of the event that started the cascade.
+
+        Shards handle cascades concurrently, so bus should create a Unit of Work per
+        cascade (see MessageBus' unit_of_work_factory). If maxsize is given, submit()
+        waits while a shard's queue is full"""
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+
+        self._bus = bus
+        self._key = key
+        self._maxsize = maxsize
+        self._partitions = partitions
+        self._shards: List[Shard] = []
+        self._workers: List[asyncio.Task] = []
+
+    async def __aenter__(self) -> "PartitionedDispatcher":
+        self.start()
+
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.join()
+
+        await self.stop()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, partitions={self._partitions}>"
+
+    @property
+    def shards(self) -> List[Shard]:
+        return self._shards
+
+    def shard_for(self, event: "Event") -> int:
+        return stable_hash(self._key(event)) % self._partitions
+
+    def start(self, **dependencies: Any):
+        """Start shard workers. dependencies are passed to MessageBus.handle()"""
+        if self._workers:
+            raise RuntimeError(f"{self.__class__.__name__} is already started")
+
+        self._shards = [
+            Shard(i, self._bus.create_queue(self._maxsize))
+            for i in range(self._partitions)
+        ]
+        self._workers = [
+            asyncio.ensure_future(self._work(shard, dependencies))
+            for shard in self._shards
+        ]
+
+    async def submit(self, event: "Event"):
+        shard = self._get_shard(event)
+        await shard.queue.put(event)
+        shard.max_depth = max(shard.max_depth, shard.queue.qsize())
+
+    def submit_nowait(self, event: "Event"):
+        shard = self._get_shard(event)
+        shard.queue.put_nowait(event)
+        shard.max_depth = max(shard.max_depth, shard.queue.qsize())
+
+    async def join(self):
+        """Wait until all submitted events have been handled"""
+        for shard in self._shards:
+            await shard.queue.join()
+
+    async def stop(self):
+        """Stop workers. Events that haven't been handled are discarded"""
+        workers, self._workers = self._workers, []
+
+        for worker in workers:
+            worker.cancel()
+
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def stats(self) -> List[NormalDict]:
+        return [shard.dict() for shard in self._shards]
+
+    def _get_shard(self, event: "Event") -> Shard:
+        if not self._workers:
+            raise RuntimeError(f"{self.__class__.__name__} isn't started")
+
+        return self._shards[self.shard_for(event)]
+
+    async def _work(self, shard: Shard, dependencies: Optional[NormalDict]):
+        while True:
+            event = await shard.queue.get()
+
+            try:
+                await self._bus.handle(event, **dependencies)
+            except Exception:
+                shard.failed += 1
+                logger.exception("Shard %d failed to handle %s", shard.index, event)
+            finally:
+                shard.processed += 1
+                shard.queue.task_done()
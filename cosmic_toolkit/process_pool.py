@@ -0,0 +1,384 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import traceback
+from itertools import count
+from queue import SimpleQueue
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from cosmic_toolkit.partitioning import KeyFunction, stable_hash
+from cosmic_toolkit.types import NormalDict
+from cosmic_toolkit.utils import maybe_await
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+    from cosmic_toolkit.message_bus import MessageBus
+    from cosmic_toolkit.models import Event
+
+logger = logging.getLogger(__name__)
+
+BusFactory = Callable[[], Union["MessageBus", Awaitable["MessageBus"]]]
+
+# Frames sent to workers are lists of (sequence number, event), frames sent back are
+# lists of (sequence number, WorkerError or None)
+Frame = List[Tuple[int, Any]]
+
+
+class WorkerError(Exception):
+    def __init__(
+        self,
+        exception_type: str,
+        message: str,
+        traceback: str = "",
+        exception: Optional[BaseException] = None,
+    ):
+        """An exception raised in a worker process. exception is the original
+        exception if it could be pickled and unpickled"""
+        super().__init__(f"{exception_type}: {message}")
+
+        self.exception = exception
+        self.exception_type = exception_type
+        self.message = message
+        self.traceback = traceback
+
+    def __reduce__(self):
+        return (
+            self.__class__,
+            (self.exception_type, self.message, self.traceback, self.exception),
+        )
+
+    @classmethod
+    def from_exception(cls, exception: BaseException) -> "WorkerError":
+        # Exceptions whose constructors take other arguments than their args (e.g.
+        # HandlerTimeoutError) pickle fine but fail to unpickle
+        try:
+            pickle.loads(pickle.dumps(exception))
+        except Exception:
+            original = None
+        else:
+            original = exception
+
+        return cls(
+            exception.__class__.__qualname__,
+            str(exception),
+            traceback.format_exc(),
+            original,
+        )
+
+
+def _dumps(value: Any) -> bytes:
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _send(connection: "Connection", frame: Optional[Frame]):
+    connection.send_bytes(_dumps(frame))
+
+
+def _split_picklable(frame: Frame) -> Tuple[Frame, Frame]:
+    """Split a frame into events that can be pickled and errors for the others"""
+    picklable, errors = [], []
+
+    for sequence, event in frame:
+        try:
+            _dumps(event)
+        except Exception as e:
+            errors.append((sequence, WorkerError.from_exception(e)))
+        else:
+            picklable.append((sequence, event))
+
+    return picklable, errors
+
+
+def _receive(connection: "Connection") -> Optional[Frame]:
+    return pickle.loads(connection.recv_bytes())
+
+
+def _run_worker(bus_factory: BusFactory, connection: "Connection"):
+    asyncio.run(_serve(bus_factory, connection))
+
+
+async def _serve(bus_factory: BusFactory, connection: "Connection"):
+    bus = await maybe_await(bus_factory())
+
+    while True:
+        frame = _receive(connection)
+
+        if frame is None:
+            break
+
+        results = []
+
+        for sequence, event in frame:
+            try:
+                await bus.handle(event)
+            except Exception as e:
+                results.append((sequence, WorkerError.from_exception(e)))
+            else:
+                results.append((sequence, None))
+
+        _send(connection, results)
+
+    connection.close()
+
+
+class _Worker:
+    def __init__(self, index: int, process: Any, connection: "Connection"):
+        self.buffer: Frame = []
+        self.connection = connection
+        self.index = index
+        self.outbox = SimpleQueue()
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.process = process
+        self.threads: List[threading.Thread] = []
+
+        self.completed = 0
+        self.failed = 0
+        self.frames = 0
+        self.submitted = 0
+
+    def dict(self) -> NormalDict:
+        return {
+            "index": self.index,
+            "pid": self.process.pid,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "pending": len(self.pending),
+            "frames": self.frames,
+        }
+
+
+class ProcessPoolRunner:
+    def __init__(
+        self,
+        bus_factory: BusFactory,
+        processes: Optional[int] = None,
+        key: Optional[KeyFunction] = None,
+        batch_size: int = 100,
+        context: Optional[Any] = None,
+    ):
+        """Handle events in worker processes (defaults to one per CPU), each with a
+        MessageBus created by bus_factory. bus_factory may be a coroutine function and
+        must be picklable (e.g. a module level function) if context uses "spawn" or
+        "forkserver". It should also create the bus' Unit of Work and dependencies.
+
+        Events are sent to workers over pipes in batches of up to batch_size events.
+        If key is given, events with the same key are sent to the same worker, and
+        are handled in order, otherwise events are sent to workers in turn. Events
+        must be picklable"""
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        self._batch_size = batch_size
+        self._bus_factory = bus_factory
+        self._context = context or multiprocessing.get_context()
+        self._flush_scheduled = False
+        self._key = key
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._processes = processes or os.cpu_count() or 1
+        self._running = False
+        self._sequence = count()
+        self._workers: List[_Worker] = []
+
+    async def __aenter__(self) -> "ProcessPoolRunner":
+        await self.start()
+
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, processes={self._processes}>"
+
+    async def start(self):
+        if self._running:
+            raise RuntimeError(f"{self.__class__.__name__} is already started")
+
+        self._loop = asyncio.get_event_loop()
+        self._running = True
+        self._workers = []
+
+        for index in range(self._processes):
+            connection, child_connection = self._context.Pipe()
+            process = self._context.Process(
+                target=_run_worker,
+                args=(self._bus_factory, child_connection),
+                name=f"cosmic-toolkit-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+
+            # So that the reader sees EOF if the worker exits
+            child_connection.close()
+
+            worker = _Worker(index, process, connection)
+            worker.threads = [
+                threading.Thread(target=self._write, args=(worker,), daemon=True),
+                threading.Thread(target=self._read, args=(worker,), daemon=True),
+            ]
+
+            for thread in worker.threads:
+                thread.start()
+
+            self._workers.append(worker)
+
+    def submit(self, event: "Event") -> asyncio.Future:
+        """Send event to a worker. The returned future is resolved once the worker
+        has handled the event, or raises WorkerError if it failed"""
+        if not self._running:
+            raise RuntimeError(f"{self.__class__.__name__} isn't started")
+
+        sequence = next(self._sequence)
+
+        if self._key is None:
+            worker = self._workers[sequence % len(self._workers)]
+        else:
+            worker = self._workers[stable_hash(self._key(event)) % len(self._workers)]
+
+        future = self._loop.create_future()
+        worker.pending[sequence] = future
+        worker.submitted += 1
+        worker.buffer.append((sequence, event))
+
+        if len(worker.buffer) >= self._batch_size:
+            self._flush_worker(worker)
+        elif not self._flush_scheduled:
+            # Batch the events submitted in this iteration of the event loop
+            self._flush_scheduled = True
+            self._loop.call_soon(self.flush)
+
+        return future
+
+    async def handle(self, event: "Event"):
+        await self.submit(event)
+
+    async def handle_many(
+        self, events: Iterable["Event"], return_exceptions: bool = False
+    ) -> List[Optional[BaseException]]:
+        """Handle events and wait for all of them. Returns an exception, or None, per
+        event if return_exceptions is True, otherwise raises the first exception"""
+        futures = [self.submit(event) for event in events]
+
+        return await asyncio.gather(*futures, return_exceptions=return_exceptions)
+
+    def flush(self):
+        """Send buffered events to workers"""
+        self._flush_scheduled = False
+
+        for worker in self._workers:
+            if worker.buffer:
+                self._flush_worker(worker)
+
+    async def close(self):
+        """Wait for submitted events to be handled, then stop the workers"""
+        self.flush()
+        self._running = False
+
+        pending = [f for worker in self._workers for f in worker.pending.values()]
+
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        for worker in self._workers:
+            worker.outbox.put(None)
+
+        for worker in self._workers:
+            await self._loop.run_in_executor(None, worker.process.join)
+
+            for thread in worker.threads:
+                await self._loop.run_in_executor(None, thread.join)
+
+            worker.connection.close()
+
+    def stats(self) -> List[NormalDict]:
+        return [worker.dict() for worker in self._workers]
+
+    def _flush_worker(self, worker: _Worker):
+        frame, worker.buffer = worker.buffer, []
+        worker.frames += 1
+        worker.outbox.put(frame)
+
+    def _write(self, worker: _Worker):
+        # Pipes block when full, so frames are sent from a thread per worker
+        while True:
+            frame = worker.outbox.get()
+
+            try:
+                data = _dumps(frame)
+            except Exception:
+                # Only the events that can't be pickled fail, the thread must keep
+                # sending frames
+                frame, errors = _split_picklable(frame)
+                self._loop.call_soon_threadsafe(self._complete, worker, errors)
+                data = _dumps(frame)
+
+            try:
+                worker.connection.send_bytes(data)
+            except (BrokenPipeError, OSError):
+                break
+
+            if frame is None:
+                break
+
+    def _read(self, worker: _Worker):
+        try:
+            while True:
+                try:
+                    results = _receive(worker.connection)
+                except (EOFError, OSError):
+                    break
+
+                self._loop.call_soon_threadsafe(self._complete, worker, results)
+        except Exception:
+            # Results that can't be unpickled can't be matched with their events.
+            # Stop the worker rather than leave it blocked on a pipe nobody reads
+            logger.exception("Failed to read results of worker %d", worker.index)
+            worker.process.terminate()
+
+        self._loop.call_soon_threadsafe(self._fail_pending, worker)
+
+    def _complete(self, worker: _Worker, results: Frame):
+        for sequence, error in results:
+            future = worker.pending.pop(sequence)
+            worker.completed += 1
+
+            if error is not None:
+                worker.failed += 1
+
+            if future.done():
+                continue
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+
+    def _fail_pending(self, worker: _Worker):
+        if worker.pending:
+            logger.error(
+                "Worker %d exited with %d events pending",
+                worker.index,
+                len(worker.pending),
+            )
+
+        for future in worker.pending.values():
+            if not future.done():
+                future.set_exception(
+                    WorkerError("WorkerExited", f"Worker {worker.index} exited")
+                )
+
+        worker.pending.clear()
@@ -0,0 +1,217 @@
+import random
+import tracemalloc
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+from cosmic_toolkit.middleware import HandlerCall, Middleware
+from cosmic_toolkit.types import NormalDict
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+# Allocations made by tracemalloc and the profiler itself aren't attributed
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+class HandlerProfile:
+    def __init__(self, name: str):
+        """Allocations of a handler's sampled calls. allocated is the memory that
+        was still allocated when calls returned (i.e. retained, such as aggregates
+        and events) and peak the most that was allocated during a call. sites holds
+        the bytes allocated per line, for the top lines of each call"""
+        self.name = name
+
+        self.aggregates = 0
+        self.allocated = 0
+        self.events = 0
+        self.max_allocated = 0
+        self.peak = 0
+        self.samples = 0
+        self.sites: Counter = Counter()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, name={self.name!r}>"
+
+    def record(
+        self,
+        allocated: int,
+        peak: Optional[int],
+        sites: Dict[str, int],
+        aggregates: int,
+        events: int,
+    ):
+        self.samples += 1
+        self.aggregates += aggregates
+        self.allocated += allocated
+        self.events += events
+        self.max_allocated = max(self.max_allocated, allocated)
+
+        if peak is not None:
+            self.peak = max(self.peak, peak)
+
+        self.sites.update(sites)
+
+    def dict(self, top: int = 10) -> NormalDict:
+        samples = self.samples or 1
+
+        return {
+            "samples": self.samples,
+            "allocated": self.allocated,
+            "mean_allocated": self.allocated / samples,
+            "max_allocated": self.max_allocated,
+            "peak": self.peak,
+            "aggregates": self.aggregates,
+            "events": self.events,
+            "top_sites": self.sites.most_common(top),
+        }
+
+
+class AllocationProfiler(Middleware):
+    def __init__(
+        self,
+        sample_rate: float = 0.01,
+        top: int = 10,
+        frames: int = 1,
+        unit_of_work_kwarg_name: str = "uow",
+        random: Callable[[], float] = random.random,
+    ):
+        """Middleware that measures memory allocated by handlers with tracemalloc,
+        for a sample_rate fraction of handler calls. Register with MessageBus.use()
+        and get results with report() while the bus runs.
+
+        Tracing only runs during sampled calls (unless it was already started), so
+        other calls only pay for a random number. While it runs, allocations of
+        concurrent tasks are attributed to the sampled call too. top is the number
+        of allocation sites recorded per call; pass 0 to skip the snapshots that
+        they require. frames is the traceback depth that tracemalloc records. For
+        handlers that take a Unit of Work, the aggregates they track and the events
+        they publish are counted as well"""
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+
+        self._frames = frames
+        self._profiles: Dict[Callable, HandlerProfile] = {}
+        self._random = random
+        self._sample_rate = sample_rate
+        self._top = top
+        self._unit_of_work_kwarg_name = unit_of_work_kwarg_name
+
+        # Number of sampled calls in progress, which share tracing
+        self._active = 0
+        self._started_tracing = False
+
+        self.calls = 0
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, sample_rate={self._sample_rate}>"
+
+    def wrap_handler(self, handler: Callable, call_next: HandlerCall) -> HandlerCall:
+        name = getattr(handler, "__qualname__", repr(handler))
+        profile = self._profiles.setdefault(handler, HandlerProfile(name))
+        sample = self._random
+        sample_rate = self._sample_rate
+
+        async def call(event: "Event", dependencies: Dict[str, Any]) -> Any:
+            self.calls += 1
+
+            if sample() >= sample_rate:
+                return await call_next(event, dependencies)
+
+            return await self._profile(profile, call_next, event, dependencies)
+
+        return call
+
+    def report(self, top: int = 10) -> Dict[str, NormalDict]:
+        """Profiles of handlers with sampled calls, by handler name, most allocated
+        first"""
+        profiles = sorted(
+            (p for p in self._profiles.values() if p.samples),
+            key=lambda p: p.allocated,
+            reverse=True,
+        )
+
+        return {profile.name: profile.dict(top) for profile in profiles}
+
+    def reset(self):
+        for handler, profile in self._profiles.items():
+            self._profiles[handler] = HandlerProfile(profile.name)
+
+        self.calls = 0
+
+    async def _profile(
+        self,
+        profile: HandlerProfile,
+        call_next: HandlerCall,
+        event: "Event",
+        dependencies: Dict[str, Any],
+    ) -> Any:
+        uow = dependencies.get(self._unit_of_work_kwarg_name)
+        uow = uow if hasattr(uow, "tracking_counts") else None
+        aggregates, events = uow.tracking_counts() if uow is not None else (0, 0)
+
+        # The peak can only be attributed to a call that doesn't overlap others
+        exclusive = self._start_tracing()
+        size = tracemalloc.get_traced_memory()[0]
+        snapshot = self._take_snapshot() if self._top else None
+
+        try:
+            return await call_next(event, dependencies)
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            sites = {}
+
+            if snapshot is not None:
+                stats = self._take_snapshot().compare_to(snapshot, "lineno")
+
+                for stat in stats[: self._top]:
+                    if stat.size_diff > 0:
+                        frame = stat.traceback[0]
+                        sites[f"{frame.filename}:{frame.lineno}"] = stat.size_diff
+
+            exclusive = exclusive and self._active == 1
+            self._stop_tracing()
+
+            if uow is not None:
+                aggregates_after, events_after = uow.tracking_counts()
+                aggregates = aggregates_after - aggregates
+                events = events_after - events
+
+            profile.record(
+                current - size,
+                peak - size if exclusive else None,
+                sites,
+                aggregates,
+                events,
+            )
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+    def _start_tracing(self) -> bool:
+        """Start tracing if needed, returning whether no other sampled call is in
+        progress"""
+        exclusive = not self._active
+
+        if exclusive:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self._frames)
+                self._started_tracing = True
+            elif hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            else:
+                # Python < 3.9 can't reset the peak of tracing that's already running
+                exclusive = False
+
+        self._active += 1
+
+        return exclusive
+
+    def _stop_tracing(self):
+        self._active -= 1
+
+        if not self._active and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
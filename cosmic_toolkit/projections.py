@@ -0,0 +1,227 @@
+from copy import deepcopy
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Type,
+    Union,
+)
+
+from cosmic_toolkit.utils import iterate
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+# Updates a projection's state with an event. Returns the new state, or None if the
+# state was updated in place
+ApplyFunction = Callable[[Any, "Event"], Any]
+
+Events = Union[Iterable["Event"], AsyncIterable["Event"]]
+
+
+class Snapshot:
+    __slots__ = ("position", "state")
+
+    def __init__(self, position: int, state: Any):
+        """Copy of a projection's state after applying position events"""
+        self.position = position
+        self.state = state
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, position={self.position}>"
+
+
+class Projection:
+    def __init__(
+        self,
+        name: str,
+        initial: Callable[[], Any] = dict,
+        copy: Callable[[Any], Any] = deepcopy,
+    ):
+        """Read model that is updated as events are handled, so that queries don't
+        re-aggregate entities. Register functions that apply events to the state
+        with on(). copy is used to take snapshots and checkpoints of the state"""
+        self.name = name
+
+        self._appliers: Dict[Type["Event"], List[ApplyFunction]] = {}
+        self._copy = copy
+        self._initial = initial
+        self._snapshot: Optional[Snapshot] = None
+        self._type_cache: Dict[type, List[ApplyFunction]] = {}
+
+        self.position = 0
+        self.state = initial()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, name={self.name!r}>"
+
+    @property
+    def event_types(self) -> List[Type["Event"]]:
+        return list(self._appliers)
+
+    def on(self, *event_types: Type["Event"]) -> Callable:
+        """Decorator to register a function that applies events of event_types (and
+        their subclasses) to the state"""
+
+        def register(apply: ApplyFunction) -> ApplyFunction:
+            for event_type in event_types:
+                self._appliers.setdefault(event_type, []).append(apply)
+
+            self._type_cache.clear()
+
+            return apply
+
+        return register
+
+    def handles(self, event: "Event") -> bool:
+        return self.handles_type(event.__class__)
+
+    def handles_type(self, event_type: type) -> bool:
+        return bool(self._get_appliers(event_type))
+
+    def apply(self, event: "Event"):
+        """Apply an event. Only events that the projection uses count towards
+        position, so that positions are the same whether events are fed by a
+        MessageBus, which only routes those, or replayed from the whole history"""
+        appliers = self._get_appliers(event.__class__)
+
+        if not appliers:
+            return
+
+        for apply in appliers:
+            state = apply(self.state, event)
+
+            if state is not None:
+                self.state = state
+
+        self.position += 1
+        self._snapshot = None
+
+    def snapshot(self) -> Snapshot:
+        """Copy of the current state, which isn't affected by events applied later.
+        The copy is reused until the next event is applied"""
+        if self._snapshot is None:
+            self._snapshot = Snapshot(self.position, self._copy(self.state))
+
+        return self._snapshot
+
+    def restore(self, checkpoint: Snapshot):
+        self.position = checkpoint.position
+        self.state = self._copy(checkpoint.state)
+        self._snapshot = None
+
+    def reset(self):
+        self.position = 0
+        self.state = self._initial()
+        self._snapshot = None
+
+    async def rebuild(self, events: Events, checkpoint: Optional[Snapshot] = None):
+        """Rebuild the state from the event history, which may be an async iterable.
+        If checkpoint is given, the state is restored from it and only events after
+        its position (counting the events that the projection uses) are applied"""
+        if checkpoint is None:
+            self.reset()
+        else:
+            self.restore(checkpoint)
+
+        skip = self.position
+
+        async for event in iterate(events):
+            if not self.handles(event):
+                continue
+            elif skip:
+                skip -= 1
+            else:
+                self.apply(event)
+
+    def _get_appliers(self, event_type: type) -> List[ApplyFunction]:
+        try:
+            return self._type_cache[event_type]
+        except KeyError:
+            pass
+
+        appliers = []
+
+        for klass in [event_type] + [t for t in event_type.__bases__]:
+            appliers.extend(self._appliers.get(klass, ()))
+
+        self._type_cache[event_type] = appliers
+
+        return appliers
+
+
+class ProjectionManager:
+    def __init__(self, *projections: Projection):
+        """Feeds events handled by a MessageBus to projections. Add apply() as a
+        handler, e.g. with extend_handlers()"""
+        self._projections: Dict[str, Projection] = {p.name: p for p in projections}
+
+    def __getitem__(self, name: str) -> Projection:
+        return self._projections[name]
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, projections={list(self._projections)}>"
+
+    def apply(self, event: "Event"):
+        for projection in self._projections.values():
+            projection.apply(event)
+
+    def extend_handlers(
+        self, handlers: Dict[Type["Event"], List[Callable]]
+    ) -> Dict[Type["Event"], List[Callable]]:
+        """Return a copy of a MessageBus handlers map with apply() added as the last
+        handler of every event type that a projection uses, including subclasses that
+        have handlers of their own (MessageBus only uses the handlers of the most
+        specific type)"""
+        handlers = {k: list(v) for k, v in handlers.items()}
+        projections = self._projections.values()
+        event_types = [t for p in projections for t in p.event_types]
+        event_types += [
+            t for t in handlers if any(p.handles_type(t) for p in projections)
+        ]
+
+        for event_type in dict.fromkeys(event_types):
+            event_handlers = handlers.setdefault(event_type, [])
+
+            if self.apply not in event_handlers:
+                event_handlers.append(self.apply)
+
+        return handlers
+
+    def snapshot(self) -> Dict[str, Snapshot]:
+        """Snapshots of every projection, consistent with each other since events
+        are applied to all projections at once"""
+        return {name: p.snapshot() for name, p in self._projections.items()}
+
+    def restore(self, checkpoints: Dict[str, Snapshot]):
+        for name, checkpoint in checkpoints.items():
+            self._projections[name].restore(checkpoint)
+
+    async def rebuild(
+        self, events: Events, checkpoints: Optional[Dict[str, Snapshot]] = None
+    ):
+        """Rebuild every projection from the event history in a single pass"""
+        checkpoints = checkpoints or {}
+        skips = {}
+
+        for name, projection in self._projections.items():
+            if name in checkpoints:
+                projection.restore(checkpoints[name])
+            else:
+                projection.reset()
+
+            skips[name] = projection.position
+
+        async for event in iterate(events):
+            for name, projection in self._projections.items():
+                if not projection.handles(event):
+                    continue
+                elif skips[name]:
+                    skips[name] -= 1
+                else:
+                    projection.apply(event)
@@ -0,0 +1,204 @@
+import asyncio
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from cosmic_toolkit.types import NormalDict
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+# Policies for events over the limit
+DELAY = "delay"
+DROP = "drop"
+SPILL = "spill"
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "_tokens", "_updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated_at = now
+
+    def take(self, now: float) -> float:
+        """Take a token. Returns 0 if a token was taken, otherwise the number of
+        seconds until a token is available"""
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+
+            return 0
+
+        return (1 - self._tokens) / self.rate
+
+
+class RateLimit:
+    def __init__(self, bucket: TokenBucket, policy: str):
+        self.bucket = bucket
+        self.policy = policy
+
+        self.allowed = 0
+        self.delayed = 0
+        self.dropped = 0
+        self.spilled = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__}, rate={self.bucket.rate}, "
+            f"burst={self.bucket.capacity}, policy={self.policy!r}>"
+        )
+
+    def dict(self) -> NormalDict:
+        return {
+            "rate": self.bucket.rate,
+            "burst": self.bucket.capacity,
+            "policy": self.policy,
+            "allowed": self.allowed,
+            "delayed": self.delayed,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+        }
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        clock: Callable[[], float] = monotonic,
+        max_spilled: Optional[int] = None,
+    ):
+        """Token bucket rate limits per event type or per handler. Events over the
+        limit are delayed until a token is available, dropped, or diverted to the
+        spill list (dropped if the spill list holds max_spilled events). Limits can
+        be changed while the limiter is in use"""
+        self._clock = clock
+        self._limits: Dict[Any, RateLimit] = {}
+        self._max_spilled = max_spilled
+
+        # Limit, or None, for event types, including types whose parent is limited
+        self._type_cache: Dict[type, Optional[RateLimit]] = {}
+
+        self.spilled: List[Tuple["Event", Any]] = []
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, limits={self._limits}>"
+
+    def set_limit(
+        self,
+        key: Any,
+        rate: float,
+        burst: Optional[float] = None,
+        policy: str = DELAY,
+    ):
+        """Limit an event type or a handler to rate events per second, allowing
+        bursts of up to burst events (defaults to rate, or 1 if rate < 1)"""
+        if policy not in (DELAY, DROP, SPILL):
+            raise ValueError(f"Unknown policy {policy!r}")
+        elif rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        elif burst is not None and burst < 1:
+            # The bucket could never hold a whole token for an event
+            raise ValueError("burst must be at least 1")
+
+        capacity = burst if burst is not None else max(rate, 1)
+        limit = self._limits.get(key)
+
+        if limit:
+            # Keep counters and tokens when adjusting a limit
+            limit.bucket.rate = rate
+            limit.bucket.capacity = capacity
+            limit.policy = policy
+        else:
+            bucket = TokenBucket(rate, capacity, self._clock())
+            self._limits[key] = RateLimit(bucket, policy)
+            self._type_cache.clear()
+
+    def remove_limit(self, key: Any):
+        self._limits.pop(key, None)
+        self._type_cache.clear()
+
+    def get_limit(self, key: Any) -> Optional[RateLimit]:
+        return self._limits.get(key)
+
+    def drain_spilled(self) -> List[Tuple["Event", Any]]:
+        """Return spilled (event, limited event type or handler) pairs and clear the
+        spill list"""
+        spilled, self.spilled = self.spilled, []
+
+        return spilled
+
+    def stats(self) -> Dict[Any, NormalDict]:
+        return {key: limit.dict() for key, limit in self._limits.items()}
+
+    def _get_limit_for_event_type(self, event_type: type) -> Optional[RateLimit]:
+        try:
+            return self._type_cache[event_type]
+        except KeyError:
+            pass
+
+        limit = None
+
+        for klass in [event_type] + [t for t in event_type.__bases__]:
+            limit = self._limits.get(klass)
+
+            if limit:
+                break
+
+        self._type_cache[event_type] = limit
+
+        return limit
+
+    async def acquire(self, event: "Event") -> bool:
+        """Wait for the event's type to be within its limit. Returns False if the
+        event was dropped or spilled"""
+        limit = self._get_limit_for_event_type(event.__class__)
+
+        if limit is None:
+            return True
+
+        return await self._acquire(limit, event, event.__class__)
+
+    async def acquire_for_handler(self, handler: Callable, event: "Event") -> bool:
+        """Wait for the handler to be within its limit. Returns False if the event
+        was dropped or spilled for the handler"""
+        limit = self._limits.get(handler)
+
+        if limit is None:
+            return True
+
+        return await self._acquire(limit, event, handler)
+
+    async def _acquire(self, limit: RateLimit, event: "Event", key: Any) -> bool:
+        wait = limit.bucket.take(self._clock())
+
+        if not wait:
+            limit.allowed += 1
+
+            return True
+        elif limit.policy == DROP:
+            limit.dropped += 1
+
+            return False
+        elif limit.policy == SPILL:
+            if self._max_spilled is not None and len(self.spilled) >= self._max_spilled:
+                limit.dropped += 1
+            else:
+                limit.spilled += 1
+                self.spilled.append((event, key))
+
+            return False
+
+        limit.delayed += 1
+
+        while wait:
+            await asyncio.sleep(wait)
+            wait = limit.bucket.take(self._clock())
+
+        limit.allowed += 1
+
+        return True
@@ -0,0 +1,176 @@
+import json
+import warnings
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    AsyncIterable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
+
+from cosmic_toolkit.types import NormalDict
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+
+class UnknownEventType(KeyError):
+    ...
+
+
+class EventTypeCollisionWarning(UserWarning):
+    ...
+
+
+def get_event_type_name(event_type: type) -> str:
+    """An event type's discriminator: its __event_type__ attribute, which isn't
+    inherited, or its name"""
+    return event_type.__dict__.get("__event_type__", event_type.__name__)
+
+
+class EventRegistry:
+    def __init__(
+        self,
+        type_key: str = "type",
+        data_key: Optional[str] = "data",
+        types: Optional["EventRegistry"] = None,
+    ):
+        """Event types by discriminator, to decode events from data such as JSON.
+        Records look like {"type": "SuiteLeased", "data": {...}}, or with data_key=None,
+        {"type": "SuiteLeased", ...}. If types share a discriminator, the type that was
+        registered last wins, with an EventTypeCollisionWarning unless it's a new
+        definition of the same class (e.g. a reloaded module); set __event_type__ to
+        tell such types apart. If types is given, its types are shared, e.g. to decode
+        another record layout using event_registry's types"""
+        self._data_key = data_key
+        self._type_key = type_key
+        self._types: Dict[str, type] = types._types if types is not None else {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._types
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._types))
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, types={len(self._types)}>"
+
+    def register(self, event_type: type, name: Optional[str] = None):
+        name = name or get_event_type_name(event_type)
+        registered = self._types.get(name)
+
+        if registered is not None:
+            previous, current = _qualified_name(registered), _qualified_name(event_type)
+
+            if previous != current:
+                warnings.warn(
+                    f"Event type {name!r} of {previous} is replaced by {current}, so "
+                    f"its records will be decoded as the latter",
+                    EventTypeCollisionWarning,
+                    stacklevel=2,
+                )
+
+        self._types[name] = event_type
+
+    def get(self, name: str) -> type:
+        try:
+            return self._types[name]
+        except KeyError:
+            raise UnknownEventType(name) from None
+
+    def encode(self, event: "Event") -> NormalDict:
+        name = get_event_type_name(event.__class__)
+        # pydantic 2 deprecates dict() and parse_obj(), which LightweightEvent and
+        # pydantic 1 only have. Checked on the type so pydantic isn't imported here
+        dump = getattr(event.__class__, "model_dump", None)
+        data = event.dict() if dump is None else dump(event)
+
+        if self._data_key is None:
+            return {self._type_key: name, **data}
+
+        return {self._type_key: name, self._data_key: data}
+
+    def decode(self, record: NormalDict, trusted: bool = False) -> "Event":
+        """Create an event from a record. If trusted is True (e.g. events that this
+        application encoded), validation is skipped where that's faster"""
+        if self._data_key is None:
+            data = {k: v for k, v in record.items() if k != self._type_key}
+        else:
+            data = record[self._data_key]
+
+        event_type = self.get(record[self._type_key])
+
+        if trusted:
+            return event_type.trusted(**data)
+        elif hasattr(event_type, "model_validate"):
+            return event_type.model_validate(data)
+
+        return event_type.parse_obj(data)
+
+    def decode_many(
+        self, records: Iterable[NormalDict], trusted: bool = False
+    ) -> List["Event"]:
+        decode = self.decode
+
+        return [decode(record, trusted) for record in records]
+
+    def iter_jsonl(
+        self,
+        stream: Union[IO, Iterable[Union[str, bytes]]],
+        batch_size: int = 1000,
+        trusted: bool = False,
+    ) -> Iterator[List["Event"]]:
+        """Decode a JSON lines file or stream into batches of up to batch_size events.
+        Lines are read as needed, so memory is bounded by batch_size. Blank lines are
+        skipped"""
+        batch = []
+
+        for line in stream:
+            if not line.strip():
+                continue
+
+            batch.append(self.decode(json.loads(line), trusted))
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    async def aiter_jsonl(
+        self,
+        stream: AsyncIterable[Union[str, bytes]],
+        batch_size: int = 1000,
+        trusted: bool = False,
+    ) -> AsyncIterable[List["Event"]]:
+        """Like iter_jsonl() for async streams, e.g. asyncio.StreamReader"""
+        batch = []
+
+        async for line in stream:
+            if not line.strip():
+                continue
+
+            batch.append(self.decode(json.loads(line), trusted))
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+
+def _qualified_name(event_type: type) -> str:
+    return f"{event_type.__module__}.{event_type.__qualname__}"
+
+
+# Every Event and LightweightEvent subclass is registered here when it's defined
+event_registry = EventRegistry()
@@ -1,20 +1,74 @@
 from abc import ABCMeta, abstractmethod
-from typing import Any, Type
-
-from cosmic_toolkit.models import AggregateRoot
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Type
+from weakref import WeakSet, finalize
+
+from cosmic_toolkit.models import AggregateRoot, Event
+from cosmic_toolkit.types import NormalDict
+
+
+def _keep_events(
+    finalizers: Dict[int, finalize],
+    key: int,
+    pending: Deque[Event],
+    events: List[Event],
+):
+    # Called when a weakly tracked aggregate is garbage collected
+    finalizers.pop(key, None)
+    pending.extend(events)
+
+
+class ConcurrencyError(Exception):
+    def __init__(
+        self,
+        entity: AggregateRoot,
+        expected_version: int,
+        actual_version: Optional[int] = None,
+    ):
+        """Raised when an aggregate is updated from a stale version, i.e. it was
+        updated by someone else since it was loaded"""
+        super().__init__(
+            f"{entity.__class__.__name__} was modified concurrently: expected "
+            f"version {expected_version}, found {actual_version}"
+        )
+
+        self.actual_version = actual_version
+        self.entity = entity
+        self.expected_version = expected_version
 
 
 class AbstractRepository(metaclass=ABCMeta):
     def __init__(self, *args, **kwargs):
         self.seen = set()
 
-    def __init_subclass__(cls, entity_type: Type[AggregateRoot], **kwargs):
+        # Unpublished events of aggregates that are no longer tracked
+        self.pending_events: Deque[Event] = deque()
+
+        # Bound by the Unit of Work when it leases a session from a session provider
+        self.session = None
+
+        # Finalizers of weakly tracked aggregates by id (see track_weakly())
+        self._finalizers: Optional[Dict[int, finalize]] = None
+
+        # Number of aggregates that have been added to seen, for profiling
+        self.tracked_total = 0
+
+    def __init_subclass__(
+        cls, entity_type: Type[AggregateRoot], versioned: bool = False, **kwargs
+    ):
         if not issubclass(entity_type, AggregateRoot):
             raise TypeError(f"Entity must inherit from {AggregateRoot.__name__}")
 
         cls._entity_type = entity_type
         cls._init_kwargs = kwargs
 
+        # If versioned, update() increments aggregates' version before calling
+        # _update(), which must only write if the stored version is still the loaded
+        # version (e.g. UPDATE ... WHERE version = ...) and raise ConcurrencyError
+        # otherwise (see _check_version()). Concurrent updates don't need locks and
+        # the update made from a stale version is rejected rather than lost
+        cls._versioned = versioned
+
     def __repr__(self):
         return f"<{self.__class__.__name__}, entity_type={self._entity_type.__name__}>"
 
@@ -22,25 +76,141 @@ class AbstractRepository(metaclass=ABCMeta):
         if not type(entity) == self._entity_type:
             raise TypeError(f"Expecting entity of type {self._entity_type.__name__}")
 
+    def _track(self, entity: AggregateRoot):
+        finalizers = self._finalizers
+
+        if finalizers is not None and id(entity) not in finalizers:
+            # Keep the aggregate's event list, not the aggregate, so that events
+            # published by aggregates that are garbage collected aren't lost
+            finalizer = finalize(
+                entity,
+                _keep_events,
+                finalizers,
+                id(entity),
+                self.pending_events,
+                entity._events,
+            )
+            finalizer.atexit = False
+            finalizers[id(entity)] = finalizer
+
+        seen = self.seen
+        size = len(seen)
+        seen.add(entity)
+
+        if len(seen) != size:
+            self.tracked_total += 1
+
+    def _untrack(self, entity: AggregateRoot):
+        if self._finalizers is not None:
+            finalizer = self._finalizers.pop(id(entity), None)
+
+            if finalizer is not None:
+                finalizer.detach()
+
+        self.seen.discard(entity)
+
+    def _check_version(self, entity: AggregateRoot, stored_version: Optional[int]):
+        """For _update() of versioned repositories: raise ConcurrencyError unless
+        stored_version is the version that entity was loaded at"""
+        if stored_version != entity.version - 1:
+            raise ConcurrencyError(entity, entity.version - 1, stored_version)
+
+    def _detach_finalizers(self):
+        if self._finalizers:
+            for finalizer in self._finalizers.values():
+                finalizer.detach()
+
+            self._finalizers.clear()
+
+    def track_weakly(self):
+        """Track aggregates with weak references so that aggregates that are no
+        longer used elsewhere can be garbage collected. Their unpublished events are
+        kept in pending_events"""
+        if self._finalizers is not None:
+            return
+
+        self._finalizers = {}
+        seen, self.seen = self.seen, WeakSet()
+
+        for entity in seen:
+            self._track(entity)
+
+    def release(self):
+        """Stop tracking aggregates, keeping their unpublished events in
+        pending_events"""
+        self._detach_finalizers()
+
+        for entity in self.seen:
+            self.pending_events.extend(entity.events)
+
+        self.seen.clear()
+
+    def reset(self):
+        """Stop tracking aggregates. Unpublished events of tracked aggregates won't
+        be collected by the Unit of Work"""
+        self._detach_finalizers()
+        self.pending_events.clear()
+        self.seen.clear()
+
+    def discard_events(self):
+        """Drop unpublished events of tracked aggregates and pending events, e.g.
+        those of a handler that failed"""
+        self.pending_events.clear()
+
+        for entity in self.seen:
+            entity._events.clear()
+
+    def memory_report(self) -> NormalDict:
+        return {
+            "tracked": len(self.seen),
+            "pending_events": len(self.pending_events),
+            "weak": self._finalizers is not None,
+        }
+
+    def count_unpublished_events(self) -> int:
+        """Events of tracked aggregates and pending events"""
+        return len(self.pending_events) + sum(len(e._events) for e in self.seen)
+
     async def add(self, entity: AggregateRoot):
         self._check_entity_type(entity)
 
         await self._add(entity)
-        self.seen.add(entity)
+        self._track(entity)
 
     async def get(self, *args: Any, **kwargs: Any) -> AggregateRoot:
         entity = await self._get(*args, **kwargs)
 
         if entity:
-            self.seen.add(entity)
+            self._track(entity)
 
         return entity
 
     async def update(self, entity):
         self._check_entity_type(entity)
 
-        await self._update(entity)
-        self.seen.add(entity)
+        if self._versioned:
+            await self._update_version(entity)
+        else:
+            await self._update(entity)
+
+        self._track(entity)
+
+    async def _update_version(self, entity: AggregateRoot):
+        loaded_version = entity.version
+        entity.version = loaded_version + 1
+
+        try:
+            await self._update(entity)
+        except BaseException as e:
+            entity.version = loaded_version
+
+            # The change was made to a stale aggregate, so its events are dropped
+            # rather than published when the Unit of Work exits
+            if isinstance(e, ConcurrencyError):
+                self._untrack(entity)
+                entity._events.clear()
+
+            raise
 
     @abstractmethod
     async def _add(self, entity: AggregateRoot):
@@ -0,0 +1,160 @@
+import asyncio
+from collections import deque
+from functools import partial, wraps
+from random import uniform
+from time import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, Tuple, Type
+
+from cosmic_toolkit.types import NormalDict
+from cosmic_toolkit.utils import maybe_await
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.message_bus import MessageBus
+    from cosmic_toolkit.models import Event
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.1,
+        max_delay: float = 10.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.1,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    ):
+        """Retry a failing handler up to max_attempts times (including the first
+        attempt) with exponential backoff. Delays are randomized by +/- jitter (a
+        fraction of the delay) so that retries of many events are spread out"""
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        self.base_delay = base_delay
+        self.jitter = jitter
+        self.max_attempts = max_attempts
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.retry_on = retry_on
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__}, max_attempts={self.max_attempts}, "
+            f"base_delay={self.base_delay}, max_delay={self.max_delay}>"
+        )
+
+    def get_delay(self, attempt: int) -> float:
+        """Delay before the attempt following the given (failed) attempt"""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+
+        return max(0.0, delay * (1 + uniform(-self.jitter, self.jitter)))
+
+    def should_retry(self, exception: BaseException, attempt: int) -> bool:
+        return attempt < self.max_attempts and isinstance(exception, self.retry_on)
+
+
+class DeadLetter:
+    def __init__(
+        self,
+        event: "Event",
+        handler: Callable,
+        exception: BaseException,
+        attempts: int,
+    ):
+        self.attempts = attempts
+        self.event = event
+        self.exception = exception
+        self.failed_at = time()
+        self.handler = handler
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__}, event={self.event!r}, "
+            f"handler={getattr(self.handler, '__qualname__', self.handler)}, "
+            f"exception={self.exception!r}, attempts={self.attempts}>"
+        )
+
+    def dict(self) -> NormalDict:
+        return {
+            "event": self.event,
+            "handler": self.handler,
+            "exception": self.exception,
+            "attempts": self.attempts,
+            "failed_at": self.failed_at,
+        }
+
+
+class DeadLetterStore:
+    def __init__(self, max_size: Optional[int] = None):
+        """Holds events that a handler failed to handle, in the order they failed.
+        If max_size is given, the oldest dead letters are discarded"""
+        self._letters = deque(maxlen=max_size)
+        self.discarded = 0
+
+    def __iter__(self) -> Iterator[DeadLetter]:
+        return iter(list(self._letters))
+
+    def __len__(self) -> int:
+        return len(self._letters)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, size={len(self._letters)}>"
+
+    def add(self, dead_letter: DeadLetter):
+        if len(self._letters) == self._letters.maxlen:
+            self.discarded += 1
+
+        self._letters.append(dead_letter)
+
+    def clear(self):
+        self._letters.clear()
+
+    async def replay(self, bus: "MessageBus", **dependencies: Any):
+        """Re-run the failed handler of every dead letter with bus (see
+        MessageBus.replay()). Dead letters are removed before they're replayed; if
+        bus uses this store, letters that fail again are added back"""
+        for _ in range(len(self._letters)):
+            dead_letter = self._letters.popleft()
+
+            try:
+                await bus.replay(dead_letter, **dependencies)
+            except Exception:
+                self._letters.appendleft(dead_letter)
+                raise
+
+
+def retry_on_conflict(
+    handler: Optional[Callable] = None, *, policy: Optional[RetryPolicy] = None
+) -> Callable:
+    """Decorator that re-runs a handler when it raises ConcurrencyError (by default,
+    up to 5 attempts with a short backoff), so that it reloads the aggregates it
+    updates and makes its change again. Handlers should enter the Unit of Work
+    themselves so that every attempt starts afresh. Unlike retry policies, the
+    handler is re-run right away rather than later in the cascade"""
+    if handler is None:
+        return partial(retry_on_conflict, policy=policy)
+
+    from cosmic_toolkit.repository import ConcurrencyError
+
+    if policy is None:
+        policy = RetryPolicy(
+            max_attempts=5,
+            base_delay=0.005,
+            max_delay=0.1,
+            retry_on=(ConcurrencyError,),
+        )
+
+    @wraps(handler)
+    async def retry(*args: Any, **kwargs: Any) -> Any:
+        attempt = 1
+
+        while True:
+            try:
+                return await maybe_await(handler(*args, **kwargs))
+            except Exception as e:
+                if not policy.should_retry(e, attempt):
+                    raise
+
+            await asyncio.sleep(policy.get_delay(attempt))
+            attempt += 1
+
+    return retry
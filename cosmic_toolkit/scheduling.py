@@ -0,0 +1,86 @@
+import asyncio
+from heapq import heappop, heappush
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+PriorityFunction = Callable[["Event"], float]
+
+
+class EventScheduler:
+    def __init__(self, priority: PriorityFunction, aging: float = 0.01):
+        """Priority queue of events. Events with higher priority are popped first and
+        events with the same priority are popped in FIFO order.
+
+        To prevent starvation, queued events gain `aging` priority for every event
+        that's queued after them. E.g. with aging=0.01, an event with priority 0 is
+        popped before events with priority 1 once 100 events have been queued after
+        it. Since every queued event ages at the same rate, aging doesn't change the
+        relative order of queued events and no re-sorting is required.
+
+        The interface mirrors deque's so the scheduler can replace a FIFO queue."""
+        self._aging = aging
+        self._counter = 0
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._priority = priority
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def __iter__(self) -> Iterator["Event"]:
+        """Queued events in the order they'd be popped"""
+        return (item[2] for item in sorted(self._heap))
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, size={len(self._heap)}>"
+
+    def append(self, event: "Event"):
+        # An event queued n events after another event needs n * aging more priority
+        # to be popped first
+        self._counter += 1
+        rank = self._aging * self._counter - self._priority(event)
+        heappush(self._heap, (rank, self._counter, event))
+
+    def extend(self, events: Iterable["Event"]):
+        for event in events:
+            self.append(event)
+
+    def popleft(self) -> "Event":
+        return heappop(self._heap)[2]
+
+
+class AsyncEventQueue(asyncio.Queue):
+    def __init__(
+        self,
+        maxsize: int = 0,
+        priority: Optional[PriorityFunction] = None,
+        aging: float = 0.01,
+    ):
+        """asyncio.Queue that pops events by priority using EventScheduler, or in
+        FIFO order if priority isn't given. Used to feed workers that run
+        continuously, e.g. MessageBus.run()"""
+        self._aging = aging
+        self._priority = priority
+
+        super().__init__(maxsize)
+
+    def _init(self, maxsize: int):
+        # asyncio.Queue uses the deque interface of _queue, which EventScheduler
+        # implements
+        if self._priority is None:
+            super()._init(maxsize)
+        else:
+            self._queue = EventScheduler(self._priority, self._aging)
@@ -0,0 +1,166 @@
+import asyncio
+from abc import ABCMeta, abstractmethod
+from time import monotonic
+from typing import Any, Callable, List, Optional
+
+from cosmic_toolkit.types import NormalDict
+from cosmic_toolkit.utils import maybe_await
+
+
+class SessionPoolTimeout(asyncio.TimeoutError):
+    ...
+
+
+class AbstractSessionProvider(metaclass=ABCMeta):
+    """Leases sessions (connections, transactions, clients, etc.) to units of work.
+    A unit of work acquires one session when it's entered and shares it with all of
+    its repositories"""
+
+    @abstractmethod
+    async def acquire(self) -> Any:
+        ...
+
+    @abstractmethod
+    async def release(self, session: Any):
+        ...
+
+
+class SessionPoolMetrics:
+    def __init__(self):
+        self.acquired = 0
+        self.created = 0
+        self.timeouts = 0
+
+        # Number of acquisitions that had to wait for a session to be released
+        self.waits = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, {self.dict()}>"
+
+    def dict(self) -> NormalDict:
+        return {
+            "acquired": self.acquired,
+            "created": self.created,
+            "timeouts": self.timeouts,
+            "waits": self.waits,
+            "total_wait_time": self.total_wait_time,
+            "max_wait_time": self.max_wait_time,
+        }
+
+
+class SessionPool(AbstractSessionProvider):
+    def __init__(
+        self,
+        create: Callable[[], Any],
+        close: Optional[Callable[[Any], Any]] = None,
+        max_size: int = 10,
+        acquire_timeout: Optional[float] = None,
+    ):
+        """Pool of at most max_size sessions. create and close can be plain functions
+        or coroutine functions. Sessions are created on demand and reused; acquire()
+        raises SessionPoolTimeout if a session isn't available within
+        acquire_timeout seconds (wait indefinitely if None)"""
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self._acquire_timeout = acquire_timeout
+        self._close = close
+        self._closed = False
+        self._create = create
+        self._idle: List[Any] = []
+        self._in_use = 0
+        self._max_size = max_size
+        self.metrics = SessionPoolMetrics()
+
+        # Created lazily so that the pool binds to the running event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__}, max_size={self._max_size}, "
+            f"in_use={self._in_use}, idle={len(self._idle)}>"
+        )
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def size(self) -> int:
+        return self._in_use + len(self._idle)
+
+    async def acquire(self, timeout: Optional[float] = None) -> Any:
+        if self._closed:
+            raise RuntimeError(f"{self.__class__.__name__} is closed")
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_size)
+
+        timeout = self._acquire_timeout if timeout is None else timeout
+
+        if self._semaphore.locked():
+            self.metrics.waits += 1
+            start = monotonic()
+
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self.metrics.timeouts += 1
+
+                raise SessionPoolTimeout(
+                    f"No session became available within {timeout} seconds"
+                )
+            finally:
+                waited = monotonic() - start
+                self.metrics.total_wait_time += waited
+                self.metrics.max_wait_time = max(self.metrics.max_wait_time, waited)
+        else:
+            await self._semaphore.acquire()
+
+        try:
+            if self._idle:
+                session = self._idle.pop()
+            else:
+                session = await maybe_await(self._create())
+                self.metrics.created += 1
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        self._in_use += 1
+        self.metrics.acquired += 1
+
+        return session
+
+    async def release(self, session: Any):
+        self._in_use -= 1
+
+        try:
+            if self._closed:
+                await self._close_session(session)
+            else:
+                # Most recently used sessions are reused first
+                self._idle.append(session)
+        finally:
+            self._semaphore.release()
+
+    async def close(self):
+        """Close idle sessions. Sessions that are in use are closed upon release"""
+        self._closed = True
+
+        while self._idle:
+            await self._close_session(self._idle.pop())
+
+    async def _close_session(self, session: Any):
+        if self._close:
+            await maybe_await(self._close(session))
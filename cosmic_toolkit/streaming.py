@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+from time import monotonic
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Optional,
+    Set,
+    Union,
+)
+
+from cosmic_toolkit.registry import EventRegistry, event_registry
+from cosmic_toolkit.types import NormalDict
+from cosmic_toolkit.utils import iterate, maybe_await
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.message_bus import MessageBus
+    from cosmic_toolkit.models import Event
+
+logger = logging.getLogger(__name__)
+
+Source = Union[AsyncIterable["Event"], Iterable["Event"]]
+
+
+class ConsumeStats:
+    def __init__(self, offset: int = 0):
+        self.checkpoint = offset
+        self.consumed = 0
+        self.failed = 0
+        self.handled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started_at = monotonic()
+        self.finished_at: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, {self.dict()}>"
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Events handled per second"""
+        elapsed = self.elapsed
+
+        return self.handled / elapsed if elapsed else 0.0
+
+    def dict(self) -> NormalDict:
+        return {
+            "consumed": self.consumed,
+            "handled": self.handled,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "checkpoint": self.checkpoint,
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+        }
+
+
+class Consumer:
+    def __init__(
+        self,
+        bus: "MessageBus",
+        batch_size: int = 100,
+        max_in_flight: int = 1,
+        on_checkpoint: Optional[Callable[[int], Any]] = None,
+        start_offset: int = 0,
+        skip_failed: bool = False,
+    ):
+        """Feed events from a source to bus. See MessageBus.consume()"""
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        elif batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        self._batch_size = batch_size
+        self._bus = bus
+        self._max_in_flight = max_in_flight
+        self._on_checkpoint = on_checkpoint
+        self._skip_failed = skip_failed
+        self._start_offset = start_offset
+
+        # Offsets of events handled after an event that's still in flight
+        self._done: Set[int] = set()
+        self._last_checkpoint = start_offset
+
+        # Offset of the first event that failed, which holds the checkpoint back
+        self._first_failed: Optional[int] = None
+
+        self.stats = ConsumeStats(start_offset)
+
+    async def consume(self, source: Source, **dependencies: Any) -> ConsumeStats:
+        stats = self.stats
+        offset = 0
+        semaphore = asyncio.Semaphore(self._max_in_flight)
+        tasks: Set[asyncio.Future] = set()
+
+        try:
+            async for event in iterate(source):
+                offset += 1
+
+                if offset <= self._start_offset:
+                    continue
+
+                stats.consumed += 1
+
+                if self._max_in_flight == 1:
+                    await self._handle(offset, event, dependencies)
+                    continue
+
+                # Stop pulling from the source while max_in_flight events are being
+                # handled
+                await semaphore.acquire()
+
+                task = asyncio.ensure_future(self._handle(offset, event, dependencies))
+                task.add_done_callback(lambda _: semaphore.release())
+                task.add_done_callback(tasks.discard)
+                tasks.add(task)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+
+            raise
+        finally:
+            stats.finished_at = monotonic()
+
+        if stats.checkpoint > self._last_checkpoint:
+            await self._save_checkpoint()
+
+        return stats
+
+    async def _handle(self, offset: int, event: "Event", dependencies: Dict[str, Any]):
+        stats = self.stats
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+
+        try:
+            await self._bus.handle(event, **dependencies)
+        except Exception:
+            stats.failed += 1
+            logger.exception("Failed to handle %s", event)
+
+            if not self._skip_failed:
+                if self._first_failed is None or offset < self._first_failed:
+                    self._first_failed = offset
+
+                return
+        finally:
+            stats.in_flight -= 1
+            stats.handled += 1
+
+        # The checkpoint is the offset up to which every event has been handled.
+        # Events after a failure can't be counted, so they aren't kept
+        if self._first_failed is not None and offset > self._first_failed:
+            return
+        elif offset == stats.checkpoint + 1:
+            stats.checkpoint = offset
+
+            while stats.checkpoint + 1 in self._done:
+                stats.checkpoint += 1
+                self._done.remove(stats.checkpoint)
+        else:
+            self._done.add(offset)
+
+        if stats.checkpoint - self._last_checkpoint >= self._batch_size:
+            await self._save_checkpoint()
+
+    async def _save_checkpoint(self):
+        self._last_checkpoint = checkpoint = self.stats.checkpoint
+
+        if self._on_checkpoint is not None:
+            await maybe_await(self._on_checkpoint(checkpoint))
+
+
+async def tail_file(
+    path: str,
+    registry: EventRegistry = event_registry,
+    follow: bool = True,
+    poll_interval: float = 0.5,
+    trusted: bool = False,
+) -> AsyncIterator["Event"]:
+    """Yield events from a JSON lines file, decoded with registry. If follow is True,
+    waits for lines to be appended (like tail -f) until cancelled. Lines that are
+    still being written, i.e. without a trailing newline, are held back"""
+    with open(path, "rb") as file:
+        partial = b""
+
+        while True:
+            line = file.readline()
+
+            if line.endswith(b"\n") or (line and not follow):
+                line, partial = partial + line, b""
+
+                if line.strip():
+                    yield registry.decode(json.loads(line), trusted)
+            elif line:
+                partial += line
+            elif follow:
+                await asyncio.sleep(poll_interval)
+            else:
+                break
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any, Coroutine, Iterable, Optional
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.message_bus import MessageBus
+    from cosmic_toolkit.models import Event
+
+
+class SyncRunner:
+    def __init__(self, bus: "MessageBus", background: bool = False):
+        """Call a MessageBus from code that doesn't use asyncio, e.g. batch jobs or
+        task queue workers. The event loop is created once and reused, rather than
+        created per event with asyncio.run(). Handlers may be plain functions.
+
+        By default the loop runs in the calling thread during handle(), which has the
+        lowest overhead but can't be used from several threads or from a running
+        loop. If background is True, the loop runs in a background thread and
+        handle() may be called from any thread"""
+        self._background = background
+        self._bus = bus
+        self._loop = asyncio.new_event_loop()
+        self._thread: Optional[threading.Thread] = None
+
+        if background:
+            self._thread = threading.Thread(
+                target=self._loop.run_forever, name="cosmic-toolkit-loop", daemon=True
+            )
+            self._thread.start()
+
+    def __enter__(self) -> "SyncRunner":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, background={self._background}>"
+
+    @property
+    def bus(self) -> "MessageBus":
+        return self._bus
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def handle(self, event: "Event", **dependencies: Any):
+        self.run(self._bus.handle(event, **dependencies))
+
+    def handle_many(self, events: Iterable["Event"], **dependencies: Any):
+        """Handle events in order in a single pass through the loop"""
+        self.run(self._handle_many(events, dependencies))
+
+    def run(self, coroutine: Coroutine) -> Any:
+        """Run a coroutine, e.g. one that uses a Unit of Work, on the runner's loop"""
+        if self._loop.is_closed():
+            coroutine.close()
+
+            raise RuntimeError(f"{self.__class__.__name__} is closed")
+        elif self._thread is None:
+            return self._loop.run_until_complete(coroutine)
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+        self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        self._loop.close()
+
+    async def _handle_many(self, events: Iterable["Event"], dependencies: Any):
+        for event in events:
+            await self._bus.handle(event, **dependencies)
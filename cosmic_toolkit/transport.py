@@ -0,0 +1,506 @@
+import asyncio
+import json
+import logging
+import struct
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from itertools import count
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from cosmic_toolkit.registry import EventRegistry, UnknownEventType, event_registry
+from cosmic_toolkit.types import JSONSerializer, NormalDict
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.models import Event
+
+logger = logging.getLogger(__name__)
+
+# Frames are a 4 byte big endian length followed by a JSON object
+_LENGTH = struct.Struct(">I")
+
+
+class TransportError(Exception):
+    ...
+
+
+class EventCodec:
+    def __init__(
+        self,
+        event_types: Optional[Iterable[type]] = None,
+        json_serializer: Optional[JSONSerializer] = None,
+        registry: Optional[EventRegistry] = None,
+    ):
+        """Encode batches of events as JSON, tagged with their type's discriminator
+        so that they can be decoded to the same type (see EventRegistry). Events are
+        decoded with registry (defaults to event_registry), or if event_types is
+        given, only those types. json_serializer serializes values that json doesn't
+        support (defaults to DefaultJSONSerializer)"""
+        if json_serializer is None:
+            from cosmic_toolkit.models import DefaultJSONSerializer
+
+            json_serializer = DefaultJSONSerializer()
+
+        if event_types is not None:
+            registry = EventRegistry()
+
+            for event_type in event_types:
+                registry.register(event_type)
+
+        self._json_serializer = json_serializer
+        self._registry = registry if registry is not None else event_registry
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, registry={self._registry!r}>"
+
+    def to_dict(self, event: "Event") -> NormalDict:
+        return self._registry.encode(event)
+
+    def from_dict(self, data: NormalDict) -> "Event":
+        try:
+            return self._registry.decode(data)
+        except UnknownEventType:
+            raise TransportError(f"Unknown event type {data.get('type')!r}") from None
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(
+            value, default=self._json_serializer, separators=(",", ":")
+        ).encode()
+
+    def encode(self, events: Iterable["Event"]) -> bytes:
+        return self.dumps([self.to_dict(event) for event in events])
+
+    def decode(self, data: bytes) -> List["Event"]:
+        return [self.from_dict(item) for item in json.loads(data)]
+
+
+class Batch:
+    def __init__(
+        self,
+        events: List["Event"],
+        on_ack: Callable[["Batch"], None],
+        on_nack: Callable[["Batch"], None],
+        deliveries: int = 1,
+    ):
+        """Events received together. Acknowledge the batch once its events have been
+        handled, or reject it with nack() to have it delivered again. deliveries is
+        the number of times the events have been delivered, including this time"""
+        self.deliveries = deliveries
+        self.events = events
+        self.settled = False
+
+        self._on_ack = on_ack
+        self._on_nack = on_nack
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__}, size={len(self.events)}, "
+            f"deliveries={self.deliveries}>"
+        )
+
+    def ack(self):
+        self._settle(self._on_ack)
+
+    def nack(self):
+        self._settle(self._on_nack)
+
+    def _settle(self, callback: Callable[["Batch"], None]):
+        if self.settled:
+            raise TransportError("Batch is already acknowledged or rejected")
+
+        self.settled = True
+        callback(self)
+
+
+class AbstractTransport(metaclass=ABCMeta):
+    """Moves events between processes. Events are published in batches and
+    subscribers receive batches that they acknowledge once handled (at least once
+    delivery). prefetch limits how many batches a subscriber holds unacknowledged.
+    Rejected batches are delivered again, with their deliveries counted, and it's up
+    to subscribers to give up on them (see MessageBus.run_transport())"""
+
+    @abstractmethod
+    async def publish(self, events: Sequence["Event"]):
+        ...
+
+    @abstractmethod
+    def subscribe(self, batch_size: int = 100) -> AsyncIterator[Batch]:
+        ...
+
+    async def close(self):
+        ...
+
+    def create_handler(self) -> Callable:
+        """Create a MessageBus handler that publishes the events it handles"""
+
+        async def publish(event: "Event"):
+            await self.publish([event])
+
+        return publish
+
+
+class InMemoryTransport(AbstractTransport):
+    def __init__(self, prefetch: int = 1, codec: Optional[EventCodec] = None):
+        """Transport within a process, for tests. If codec is given, events are
+        encoded and decoded when published so that serialization is tested too"""
+        self._codec = codec
+        self._events = deque()
+        self._prefetch = prefetch
+        self._unsettled = 0
+
+        # Rejected batches with their number of deliveries, delivered before events
+        # that haven't been delivered yet
+        self._rejected: Deque[Tuple[List["Event"], int]] = deque()
+
+        # Created on first use, since asyncio primitives bind to the running event
+        # loop on Python < 3.10
+        self._published: Optional[asyncio.Event] = None
+        self._settled: Optional[asyncio.Event] = None
+
+        self.acked = 0
+        self.nacked = 0
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, pending={len(self._events)}>"
+
+    @property
+    def pending(self) -> int:
+        return len(self._events) + sum(len(events) for events, _ in self._rejected)
+
+    async def publish(self, events: Sequence["Event"]):
+        if self._codec is not None:
+            events = self._codec.decode(self._codec.encode(events))
+
+        self._events.extend(events)
+        self._notify_published()
+
+    async def subscribe(self, batch_size: int = 100) -> AsyncIterator[Batch]:
+        if self._published is None:
+            self._published = asyncio.Event()
+            self._settled = asyncio.Event()
+
+        while True:
+            while self._unsettled >= self._prefetch:
+                self._settled.clear()
+                await self._settled.wait()
+
+            while not self._events and not self._rejected:
+                self._published.clear()
+                await self._published.wait()
+
+            if self._rejected:
+                events, deliveries = self._rejected.popleft()
+                self._unsettled += 1
+
+                # Nothing else may suspend, so let other tasks run before delivering
+                # a batch that keeps being rejected
+                await asyncio.sleep(0)
+
+                yield Batch(events, self._ack, self._nack, deliveries + 1)
+                continue
+
+            events = []
+
+            while self._events and len(events) < batch_size:
+                events.append(self._events.popleft())
+
+            self._unsettled += 1
+
+            yield Batch(events, self._ack, self._nack)
+
+    def _ack(self, batch: Batch):
+        self.acked += 1
+        self._release()
+
+    def _nack(self, batch: Batch):
+        self.nacked += 1
+        self._rejected.append((batch.events, batch.deliveries))
+        self._notify_published()
+        self._release()
+
+    def _notify_published(self):
+        if self._published is not None:
+            self._published.set()
+
+    def _release(self):
+        self._unsettled -= 1
+        self._settled.set()
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Optional[NormalDict]:
+    try:
+        header = await reader.readexactly(_LENGTH.size)
+        (length,) = _LENGTH.unpack(header)
+
+        return json.loads(await reader.readexactly(length))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def _write_frame(writer: asyncio.StreamWriter, data: bytes):
+    writer.write(_LENGTH.pack(len(data)) + data)
+
+
+class UnixSocketTransport(AbstractTransport):
+    def __init__(
+        self,
+        path: str,
+        codec: EventCodec,
+        prefetch: int = 8,
+        max_batch_size: int = 500,
+    ):
+        """Transport over a Unix domain socket, without a broker. Subscribers listen
+        on path and publishers connect to it. Events that are published in the same
+        event loop iteration are sent in one frame of up to max_batch_size events.
+
+        Publishers keep frames until the subscriber acknowledges them and send
+        rejected frames again. Use flush() to wait for acknowledgements"""
+        self._codec = codec
+        self._max_batch_size = max_batch_size
+        self._path = path
+        self._prefetch = prefetch
+
+        # Publisher state
+        self._buffer: List["Event"] = []
+        self._connecting: Optional[asyncio.Future] = None
+        self._flush_scheduled = False
+        self._reader_task: Optional[asyncio.Task] = None
+        self._sequence = count()
+        self._unacked: Dict[int, NormalDict] = {}
+        self._unacked_changed: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+        # Subscriber state
+        self._batches: Optional[asyncio.Queue] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._settled: Optional[asyncio.Event] = None
+        self._unsettled = 0
+
+        # Frames acked or rejected by this subscriber, and frames sent, acked by the
+        # subscriber or resent by this publisher
+        self.acked = 0
+        self.nacked = 0
+        self.frames_acked = 0
+        self.frames_received = 0
+        self.frames_resent = 0
+        self.frames_sent = 0
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__}, path={self._path!r}>"
+
+    async def listen(self):
+        """Start accepting publishers. Called by subscribe() if needed"""
+        if self._server is not None:
+            return
+
+        self._batches = asyncio.Queue(self._prefetch)
+        self._settled = asyncio.Event()
+        self._server = await asyncio.start_unix_server(self._serve, self._path)
+
+    async def subscribe(self, batch_size: int = 100) -> AsyncIterator[Batch]:
+        """Yield batches as they're received, holding at most prefetch batches
+        unacknowledged. Frames larger than batch_size are split into several batches;
+        the frame is acknowledged once all of them are, and sent again if any of them
+        is rejected"""
+        await self.listen()
+
+        while True:
+            events, writer, sequence, deliveries = await self._batches.get()
+            batches = [
+                events[i : i + batch_size] for i in range(0, len(events), batch_size)
+            ]
+            frame = _FrameState(writer, sequence, len(batches), self)
+
+            for events in batches:
+                while self._unsettled >= self._prefetch:
+                    self._settled.clear()
+                    await self._settled.wait()
+
+                self._unsettled += 1
+
+                yield Batch(events, frame.ack, frame.nack, deliveries)
+
+    async def publish(self, events: Sequence["Event"]):
+        await self._connect()
+
+        self._buffer.extend(events)
+
+        if len(self._buffer) >= self._max_batch_size:
+            self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_event_loop().call_soon(self._flush)
+
+        await self._writer.drain()
+
+    async def flush(self):
+        """Send buffered events and wait until every frame has been acknowledged"""
+        if self._writer is None:
+            return
+
+        self._flush()
+        await self._writer.drain()
+
+        while self._unacked:
+            if self._reader_task.done():
+                raise TransportError("Connection closed before frames were acked")
+
+            self._unacked_changed.clear()
+            await self._unacked_changed.wait()
+
+    async def close(self):
+        if self._writer is not None:
+            await self.flush()
+            self._writer.close()
+            self._writer = None
+            await self._reader_task
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _connect(self):
+        if self._writer is not None:
+            return
+        elif self._connecting is not None:
+            await asyncio.shield(self._connecting)
+
+            return
+
+        self._connecting = asyncio.get_event_loop().create_future()
+
+        try:
+            reader, writer = await asyncio.open_unix_connection(self._path)
+        except BaseException as e:
+            self._connecting.set_exception(e)
+            self._connecting = None
+            raise
+
+        self._unacked_changed = asyncio.Event()
+        self._reader_task = asyncio.ensure_future(self._read_acks(reader))
+        self._writer = writer
+        self._connecting.set_result(None)
+        self._connecting = None
+
+    def _flush(self):
+        self._flush_scheduled = False
+
+        while self._buffer and self._writer is not None:
+            events = self._buffer[: self._max_batch_size]
+            del self._buffer[: self._max_batch_size]
+
+            sequence = next(self._sequence)
+            frame = {
+                "sequence": sequence,
+                "events": [self._codec.to_dict(event) for event in events],
+            }
+            self._unacked[sequence] = frame
+            self._send(frame)
+
+    def _send(self, frame: NormalDict):
+        _write_frame(self._writer, self._codec.dumps(frame))
+        self.frames_sent += 1
+
+    async def _read_acks(self, reader: asyncio.StreamReader):
+        while True:
+            frame = await _read_frame(reader)
+
+            if frame is None:
+                break
+
+            sequence = frame["sequence"]
+
+            if frame["ack"]:
+                self.frames_acked += 1
+                self._unacked.pop(sequence, None)
+            elif sequence in self._unacked and self._writer is not None:
+                # The subscriber sees how many times the frame was delivered, to give
+                # up on events that keep failing
+                unacked = self._unacked[sequence]
+                unacked["deliveries"] = unacked.get("deliveries", 1) + 1
+                self.frames_resent += 1
+                self._send(unacked)
+
+            self._unacked_changed.set()
+
+        self._unacked_changed.set()
+
+    def _release_batch(self):
+        self._unsettled -= 1
+        self._settled.set()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                frame = await _read_frame(reader)
+
+                if frame is None:
+                    break
+
+                self.frames_received += 1
+                events = [self._codec.from_dict(item) for item in frame["events"]]
+
+                # Stops reading from the socket while prefetch frames are waiting
+                deliveries = frame.get("deliveries", 1)
+                await self._batches.put((events, writer, frame["sequence"], deliveries))
+        except Exception:
+            logger.exception("Failed to read from publisher")
+        finally:
+            writer.close()
+
+
+class _FrameState:
+    __slots__ = ("nacked", "remaining", "sequence", "transport", "writer")
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        sequence: int,
+        batches: int,
+        transport: UnixSocketTransport,
+    ):
+        self.nacked = False
+        self.remaining = batches
+        self.sequence = sequence
+        self.transport = transport
+        self.writer = writer
+
+    def ack(self, batch: Batch):
+        self._settle()
+
+    def nack(self, batch: Batch):
+        self.nacked = True
+        self._settle()
+
+    def _settle(self):
+        self.transport._release_batch()
+        self.remaining -= 1
+
+        if self.remaining:
+            return
+        elif self.nacked:
+            self.transport.nacked += 1
+        else:
+            self.transport.acked += 1
+
+        if not self.writer.is_closing():
+            frame = {"sequence": self.sequence, "ack": not self.nacked}
+            _write_frame(self.writer, json.dumps(frame).encode())
@@ -1,38 +1,99 @@
 from abc import ABCMeta, abstractmethod
-from typing import Dict, Generator, List
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
 
 from cosmic_toolkit.models import Event
 from cosmic_toolkit.repository import AbstractRepository
+from cosmic_toolkit.session import AbstractSessionProvider
+from cosmic_toolkit.types import NormalDict
+
+if TYPE_CHECKING:
+    from cosmic_toolkit.locking import LockManager
 
 
 class BaseUnitOfWork(metaclass=ABCMeta):
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        *args,
+        session_provider: Optional[AbstractSessionProvider] = None,
+        weak_tracking: bool = False,
+        lock_manager: Optional["LockManager"] = None,
+        **kwargs,
+    ):
         """Instantiate Unit of Work - arguments are passed into constructors of
-        repositories"""
+        repositories. If session_provider is given, a session is leased from it
+        whenever the Unit of Work is entered and shared by all repositories.
+
+        Repositories stop tracking aggregates when the Unit of Work exits, keeping
+        their unpublished events for collect_new_events(). If weak_tracking is True,
+        repositories track aggregates with weak references (see
+        AbstractRepository.track_weakly()).
+
+        If lock_manager is given, lock() acquires locks that are held until the Unit
+        of Work exits"""
         self._args = args
+        self._entered = False
         self._kwargs = kwargs
+        self._lock_manager = lock_manager
+        self._locked_keys: List[Tuple[Hashable, ...]] = []
         self._repositories: Dict[str, AbstractRepository] = {}
+        self._session: Any = None
+        self._session_depth = 0
+        self._session_provider = session_provider
+        self._weak_tracking = weak_tracking
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__()
+
+        # Subclasses of a Unit of Work inherit its repositories
         cls._repository_classes = {
-            k: v for k, v in kwargs.items() if issubclass(v, AbstractRepository)
+            **getattr(cls, "_repository_classes", {}),
+            **{k: v for k, v in kwargs.items() if issubclass(v, AbstractRepository)},
         }
 
     async def __aenter__(self) -> "BaseUnitOfWork":
-        # Instantiate repositories if they haven't been instantiated
-        if not self._repositories:
-            self._repositories = {
-                k: v(*self._args, **self._kwargs)
-                for k, v in self._repository_classes.items()
-            }
+        # Repositories are instantiated on first access (see __getattr__()) so
+        # handlers only pay for the repositories that they use
+        self._entered = True
+
+        # Nested usage shares the session that was leased by the outermost block
+        if self._session_provider and not self._session_depth:
+            self._bind_session(await self._acquire_session())
+
+        self._session_depth += 1
 
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        # If transaction is committed, rollback shouldn't error
-        # This is here as a fallback
-        await self.rollback()
+        try:
+            # If transaction is committed, rollback shouldn't error
+            # This is here as a fallback
+            await self.rollback()
+        finally:
+            self._session_depth -= 1
+
+            if not self._session_depth:
+                # Release aggregates so that a long-lived Unit of Work doesn't keep
+                # every aggregate it has seen alive
+                self.release()
+
+                if self._locked_keys:
+                    self._release_locks()
+
+            if self._session_provider and not self._session_depth:
+                session = self._session
+                self._bind_session(None)
+
+                await self._release_session(session)
 
     def __eq__(self, other: "BaseUnitOfWork") -> bool:
         return self.__repr__() == other.__repr__()
@@ -40,12 +101,21 @@ class BaseUnitOfWork(metaclass=ABCMeta):
     def __getattr__(self, item: str) -> AbstractRepository:
         # Enable accessing repositories as attributes
         # E.g. uow.customers.add()
+        # Look up instance attributes via __dict__ to avoid recursing into
+        # __getattr__() if the instance isn't fully initialized
+        attributes = self.__dict__
+
         try:
-            return self._repositories[item]
+            return attributes["_repositories"][item]
         except KeyError:
-            raise AttributeError(
-                f"{self.__class__.__name__} does not have {item!r} repository"
-            )
+            pass
+
+        if attributes.get("_entered") and item in self._repository_classes:
+            return self._create_repository(item)
+
+        raise AttributeError(
+            f"{self.__class__.__name__} does not have {item!r} repository"
+        )
 
     def __repr__(self):
         return (
@@ -53,11 +123,100 @@ class BaseUnitOfWork(metaclass=ABCMeta):
             f"repositories={[r.__repr__() for r in self._repositories.values()]}>"
         )
 
+    @property
+    def session(self) -> Any:
+        """Session shared by repositories; None when a session provider isn't used or
+        the Unit of Work isn't active"""
+        return self._session
+
+    def _create_repository(self, name: str) -> AbstractRepository:
+        repository = self._repository_classes[name](*self._args, **self._kwargs)
+        repository.session = self._session
+        self._repositories[name] = repository
+
+        if self._weak_tracking:
+            repository.track_weakly()
+
+        return repository
+
+    async def _acquire_session(self) -> Any:
+        return await self._session_provider.acquire()
+
+    def _bind_session(self, session: Any):
+        self._session = session
+
+        for repository in self._repositories.values():
+            repository.session = session
+
+    async def _release_session(self, session: Any):
+        await self._session_provider.release(session)
+
+    async def lock(self, *keys: Hashable, timeout: Optional[float] = None):
+        """Acquire locks of keys (e.g. aggregate ids) with the lock manager, to be
+        released when the Unit of Work exits (see LockManager.acquire())"""
+        if self._lock_manager is None:
+            raise RuntimeError(f"{self.__class__.__name__} has no lock manager")
+        elif not self._session_depth:
+            raise RuntimeError(f"{self.__class__.__name__} must be entered to lock")
+
+        await self._lock_manager.acquire(*keys, timeout=timeout)
+        self._locked_keys.append(keys)
+
+    def _release_locks(self):
+        locked_keys, self._locked_keys = self._locked_keys, []
+
+        for keys in reversed(locked_keys):
+            self._lock_manager.release(*keys)
+
+    def release(self):
+        """Stop tracking aggregates, keeping their unpublished events to be
+        collected"""
+        for repository in self._repositories.values():
+            repository.release()
+
+    def memory_report(self) -> Dict[str, NormalDict]:
+        """Number of tracked aggregates and pending events per instantiated
+        repository"""
+        return {
+            name: repository.memory_report()
+            for name, repository in self._repositories.items()
+        }
+
+    def tracking_counts(self) -> Tuple[int, int]:
+        """Total number of aggregates that repositories have tracked, and number of
+        unpublished events that they hold, e.g. to attribute memory to handlers"""
+        repositories = self._repositories.values()
+
+        return (
+            sum(r.tracked_total for r in repositories),
+            sum(r.count_unpublished_events() for r in repositories),
+        )
+
+    def reset(self):
+        """Clear identity state (aggregates tracked by repositories and their
+        unpublished events) so the Unit of Work can be reused. Repositories are kept"""
+        if self._session_depth:
+            raise RuntimeError(f"Cannot reset {self.__class__.__name__} while in use")
+
+        for repository in self._repositories.values():
+            repository.reset()
+
     def collect_new_events(self) -> Generator[List[Event], None, None]:
         for repository in self._repositories.values():
-            for entity in repository.seen:
+            pending = repository.pending_events
+
+            while pending:
+                yield pending.popleft()
+
+            for entity in list(repository.seen):
                 yield from entity.events
 
+    def discard_new_events(self):
+        """Drop events that haven't been collected, so that a failed handler's
+        events aren't published by the next handler that uses the Unit of Work"""
+        for repository in self._repositories.values():
+            repository.discard_events()
+
     @abstractmethod
     async def commit(self):
         ...
@@ -65,3 +224,35 @@ class BaseUnitOfWork(metaclass=ABCMeta):
     @abstractmethod
     async def rollback(self):
         ...
+
+
+class UnitOfWorkPool:
+    def __init__(self, factory: Callable[[], BaseUnitOfWork], max_size: int = 64):
+        """Recycles units of work so that short-lived (e.g. per request) units of work
+        don't reallocate their repositories. factory is typically the Unit of Work
+        class or a partial of it"""
+        self._factory = factory
+        self._idle: List[BaseUnitOfWork] = []
+        self._max_size = max_size
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__name__}, max_size={self._max_size}, "
+            f"idle={len(self._idle)}>"
+        )
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def acquire(self) -> BaseUnitOfWork:
+        if self._idle:
+            return self._idle.pop()
+
+        return self._factory()
+
+    def release(self, uow: BaseUnitOfWork):
+        uow.reset()
+
+        if len(self._idle) < self._max_size:
+            self._idle.append(uow)
@@ -0,0 +1,24 @@
+from inspect import isawaitable
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, TypeVar, Union
+
+T = TypeVar("T")
+
+
+async def maybe_await(value: Any) -> Any:
+    """Await value if it's awaitable. Enables hooks and factories to be either plain
+    functions or coroutine functions"""
+    if isawaitable(value):
+        return await value
+
+    return value
+
+
+async def iterate(items: Union[Iterable[T], AsyncIterable[T]]) -> AsyncIterator[T]:
+    """Iterate over an iterable or an async iterable, e.g. an event history that may
+    be read from a file or streamed from a database"""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
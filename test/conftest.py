@@ -88,6 +88,36 @@ class TestUnitOfWork(
         ...
 
 
+class EventListUnitOfWork(BaseUnitOfWork):
+    """Unit of Work without repositories. Handlers publish events by appending them
+    to events"""
+
+    def __init__(self):
+        super().__init__()
+
+        self.events = []
+
+    def collect_new_events(self):
+        while self.events:
+            yield self.events.pop(0)
+
+    async def commit(self):
+        ...
+
+    async def rollback(self):
+        ...
+
+
+class Clock:
+    """Clock for rate limits and expiry, which only moves when now is set"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
 @pytest.fixture
 def test_entities() -> Dict[str, Type[Entity]]:
     return {
@@ -115,3 +145,13 @@ def test_repositories() -> Dict[str, Type[TestRepositoryA]]:
 @pytest.fixture
 def test_unit_of_work() -> Type[TestUnitOfWork]:
     return TestUnitOfWork
+
+
+@pytest.fixture
+def test_event_list_unit_of_work() -> Type[EventListUnitOfWork]:
+    return EventListUnitOfWork
+
+
+@pytest.fixture
+def test_clock() -> Clock:
+    return Clock()
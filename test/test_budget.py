@@ -0,0 +1,96 @@
+from typing import Type
+
+import pytest
+
+from cosmic_toolkit import BaseUnitOfWork, Event, MessageBus
+from cosmic_toolkit.budget import CascadeBudget, CascadeLimitExceeded
+
+pytestmark = pytest.mark.asyncio
+
+
+class SetpointChanged(Event):
+    device_id: str
+    value: int
+
+
+class SetpointApplied(Event):
+    device_id: str
+    value: int
+
+
+async def change(event: SetpointChanged, uow: BaseUnitOfWork):
+    uow.events.append(SetpointApplied(device_id=event.device_id, value=event.value))
+
+
+async def apply(event: SetpointApplied, uow: BaseUnitOfWork):
+    # Applying a setpoint changes it again, until it reaches 0
+    if event.value:
+        uow.events.append(
+            SetpointChanged(device_id=event.device_id, value=event.value - 1)
+        )
+
+
+def _create_bus(
+    budget: CascadeBudget, unit_of_work_factory: Type[BaseUnitOfWork]
+) -> MessageBus:
+    return MessageBus(
+        {SetpointChanged: [change], SetpointApplied: [apply]},
+        unit_of_work_factory=unit_of_work_factory,
+        cascade_budget=budget,
+    )
+
+
+async def test_cascade_cycle_detection(test_event_list_unit_of_work):
+    budget = CascadeBudget(aggregate_key="device_id")
+    message_bus = _create_bus(budget, test_event_list_unit_of_work)
+
+    with pytest.raises(CascadeLimitExceeded) as exc_info:
+        await message_bus.handle(SetpointChanged(device_id="a", value=10))
+
+    error = exc_info.value
+
+    assert error.limit == "cycle"
+    assert [e.__class__ for e in error.chain] == [
+        SetpointChanged,
+        SetpointApplied,
+        SetpointChanged,
+    ]
+    assert str(error) == (
+        "Cascade cycle detected: SetpointChanged -> SetpointApplied -> SetpointChanged"
+    )
+    assert budget.exceeded["cycle"] == 1
+
+
+async def test_cascade_limits(test_event_list_unit_of_work):
+    budget = CascadeBudget(max_depth=5, max_events=100)
+    message_bus = _create_bus(budget, test_event_list_unit_of_work)
+
+    # Depth 3
+    await message_bus.handle(SetpointChanged(device_id="a", value=1))
+
+    # Depth 5, near the limit
+    await message_bus.handle(SetpointChanged(device_id="a", value=2))
+
+    with pytest.raises(CascadeLimitExceeded) as exc_info:
+        await message_bus.handle(SetpointChanged(device_id="a", value=3))
+
+    assert exc_info.value.limit == "depth"
+    assert exc_info.value.maximum == 5
+    assert len(exc_info.value.chain) == 7
+
+    budget.max_depth = None
+    budget.max_events = 4
+
+    with pytest.raises(CascadeLimitExceeded) as exc_info:
+        await message_bus.handle(SetpointChanged(device_id="a", value=3))
+
+    assert exc_info.value.limit == "events"
+    assert budget.dict()["exceeded"] == {
+        "cycle": 0,
+        "depth": 1,
+        "duration": 0,
+        "events": 1,
+    }
+    assert budget.cascades == 4
+    assert budget.near_limit == 1
+    assert budget.max_depth_seen == 6
@@ -0,0 +1,182 @@
+import asyncio
+
+import pytest
+
+from cosmic_toolkit import Container, Event, MessageBus
+
+pytestmark = pytest.mark.asyncio
+
+
+class Thing:
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ThingRequested(Event):
+    ...
+
+
+async def test_container_lifetimes():
+    created = []
+
+    async def create_client() -> Thing:
+        created.append("client")
+        return Thing("client")
+
+    def create_session(client: Thing) -> Thing:
+        created.append("session")
+        return Thing(f"session for {client.name}")
+
+    container = Container()
+    container.singleton("client", create_client, teardown=Thing.close)
+    container.scoped("session", create_session, teardown=Thing.close)
+    container.transient("request", lambda: Thing("request"))
+
+    # Nothing is created until dependencies are resolved
+    assert created == []
+
+    async with container.scope() as scope_a:
+        session = await scope_a.resolve("session")
+
+        assert session.name == "session for client"
+        assert await scope_a.resolve("session") is session
+        assert await scope_a.resolve("request") is not await scope_a.resolve("request")
+
+    assert session.closed
+
+    async with container.scope() as scope_b:
+        assert await scope_b.resolve("session") is not session
+        client = await scope_b.resolve("client")
+
+    assert created == ["client", "session", "session"]
+    assert not client.closed
+
+    await container.aclose()
+
+    assert client.closed
+
+
+async def test_container_circular_dependency():
+    container = Container()
+    container.scoped("a", lambda b: b)
+    container.scoped("b", lambda a: a)
+
+    with pytest.raises(RuntimeError) as e:
+        await container.scope().resolve("a")
+
+    assert str(e.value) == "Circular dependency detected: a -> b -> a"
+
+
+async def test_message_bus_container():
+    received = []
+
+    async def handler(event: ThingRequested, thing: Thing, name: str):
+        received.append((thing, name))
+
+    container = Container()
+    container.scoped("thing", lambda name: Thing(name), teardown=Thing.close)
+    message_bus = MessageBus(
+        {ThingRequested: [handler, handler]}, container=container, name="a"
+    )
+
+    await message_bus.handle(ThingRequested())
+    await message_bus.handle(ThingRequested(), name="b")
+
+    # Scoped dependencies are shared within a cascade and torn down afterwards
+    assert received[0][0] is received[1][0]
+    assert received[1][0] is not received[2][0]
+    assert [thing.name for thing, _ in received] == ["a", "a", "b", "b"]
+    assert all(thing.closed for thing, _ in received)
+
+    # Dependencies passed to the bus take precedence over the container's
+    await message_bus.handle(ThingRequested(), thing=Thing("c"))
+
+    assert received[-1][0].name == "c"
+
+
+async def test_message_bus_container_unit_of_work(
+    test_entities, test_events, test_unit_of_work
+):
+    received = []
+
+    async def publish(event: ThingRequested, uow):
+        async with uow:
+            entity = test_entities["EntityA"].init("hello")
+            entity._add_event(test_events["ATriggered"]())
+
+            await uow.a_items.add(entity)
+            await uow.commit()
+
+    async def record(event, uow):
+        received.append((event, uow))
+
+    container = Container()
+    container.scoped("uow", test_unit_of_work)
+    message_bus = MessageBus(
+        {ThingRequested: [publish], test_events["ATriggered"]: [record]},
+        container=container,
+    )
+
+    await message_bus.handle(ThingRequested())
+
+    # Events are collected from the Unit of Work provided by the container
+    assert len(received) == 1
+    assert isinstance(received[0][0], test_events["ATriggered"])
+
+
+async def test_container_singleton_dependencies():
+    container = Container()
+    container.singleton("a", lambda a: a)
+    container.singleton("b", lambda c: c)
+    container.singleton("c", lambda b: b)
+    container.singleton("client", lambda name: Thing(name))
+    container.scoped("session", lambda: Thing("session"))
+    container.singleton("pool", lambda session: session)
+
+    async with container.scope({"name": "cascade"}, {"name": "bus"}) as scope:
+        # Cycles are detected rather than waiting for the singleton's own lock
+        for name, cycle in [("a", "a -> a"), ("b", "b -> c -> b")]:
+            with pytest.raises(RuntimeError) as e:
+                await asyncio.wait_for(scope.resolve(name), 1)
+
+            assert str(e.value) == f"Circular dependency detected: {cycle}"
+
+        # Singletons don't capture dependencies of the scope that resolves them
+        assert (await scope.resolve("client")).name == "bus"
+
+        with pytest.raises(RuntimeError) as e:
+            await scope.resolve("pool")
+
+        assert str(e.value) == "Singleton 'pool' can't depend on scoped 'session'"
+
+
+@pytest.mark.parametrize("lifetime", ["scoped", "singleton", "transient"])
+async def test_message_bus_container_unit_of_work_lifetimes(
+    lifetime, test_entities, test_events, test_unit_of_work
+):
+    received = []
+
+    async def publish(event: ThingRequested, uow):
+        async with uow:
+            entity = test_entities["EntityA"].init("hello")
+            entity._add_event(test_events["ATriggered"]())
+
+            await uow.a_items.add(entity)
+
+    async def record(event):
+        received.append(event)
+
+    container = Container()
+    container.register("uow", test_unit_of_work, lifetime)
+    message_bus = MessageBus(
+        {ThingRequested: [publish], test_events["ATriggered"]: [record]},
+        container=container,
+    )
+
+    await message_bus.handle(ThingRequested())
+
+    assert len(received) == 1
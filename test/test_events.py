@@ -0,0 +1,91 @@
+import pickle
+from typing import ClassVar, List, Optional
+
+import pytest
+
+from cosmic_toolkit import Event, LightweightEvent, MessageBus
+from cosmic_toolkit.events import EventValidationError
+
+pytestmark = pytest.mark.asyncio
+
+
+class SensorReadingReceived(LightweightEvent):
+    message: str
+    quality: int = 100
+
+
+class AlarmTelemetryReceived(SensorReadingReceived):
+    severity: ClassVar[str] = "high"
+    tags: Optional[List[str]] = None
+
+
+class SuiteReserved(Event):
+    number: str
+
+
+def test_lightweight_event():
+    event = AlarmTelemetryReceived(message="fire", tags=["lobby"])
+
+    assert event.dict() == {"message": "fire", "quality": 100, "tags": ["lobby"]}
+    assert event.severity == "high"
+    assert repr(event) == (
+        "AlarmTelemetryReceived(message='fire', quality=100, tags=['lobby'])"
+    )
+    assert not hasattr(event, "__dict__")
+
+    # Events are immutable
+    with pytest.raises(TypeError):
+        event.message = "smoke"
+
+    assert event.copy(message="smoke").message == "smoke"
+
+    # Arguments must be passed by keyword
+    with pytest.raises(TypeError):
+        SensorReadingReceived("fire")
+
+
+def test_lightweight_event_eq_hash_pickle():
+    event = SensorReadingReceived(message="hello")
+
+    assert event == SensorReadingReceived(message="hello")
+    assert event != SensorReadingReceived(message="hello", quality=50)
+    assert len({event, SensorReadingReceived(message="hello")}) == 1
+    assert pickle.loads(pickle.dumps(event)) == event
+
+
+def test_lightweight_event_parse_obj():
+    event = AlarmTelemetryReceived.parse_obj({"message": "fire", "tags": None})
+
+    assert event == AlarmTelemetryReceived(message="fire")
+
+    with pytest.raises(EventValidationError) as e:
+        AlarmTelemetryReceived.parse_obj({"quality": "high", "tags": "x", "a": 1})
+
+    message = str(e.value)
+
+    assert message.startswith(
+        "AlarmTelemetryReceived: unknown field 'a'; field 'message' is required; "
+        "field 'quality' expects <class 'int'>, got str; "
+    )
+    assert "field 'tags' expects" in message
+
+
+def test_event_trusted():
+    event = SuiteReserved.trusted(number="1280")
+
+    assert isinstance(event, SuiteReserved)
+    assert event.number == "1280"
+
+
+async def test_message_bus_handle_lightweight_event():
+    received = []
+
+    async def handler(event: SensorReadingReceived):
+        received.append(event)
+
+    message_bus = MessageBus({SensorReadingReceived: [handler]})
+
+    # Handlers are found using the event's type and parents' types
+    await message_bus.handle(AlarmTelemetryReceived(message="fire"))
+
+    assert received == [AlarmTelemetryReceived(message="fire")]
@@ -0,0 +1,152 @@
+import pytest
+
+from cosmic_toolkit import BaseUnitOfWork, Event, MessageBus
+from cosmic_toolkit.idempotency import DedupIndex
+from cosmic_toolkit.rate_limiting import DROP, RateLimiter
+
+pytestmark = pytest.mark.asyncio
+
+
+class MessageReceived(Event):
+    message_id: str
+    value: int
+
+
+class MessageStored(Event):
+    message_id: str
+
+
+def test_dedup_index(test_clock):
+    index = DedupIndex(max_size=2, ttl=10, clock=test_clock)
+
+    assert not index.check("a")
+    assert not index.check("b")
+    assert index.check("a")
+
+    # b is the least recently seen key
+    assert not index.check("c")
+    assert "b" not in index
+    assert "a" in index
+
+    test_clock.now = 10
+
+    assert not index.check("a")
+    assert index.dict() == {
+        "size": 1,
+        "hits": 1,
+        "misses": 4,
+        "evicted": 1,
+        "expired": 2,
+    }
+
+
+async def test_message_bus_skips_duplicates(test_event_list_unit_of_work):
+    handled = []
+
+    async def store(event: MessageReceived, uow: BaseUnitOfWork):
+        handled.append(event.value)
+
+        if event.value < 0:
+            raise ValueError()
+
+        # The same event is published twice within the cascade
+        uow.events.append(MessageStored(message_id=event.message_id))
+        uow.events.append(MessageStored(message_id=event.message_id))
+
+    async def record(event: MessageStored):
+        handled.append(event.message_id)
+
+    message_bus = MessageBus(
+        {MessageReceived: [store], MessageStored: [record]},
+        unit_of_work_factory=test_event_list_unit_of_work,
+        idempotency_key="message_id",
+    )
+
+    await message_bus.handle(MessageReceived(message_id="a", value=1))
+    await message_bus.handle(MessageReceived(message_id="a", value=1))
+
+    assert handled == [1, "a"]
+
+    # Events that fail are handled when delivered again
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await message_bus.handle(MessageReceived(message_id="b", value=-1))
+
+    assert handled == [1, "a", -1, -1]
+    assert message_bus.dedup_index.hits == 2
+
+
+async def test_message_bus_forgets_keys_of_failed_cascades(
+    test_event_list_unit_of_work,
+):
+    handled = []
+
+    async def store(event: MessageReceived, uow: BaseUnitOfWork):
+        handled.append(event.value)
+        uow.events.append(MessageStored(message_id=event.message_id))
+
+    async def record(event: MessageStored):
+        handled.append(event.message_id)
+
+        if len(handled) == 2:
+            raise ValueError()
+
+    message_bus = MessageBus(
+        {MessageReceived: [store], MessageStored: [record]},
+        unit_of_work_factory=test_event_list_unit_of_work,
+        idempotency_key="message_id",
+    )
+
+    # The published event fails, so the event that published it isn't a duplicate
+    # when it's delivered again
+    with pytest.raises(ValueError):
+        await message_bus.handle(MessageReceived(message_id="a", value=1))
+
+    await message_bus.handle(MessageReceived(message_id="a", value=1))
+
+    assert handled == [1, "a", 1, "a"]
+
+
+async def test_message_bus_forgets_keys_of_rate_limited_events(test_clock):
+    handled = []
+
+    async def store(event: MessageReceived):
+        handled.append(event.value)
+
+    rate_limiter = RateLimiter(clock=test_clock)
+    rate_limiter.set_limit(MessageReceived, rate=1, policy=DROP)
+    message_bus = MessageBus(
+        {MessageReceived: [store]},
+        rate_limiter=rate_limiter,
+        idempotency_key="message_id",
+    )
+
+    for message_id in "ab":
+        await message_bus.handle(MessageReceived(message_id=message_id, value=1))
+
+    # The dropped event is handled when it's delivered again
+    rate_limiter.remove_limit(MessageReceived)
+    await message_bus.handle(MessageReceived(message_id="b", value=2))
+
+    assert handled == [1, 2]
+
+
+async def test_message_bus_idempotency_key_function():
+    handled = []
+
+    async def store(event: MessageReceived):
+        handled.append(event.value)
+
+    message_bus = MessageBus(
+        {MessageReceived: [store]},
+        idempotency_key=lambda event: event.value if event.value else None,
+        dedup_index=DedupIndex(max_size=100),
+    )
+
+    for value in [1, 1, 0, 0, 2]:
+        await message_bus.handle(MessageReceived(message_id="a", value=value))
+
+    assert handled == [1, 0, 0, 2]
+
+    with pytest.raises(ValueError):
+        MessageBus({}, dedup_index=DedupIndex())
@@ -0,0 +1,80 @@
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+# Cold import time budget, in microseconds, for `import cosmic_toolkit`. This is
+# generous to avoid flaky failures on slow machines, but low enough to fail if
+# submodules (and thus pydantic) are imported eagerly again
+PACKAGE_IMPORT_BUDGET_US = 50_000
+
+SUBMODULES = [
+    "cosmic_toolkit.dependencies",
+    "cosmic_toolkit.events",
+    "cosmic_toolkit.message_bus",
+    "cosmic_toolkit.models",
+    "cosmic_toolkit.repository",
+    "cosmic_toolkit.session",
+    "cosmic_toolkit.unit_of_work",
+]
+
+
+def _run(code: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+
+def _import_times(code: str, runs: int = 3) -> Dict[str, Tuple[int, int]]:
+    """Import (self, cumulative) times in microseconds per module, using the fastest
+    of a few cold runs to reduce noise"""
+    times = {}
+
+    for _ in range(runs):
+        stderr = _run(code, "-X", "importtime").stderr
+
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+
+            self_us, cumulative_us, module = line[len("import time:") :].split("|")
+            module = module.strip()
+            measured = (int(self_us), int(cumulative_us))
+            times[module] = min(times.get(module, measured), measured)
+
+    return times
+
+
+def test_import_is_lazy():
+    modules = _run(
+        "import sys, cosmic_toolkit; "
+        "print(' '.join(m for m in sys.modules if m.startswith(('cosmic', 'pyd'))))"
+    ).stdout.split()
+
+    assert modules == ["cosmic_toolkit"]
+
+    # The bus and lightweight events don't need pydantic
+    pydantic_imported = _run(
+        "import sys; from cosmic_toolkit import LightweightEvent, MessageBus; "
+        "print('pydantic' in sys.modules)"
+    ).stdout.strip()
+
+    assert pydantic_imported == "False"
+
+
+def test_import_time():
+    package = _import_times("import cosmic_toolkit")["cosmic_toolkit"]
+    times = _import_times("; ".join(f"import {m}" for m in SUBMODULES))
+
+    print("\nmodule                          self [us]  cumulative [us]")
+
+    for module in ["cosmic_toolkit"] + SUBMODULES:
+        self_us, cumulative_us = times[module]
+        print(f"{module:<32}{self_us:>9}{cumulative_us:>17}")
+
+    assert package[1] < PACKAGE_IMPORT_BUDGET_US, (
+        f"Importing cosmic_toolkit took {package[1]}us, "
+        f"budget is {PACKAGE_IMPORT_BUDGET_US}us"
+    )
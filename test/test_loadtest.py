@@ -0,0 +1,82 @@
+import json
+import random
+
+import pytest
+
+from cosmic_toolkit.loadtest import (
+    EventSpec,
+    LatencySummary,
+    LoadTest,
+    Workload,
+    main,
+    parse_distribution,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+def test_parse_event_spec():
+    spec = EventSpec.parse("created,weight=3,fan_out=2,child=updated,handlers=2")
+
+    assert (spec.name, spec.weight, spec.fan_out, spec.child, spec.handlers) == (
+        "created",
+        3.0,
+        2,
+        "updated",
+        2,
+    )
+
+    rng = random.Random(1)
+
+    assert parse_distribution("0.5")(rng) == 0.5
+    assert 0.1 <= parse_distribution("uniform:0.1:0.2")(rng) <= 0.2
+    assert parse_distribution("exp:0.001")(rng) > 0
+
+    with pytest.raises(ValueError):
+        EventSpec.parse("created,color=red")
+
+    with pytest.raises(ValueError):
+        Workload([EventSpec("created", child="updated")])
+
+
+def test_latency_summary():
+    latency = LatencySummary([i / 1000 for i in range(1000, 0, -1)])
+
+    assert (latency.p50, latency.p99, latency.p999, latency.max) == (
+        0.5,
+        0.99,
+        0.999,
+        1.0,
+    )
+    assert LatencySummary([]).p99 == 0.0
+
+
+async def test_load_test():
+    workload = Workload(
+        [
+            EventSpec("created", weight=3, fan_out=2, child="updated"),
+            EventSpec("updated", handlers=2),
+        ],
+        duration=0.2,
+        rate=500,
+        concurrency=4,
+        max_depth=1,
+        seed=1,
+    )
+    report = await LoadTest(workload, interval=0.05).run()
+
+    assert report.failed == 0
+    assert 50 <= report.completed + report.backlog <= 101
+    assert report.handled > report.completed
+    assert report.latency.count == report.completed
+    assert report.latency.p50 <= report.latency.p99 <= report.latency.max
+    assert report.samples and report.samples[0].memory > 0
+    assert "cascades/s" in report.format()
+
+
+def test_main(capsys):
+    main(["--duration", "0.1", "--interval", "0.05", "--max-depth", "1", "--json"])
+    report = json.loads(capsys.readouterr().out)
+
+    assert report["completed"] > 0
+    assert set(report["latency"]) == {"count", "mean", "p50", "p99", "p999", "max"}
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from cosmic_toolkit import BaseUnitOfWork
+from cosmic_toolkit.locking import DeadlockError, LockManager, LockTimeoutError
+
+pytestmark = pytest.mark.asyncio
+
+
+class UnitOfWork(BaseUnitOfWork):
+    async def commit(self):
+        ...
+
+    async def rollback(self):
+        ...
+
+
+async def test_lock_manager_serializes_by_key():
+    lock_manager = LockManager()
+    log = []
+
+    async def increment(key: str, name: str):
+        async with lock_manager.lock(key):
+            log.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            log.append(f"{name} end")
+
+    await asyncio.gather(increment("a", "1"), increment("a", "2"), increment("b", "3"))
+
+    assert log.index("1 end") < log.index("2 start")
+    assert log.index("3 start") < log.index("1 end")
+
+    # Locks are discarded once they're unused
+    assert len(lock_manager) == 0
+    assert lock_manager.dict()["contended"] == 1
+    assert lock_manager.contended_keys == {"a": 1}
+    assert lock_manager.max_wait > 0
+
+    # Locks are reentrant, and keys are deduplicated
+    async with lock_manager.lock("a", "a"):
+        async with lock_manager.lock("a"):
+            ...
+
+        assert lock_manager.locked("a")
+
+    assert not lock_manager.locked("a")
+
+
+async def test_lock_manager_timeout():
+    lock_manager = LockManager(timeout=0.01)
+    held = asyncio.Event()
+    done = asyncio.Event()
+
+    async def hold():
+        async with lock_manager.lock("b"):
+            held.set()
+            await done.wait()
+
+    task = asyncio.ensure_future(hold())
+    await held.wait()
+
+    with pytest.raises(LockTimeoutError) as e:
+        await lock_manager.acquire("a", "b", "c")
+
+    assert e.value.keys == ("a", "b", "c")
+
+    # Keys acquired before the timeout are released
+    assert not lock_manager.locked("a")
+    assert lock_manager.timeouts == 1
+
+    done.set()
+    await task
+
+    await lock_manager.acquire("b", timeout=0)
+    lock_manager.release("b")
+
+    with pytest.raises(RuntimeError):
+        lock_manager.release("b")
+
+
+async def test_lock_manager_detects_deadlocks():
+    lock_manager = LockManager()
+    locked = asyncio.Event()
+
+    async def lock_then(first: str, second: str):
+        async with lock_manager.lock(first):
+            if locked.is_set():
+                await asyncio.sleep(0)
+            else:
+                locked.set()
+                await asyncio.sleep(0.01)
+
+            async with lock_manager.lock(second):
+                return second
+
+    results = await asyncio.gather(
+        lock_then("a", "b"), lock_then("b", "a"), return_exceptions=True
+    )
+
+    # The second task waits for "a", so the first task's wait for "b" would deadlock
+    assert isinstance(results[0], DeadlockError)
+    assert results[0].cycle == ["b", "a"]
+    assert results[1] == "a"
+    assert lock_manager.deadlocks == 1
+    assert len(lock_manager) == 0
+
+
+async def test_unit_of_work_releases_locks():
+    lock_manager = LockManager()
+    uow = UnitOfWork(lock_manager=lock_manager)
+
+    with pytest.raises(RuntimeError):
+        await uow.lock("building-1")
+
+    async with uow:
+        await uow.lock("building-1")
+
+        async with uow:
+            await uow.lock("building-1", "building-2")
+
+        # Nested blocks don't release locks
+        assert lock_manager.locked("building-2")
+
+    assert len(lock_manager) == 0
@@ -1,3 +1,4 @@
+import asyncio
 from typing import List, Optional, Tuple
 
 import pytest
@@ -9,7 +10,10 @@ from cosmic_toolkit import (
     Entity,
     Event,
     MessageBus,
+    UnitOfWorkPool,
 )
+from cosmic_toolkit.message_bus import CascadeTimeoutError, HandlerTimeoutError
+from cosmic_toolkit.retry import DeadLetterStore
 from cosmic_toolkit.types import NormalDict
 
 pytestmark = pytest.mark.asyncio
@@ -173,3 +177,159 @@ async def test_message_bus_handle_raise_error_on_missing_handler():
 
     with pytest.raises(RuntimeError):
         await message_bus.handle(event_a)
+
+
+class TelemetryRecorded(Event):
+    message: str
+
+
+async def record_and_publish_telemetry(event: TelemetryReceived, uow: BaseUnitOfWork):
+    async with uow:
+        point = Telemetry.init(event.message)
+        point._add_event(TelemetryRecorded(message=event.message))
+
+        await uow.telemetry.add(point)
+
+        # Give concurrent cascades a chance to interleave
+        await asyncio.sleep(0)
+        await uow.commit()
+
+
+async def log_recorded_telemetry(
+    event: TelemetryRecorded, uow: BaseUnitOfWork, log: TelemetryLog
+):
+    log.add(id(uow), event.message)
+
+
+async def test_message_bus_unit_of_work_per_cascade():
+    log = TelemetryLog()
+    pool = UnitOfWorkPool(UnitOfWork)
+    message_bus = MessageBus(
+        {
+            TelemetryReceived: [record_and_publish_telemetry],
+            TelemetryRecorded: [log_recorded_telemetry],
+        },
+        unit_of_work_factory=pool,
+        log=log,
+    )
+    messages = [f"message_{i}" for i in range(10)]
+
+    await asyncio.gather(
+        *[message_bus.handle(TelemetryReceived(message=m)) for m in messages]
+    )
+
+    # Every event was handled exactly once, and concurrent cascades used their own
+    # units of work
+    assert sorted(message for _, message in log.log) == sorted(messages)
+    assert len({uow_id for uow_id, _ in log.log}) == len(messages)
+
+    # Units of work were returned to the pool
+    assert pool.idle == len(messages)
+
+
+async def test_message_bus_unit_of_work_per_handler():
+    units_of_work = []
+
+    async def record_unit_of_work(event: TelemetryRecorded, uow: BaseUnitOfWork):
+        units_of_work.append(uow)
+
+    message_bus = MessageBus(
+        {
+            TelemetryReceived: [record_and_publish_telemetry],
+            TelemetryRecorded: [record_unit_of_work, record_unit_of_work],
+        },
+        unit_of_work_factory=UnitOfWork,
+        unit_of_work_scope="handler",
+    )
+
+    await message_bus.handle(TelemetryReceived(message="test123"))
+
+    assert len(units_of_work) == 2
+    assert units_of_work[0] is not units_of_work[1]
+
+
+async def test_message_bus_unit_of_work_passed_in():
+    log = TelemetryLog()
+    uow = UnitOfWork()
+    message_bus = MessageBus(
+        {
+            TelemetryReceived: [record_and_publish_telemetry],
+            TelemetryRecorded: [log_recorded_telemetry],
+        },
+        unit_of_work_factory=UnitOfWork,
+        log=log,
+    )
+
+    await message_bus.handle(TelemetryReceived(message="test123"), uow=uow)
+
+    assert log.log == [(id(uow), "test123")]
+
+
+class RollbackCountingUnitOfWork(UnitOfWork):
+    def __init__(self):
+        super().__init__()
+        self.rollbacks = 0
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+async def slow_record_telemetry(event: TelemetryReceived, uow: BaseUnitOfWork):
+    async with uow:
+        await uow.telemetry.add(Telemetry.init(event.message))
+        await asyncio.sleep(1)
+        await uow.commit()
+
+
+async def test_message_bus_handler_timeout():
+    timeouts = []
+    uow = RollbackCountingUnitOfWork()
+    message_bus = MessageBus(
+        {TelemetryReceived: [slow_record_telemetry]},
+        handler_timeouts={slow_record_telemetry: 0.01},
+        on_timeout=timeouts.append,
+        uow=uow,
+    )
+
+    with pytest.raises(HandlerTimeoutError) as e:
+        await message_bus.handle(TelemetryReceived(message="test123"))
+
+    # The handler was cancelled so the Unit of Work rolled back
+    assert uow.rollbacks == 1
+    assert e.value.handler is slow_record_telemetry
+    assert e.value.elapsed >= 0.01
+    assert timeouts == [e.value]
+
+
+async def test_message_bus_handler_timeout_dead_letter():
+    log = TelemetryLog()
+    dead_letters = DeadLetterStore()
+    message_bus = MessageBus(
+        {TelemetryReceived: [slow_record_telemetry, update_log]},
+        default_handler_timeout=0.01,
+        dead_letters=dead_letters,
+        log=log,
+        uow=UnitOfWork(),
+    )
+
+    await message_bus.handle(TelemetryReceived(message="test123"))
+
+    # The cascade carries on after a handler times out
+    assert len(log.log) == 1
+    assert isinstance(list(dead_letters)[0].exception, HandlerTimeoutError)
+
+
+async def test_message_bus_cascade_timeout():
+    async def slow_handler(event: TelemetryReceived):
+        await asyncio.sleep(0.03)
+
+    message_bus = MessageBus(
+        {TelemetryReceived: [slow_handler, slow_handler]},
+        default_handler_timeout=0.05,
+        cascade_timeout=0.04,
+    )
+
+    with pytest.raises(CascadeTimeoutError) as e:
+        await message_bus.handle(TelemetryReceived(message="test123"))
+
+    assert e.value.elapsed >= 0.04
@@ -0,0 +1,96 @@
+import pytest
+
+from cosmic_toolkit import Event, MessageBus
+from cosmic_toolkit.middleware import Middleware
+from cosmic_toolkit.retry import DeadLetterStore
+
+pytestmark = pytest.mark.asyncio
+
+
+class TelemetryLogged(Event):
+    message: str
+
+
+class LoggingMiddleware(Middleware):
+    def __init__(self, name: str, log: list):
+        self.name = name
+        self.log = log
+        self.wrapped = []
+
+    def wrap_handler(self, handler, call_next):
+        # Called once per handler, not per event
+        self.wrapped.append(handler.__name__)
+
+        async def call(event, dependencies):
+            self.log.append(f"{self.name} before {handler.__name__}")
+            result = await call_next(event, dependencies)
+            self.log.append(f"{self.name} after {handler.__name__}")
+
+            return result
+
+        return call
+
+    def wrap_cascade(self, call_next):
+        async def call(event, dependencies):
+            self.log.append(f"{self.name} cascade {event.message}")
+            await call_next(event, {**dependencies, "user": self.name})
+
+        return call
+
+
+async def test_message_bus_middleware():
+    log = []
+
+    async def store(event: TelemetryLogged, user: str):
+        log.append(f"store {event.message} as {user}")
+
+    def notify(event: TelemetryLogged):
+        log.append(f"notify {event.message}")
+
+    message_bus = MessageBus({TelemetryLogged: [store, notify]}, user="anonymous")
+    outer = LoggingMiddleware("outer", log)
+    inner = LoggingMiddleware("inner", log)
+    message_bus.use(outer)
+    message_bus.use(inner)
+
+    await message_bus.handle(TelemetryLogged(message="a"))
+    await message_bus.handle(TelemetryLogged(message="b"))
+
+    assert log[:10] == [
+        "outer cascade a",
+        "inner cascade a",
+        "outer before store",
+        "inner before store",
+        "store a as inner",
+        "inner after store",
+        "outer after store",
+        "outer before notify",
+        "inner before notify",
+        "notify a",
+    ]
+    assert len(log) == 24
+
+    # Handlers are wrapped when middleware is registered, not when events are handled
+    assert inner.wrapped == ["store", "notify"]
+    assert outer.wrapped == ["store", "notify", "store", "notify"]
+
+
+async def test_message_bus_middleware_replay():
+    log = []
+    failures = [ValueError()]
+
+    async def store(event: TelemetryLogged):
+        if failures:
+            raise failures.pop()
+
+        log.append(f"store {event.message}")
+
+    dead_letters = DeadLetterStore()
+    message_bus = MessageBus({TelemetryLogged: [store]}, dead_letters=dead_letters)
+
+    await message_bus.handle(TelemetryLogged(message="a"))
+
+    message_bus.use(LoggingMiddleware("mw", log))
+    await dead_letters.replay(message_bus)
+
+    assert log == ["mw cascade a", "mw before store", "store a", "mw after store"]
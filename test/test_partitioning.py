@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from cosmic_toolkit import BaseUnitOfWork, Event, MessageBus
+from cosmic_toolkit.partitioning import PartitionedDispatcher, stable_hash
+
+pytestmark = pytest.mark.asyncio
+
+
+class DeviceReadingReceived(Event):
+    device_id: str
+    sequence: int
+
+
+class DeviceReadingStored(Event):
+    device_id: str
+    sequence: int
+
+
+def test_stable_hash():
+    assert stable_hash(7) == 7
+    assert stable_hash("device-1") == stable_hash(b"device-1") == 3073368697
+
+
+async def test_partitioned_dispatcher(test_event_list_unit_of_work):
+    handled = []
+    active = {"now": 0, "max": 0}
+
+    async def store(event: DeviceReadingReceived, uow: BaseUnitOfWork):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+
+        uow.events.append(
+            DeviceReadingStored(device_id=event.device_id, sequence=event.sequence)
+        )
+
+    async def record(event: DeviceReadingStored):
+        handled.append((event.device_id, event.sequence))
+
+    # Shards handle cascades concurrently, so each cascade has its own Unit of Work
+    message_bus = MessageBus(
+        {DeviceReadingReceived: [store], DeviceReadingStored: [record]},
+        unit_of_work_factory=test_event_list_unit_of_work,
+    )
+    dispatcher = PartitionedDispatcher(
+        message_bus, key=lambda event: event.device_id, partitions=2
+    )
+    device_ids = ["a", "d"]
+
+    # Devices a and d are in different shards
+    assert stable_hash("a") % 2 != stable_hash("d") % 2
+
+    async with dispatcher:
+        for sequence in range(3):
+            for device_id in device_ids:
+                await dispatcher.submit(
+                    DeviceReadingReceived(device_id=device_id, sequence=sequence)
+                )
+
+    # Events for a device are handled in order, devices are handled concurrently
+    for device_id in device_ids:
+        assert [s for d, s in handled if d == device_id] == [0, 1, 2]
+
+    assert active["max"] == 2
+    assert [shard["processed"] for shard in dispatcher.stats()] == [3, 3]
+    assert [shard["depth"] for shard in dispatcher.stats()] == [0, 0]
+    assert max(shard["max_depth"] for shard in dispatcher.stats()) >= 2
+
+
+async def test_partitioned_dispatcher_failures():
+    async def fail(event: DeviceReadingReceived):
+        raise ValueError(event.sequence)
+
+    dispatcher = PartitionedDispatcher(
+        MessageBus({DeviceReadingReceived: [fail]}), key=lambda event: event.device_id
+    )
+
+    with pytest.raises(RuntimeError):
+        dispatcher.submit_nowait(DeviceReadingReceived(device_id="a", sequence=0))
+
+    async with dispatcher:
+        dispatcher.submit_nowait(DeviceReadingReceived(device_id="a", sequence=0))
+
+    assert sum(shard["failed"] for shard in dispatcher.stats()) == 1
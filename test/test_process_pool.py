@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import threading
+from typing import Any
+
+import pytest
+
+from cosmic_toolkit import Event, LightweightEvent, MessageBus
+from cosmic_toolkit.process_pool import ProcessPoolRunner, WorkerError
+
+pytestmark = pytest.mark.asyncio
+
+
+class TelemetryChecked(Event):
+    device_id: str
+    message: str
+
+
+class InvalidTelemetry(Exception):
+    ...
+
+
+class DeviceError(Exception):
+    def __init__(self, device_id: str, code: int):
+        super().__init__(f"Device {device_id} failed with {code}")
+
+        self.code = code
+        self.device_id = device_id
+
+
+PARENT_PID = os.getpid()
+
+
+def _restore_error() -> InvalidTelemetry:
+    if os.getpid() == PARENT_PID:
+        raise RuntimeError("Can't be unpickled in the parent process")
+
+    return InvalidTelemetry()
+
+
+class UnreadableError(Exception):
+    def __reduce__(self):
+        return _restore_error, ()
+
+
+async def check(event: TelemetryChecked):
+    if event.message == "invalid":
+        raise InvalidTelemetry(event.device_id)
+    elif event.message == "error":
+        raise DeviceError(event.device_id, 3)
+    elif event.message == "unreadable":
+        raise UnreadableError()
+    elif event.message == "pid":
+        # Report the worker's process id to the test
+        raise InvalidTelemetry(os.getpid())
+
+
+class DeviceLocked(LightweightEvent):
+    lock: Any
+
+
+def unlock(event: DeviceLocked):
+    ...
+
+
+def create_bus() -> MessageBus:
+    return MessageBus({TelemetryChecked: [check], DeviceLocked: [unlock]})
+
+
+async def test_process_pool_runner():
+    runner = ProcessPoolRunner(create_bus, processes=2, batch_size=4)
+
+    async with runner:
+        events = [TelemetryChecked(device_id=str(i), message="ok") for i in range(9)]
+        events.append(TelemetryChecked(device_id="a", message="invalid"))
+
+        results = await runner.handle_many(events, return_exceptions=True)
+
+        with pytest.raises(WorkerError) as exc_info:
+            await runner.handle(TelemetryChecked(device_id="b", message="invalid"))
+
+    assert results[:9] == [None] * 9
+    assert isinstance(results[9], WorkerError)
+    assert isinstance(results[9].exception, InvalidTelemetry)
+    assert results[9].exception_type == "InvalidTelemetry"
+    assert "InvalidTelemetry" in results[9].traceback
+    assert exc_info.value.exception.args == ("b",)
+
+    stats = runner.stats()
+
+    assert [worker["submitted"] for worker in stats] == [6, 5]
+    assert sum(worker["failed"] for worker in stats) == 2
+    assert all(worker["pid"] != os.getpid() for worker in stats)
+    assert all(worker["pending"] == 0 for worker in stats)
+    assert 2 <= sum(worker["frames"] for worker in stats) < 11
+
+
+async def test_process_pool_runner_key_affinity():
+    runner = ProcessPoolRunner(
+        create_bus, processes=3, key=lambda event: event.device_id
+    )
+
+    async with runner:
+        events = [TelemetryChecked(device_id="a", message="pid") for _ in range(6)]
+        results = await runner.handle_many(events, return_exceptions=True)
+
+    # Every event with the same key was handled by the same worker
+    assert len({error.exception.args[0] for error in results}) == 1
+    assert sorted(worker["submitted"] for worker in runner.stats()) == [0, 0, 6]
+
+
+async def test_process_pool_runner_unpicklable_errors():
+    runner = ProcessPoolRunner(
+        create_bus, processes=1, context=multiprocessing.get_context("fork")
+    )
+
+    async with runner:
+        with pytest.raises(WorkerError) as exc_info:
+            await runner.handle(TelemetryChecked(device_id="a", message="error"))
+
+    # DeviceError can be pickled but not unpickled, so only its description is kept
+    assert exc_info.value.exception is None
+    assert exc_info.value.exception_type == "DeviceError"
+    assert exc_info.value.message == "Device a failed with 3"
+
+    runner = ProcessPoolRunner(
+        create_bus, processes=1, context=multiprocessing.get_context("fork")
+    )
+
+    async with runner:
+        # Results that fail to unpickle in this process fail the pending events
+        # rather than leave them waiting forever
+        with pytest.raises(WorkerError) as exc_info:
+            await runner.handle(TelemetryChecked(device_id="a", message="unreadable"))
+
+    assert exc_info.value.exception_type == "WorkerExited"
+
+
+async def test_process_pool_runner_unpicklable_events():
+    runner = ProcessPoolRunner(create_bus, processes=1)
+
+    async with runner:
+        # Events sent in the same frame as an event that can't be pickled, and after
+        # it, are still handled
+        results = await runner.handle_many(
+            [
+                DeviceLocked(lock=threading.Lock()),
+                TelemetryChecked(device_id="a", message="ok"),
+            ],
+            return_exceptions=True,
+        )
+        await runner.handle(TelemetryChecked(device_id="b", message="ok"))
+
+    assert isinstance(results[0], WorkerError)
+    assert results[0].exception_type == "TypeError"
+    assert results[1] is None
+    assert runner.stats()[0]["failed"] == 1
@@ -0,0 +1,81 @@
+import tracemalloc
+
+import pytest
+
+from cosmic_toolkit import Event, MessageBus
+from cosmic_toolkit.profiling import AllocationProfiler
+
+pytestmark = pytest.mark.asyncio
+
+
+class FloorScanned(Event):
+    floor: int
+
+
+class SensorsDiscovered(Event):
+    floor: int
+
+
+async def test_allocation_profiler(test_unit_of_work, test_entities):
+    uow = test_unit_of_work()
+    retained = []
+
+    async def scan_floor(event: FloorScanned, uow):
+        async with uow:
+            entity = test_entities["EntityA"].init(str(event.floor))
+            entity._add_event(SensorsDiscovered(floor=event.floor))
+            await uow.a_items.add(entity)
+
+        retained.append(bytearray(1_000_000))
+
+    def count_sensors(event: SensorsDiscovered):
+        bytearray(2_000_000)
+
+    profiler = AllocationProfiler(sample_rate=1)
+    message_bus = MessageBus(
+        {FloorScanned: [scan_floor], SensorsDiscovered: [count_sensors]}, uow=uow
+    )
+    message_bus.use(profiler)
+
+    await message_bus.handle(FloorScanned(floor=1))
+    await message_bus.handle(FloorScanned(floor=2))
+
+    report = profiler.report()
+    scan, count = report.values()
+
+    assert list(report) == [scan_floor.__qualname__, count_sensors.__qualname__]
+    assert scan["samples"] == 2
+    assert scan["aggregates"] == 2
+    assert scan["events"] == 2
+    assert scan["max_allocated"] >= 1_000_000
+    assert scan["top_sites"][0][0].startswith(__file__)
+    assert scan["top_sites"][0][1] >= 2_000_000
+
+    # Memory freed before the handler returned only shows in the peak
+    assert count["max_allocated"] < 1_000_000
+    assert count["peak"] >= 2_000_000
+
+    assert not tracemalloc.is_tracing()
+
+
+async def test_allocation_profiler_sampling():
+    def count_sensors(event: SensorsDiscovered):
+        ...
+
+    calls = iter([0.5, 0.005])
+    profiler = AllocationProfiler(sample_rate=0.01, random=lambda: next(calls))
+    message_bus = MessageBus({SensorsDiscovered: [count_sensors]})
+    message_bus.use(profiler)
+
+    await message_bus.handle(SensorsDiscovered(floor=1))
+    await message_bus.handle(SensorsDiscovered(floor=1))
+
+    assert profiler.calls == 2
+    assert profiler.report()[count_sensors.__qualname__]["samples"] == 1
+
+    profiler.reset()
+
+    assert profiler.report() == {}
+
+    with pytest.raises(ValueError):
+        AllocationProfiler(sample_rate=2)
@@ -0,0 +1,168 @@
+import pytest
+
+from cosmic_toolkit import Event, MessageBus
+from cosmic_toolkit.projections import Projection, ProjectionManager
+
+pytestmark = pytest.mark.asyncio
+
+
+class SuiteRented(Event):
+    building_id: str
+    suite_id: str
+    square_feet: int
+
+
+class SuiteVacated(Event):
+    building_id: str
+    suite_id: str
+    square_feet: int
+
+
+class SuiteInspected(Event):
+    building_id: str
+    suite_id: str
+
+
+def _create_projections() -> ProjectionManager:
+    leased = Projection("leased_square_feet")
+    suites = Projection("suites", initial=int, copy=int)
+
+    @leased.on(SuiteRented)
+    def lease(state: dict, event: SuiteRented):
+        state[event.building_id] = state.get(event.building_id, 0) + event.square_feet
+
+    @leased.on(SuiteVacated)
+    def vacate(state: dict, event: SuiteVacated):
+        state[event.building_id] -= event.square_feet
+
+    @suites.on(SuiteRented)
+    def count(state: int, event: SuiteRented) -> int:
+        return state + 1
+
+    return ProjectionManager(leased, suites)
+
+
+async def test_projections_fed_by_message_bus():
+    stored = []
+
+    async def store(event: SuiteRented):
+        stored.append(event.suite_id)
+
+    projections = _create_projections()
+    message_bus = MessageBus(projections.extend_handlers({SuiteRented: [store]}))
+
+    await message_bus.handle(SuiteRented(building_id="a", suite_id="1", square_feet=10))
+    await message_bus.handle(SuiteRented(building_id="a", suite_id="2", square_feet=5))
+
+    snapshot = projections.snapshot()
+
+    await message_bus.handle(
+        SuiteVacated(building_id="a", suite_id="1", square_feet=10)
+    )
+
+    assert stored == ["1", "2"]
+    assert projections["leased_square_feet"].state == {"a": 5}
+
+    # Snapshots aren't affected by events handled later
+    assert snapshot["leased_square_feet"].state == {"a": 15}
+    assert snapshot["leased_square_feet"].position == 2
+    assert snapshot["suites"].state == 2
+    assert projections["suites"].snapshot() is projections["suites"].snapshot()
+
+
+async def test_projections_rebuild():
+    history = [
+        SuiteRented(building_id="a", suite_id="1", square_feet=10),
+        SuiteRented(building_id="b", suite_id="2", square_feet=20),
+        SuiteVacated(building_id="a", suite_id="1", square_feet=10),
+    ]
+
+    async def stream():
+        for event in history:
+            yield event
+
+    projections = _create_projections()
+    await projections.rebuild(history[:2])
+    checkpoints = projections.snapshot()
+
+    assert checkpoints["leased_square_feet"].state == {"a": 10, "b": 20}
+
+    # Resuming from checkpoints only applies events after them
+    rebuilt = _create_projections()
+    await rebuilt.rebuild(stream(), checkpoints)
+
+    assert rebuilt["leased_square_feet"].state == {"a": 0, "b": 20}
+    assert rebuilt["suites"].state == 2
+
+    # Positions only count the events that a projection uses
+    assert rebuilt["suites"].position == 2
+    assert rebuilt["leased_square_feet"].position == 3
+
+    projection = rebuilt["leased_square_feet"]
+    await projection.rebuild(history)
+
+    assert projection.state == {"a": 0, "b": 20}
+
+
+async def test_projections_rebuild_from_live_checkpoints():
+    history = [
+        SuiteRented(building_id="a", suite_id="1", square_feet=10),
+        SuiteInspected(building_id="a", suite_id="1"),
+        SuiteRented(building_id="a", suite_id="2", square_feet=5),
+        SuiteVacated(building_id="a", suite_id="1", square_feet=10),
+    ]
+
+    def inspect(event: SuiteInspected):
+        ...
+
+    projections = _create_projections()
+    message_bus = MessageBus(projections.extend_handlers({SuiteInspected: [inspect]}))
+
+    # Projections don't see SuiteInspected events, which are in the history
+    for event in history[:3]:
+        await message_bus.handle(event)
+
+    checkpoints = projections.snapshot()
+    rebuilt = _create_projections()
+    await rebuilt.rebuild(history, checkpoints)
+
+    assert rebuilt["leased_square_feet"].state == {"a": 5}
+    assert rebuilt["suites"].state == 2
+
+    projection = rebuilt["leased_square_feet"]
+    await projection.rebuild(history, checkpoints["leased_square_feet"])
+
+    assert projection.state == {"a": 5}
+
+
+class BuildingEvent(Event):
+    building_id: str
+
+
+class BuildingOpened(BuildingEvent):
+    ...
+
+
+async def test_projections_fed_subclass_events():
+    opened = []
+    events = Projection("building_events", initial=int, copy=int)
+
+    @events.on(BuildingEvent)
+    def count(state: int, event: BuildingEvent) -> int:
+        return state + 1
+
+    async def open_building(event: BuildingOpened):
+        opened.append(event.building_id)
+
+    # BuildingOpened has handlers of its own, so MessageBus doesn't use those of
+    # BuildingEvent
+    projections = ProjectionManager(events)
+    message_bus = MessageBus(
+        projections.extend_handlers({BuildingOpened: [open_building]})
+    )
+
+    await message_bus.handle(BuildingOpened(building_id="a"))
+    await message_bus.handle(BuildingEvent(building_id="a"))
+
+    assert opened == ["a"]
+    assert projections["building_events"].state == 2
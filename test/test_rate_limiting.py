@@ -0,0 +1,91 @@
+from time import monotonic
+
+import pytest
+
+from cosmic_toolkit import Event, MessageBus
+from cosmic_toolkit.rate_limiting import DROP, SPILL, RateLimiter
+
+pytestmark = pytest.mark.asyncio
+
+
+class SignalReceived(Event):
+    message: str
+
+
+class AlarmSignalReceived(SignalReceived):
+    ...
+
+
+def _create_bus(rate_limiter: RateLimiter, handled: list) -> MessageBus:
+    async def record(event: SignalReceived):
+        handled.append(event.message)
+
+    return MessageBus({SignalReceived: [record]}, rate_limiter=rate_limiter)
+
+
+async def test_rate_limiter_drop(test_clock):
+    handled = []
+    rate_limiter = RateLimiter(clock=test_clock)
+    rate_limiter.set_limit(SignalReceived, rate=1, burst=2, policy=DROP)
+    message_bus = _create_bus(rate_limiter, handled)
+
+    for i in range(3):
+        await message_bus.handle(SignalReceived(message=str(i)))
+
+    # Subclasses are limited too, and tokens are refilled over time
+    test_clock.now = 1
+    await message_bus.handle(AlarmSignalReceived(message="3"))
+
+    assert handled == ["0", "1", "3"]
+    assert rate_limiter.get_limit(SignalReceived).dropped == 1
+    assert rate_limiter.get_limit(SignalReceived).allowed == 3
+
+    with pytest.raises(ValueError):
+        rate_limiter.set_limit(SignalReceived, rate=0.5, burst=0.5)
+
+
+async def test_rate_limiter_spill_and_adjust(test_clock):
+    handled = []
+    rate_limiter = RateLimiter(clock=test_clock, max_spilled=1)
+    rate_limiter.set_limit(SignalReceived, rate=1, policy=SPILL)
+    message_bus = _create_bus(rate_limiter, handled)
+
+    for i in range(3):
+        await message_bus.handle(SignalReceived(message=str(i)))
+
+    spilled = rate_limiter.drain_spilled()
+
+    assert handled == ["0"]
+    assert [(e.message, key) for e, key in spilled] == [("1", SignalReceived)]
+    assert rate_limiter.stats()[SignalReceived]["dropped"] == 1
+    assert rate_limiter.spilled == []
+
+    # Limits can be changed and removed at runtime
+    rate_limiter.set_limit(SignalReceived, rate=10, burst=10, policy=SPILL)
+    test_clock.now = 1
+
+    for i in range(3, 6):
+        await message_bus.handle(SignalReceived(message=str(i)))
+
+    rate_limiter.remove_limit(SignalReceived)
+    await message_bus.handle(SignalReceived(message="6"))
+
+    assert handled == ["0", "3", "4", "5", "6"]
+
+
+async def test_rate_limiter_delay_handler():
+    handled = []
+    rate_limiter = RateLimiter()
+    message_bus = _create_bus(rate_limiter, handled)
+    handler = message_bus._handlers[SignalReceived][0]
+    rate_limiter.set_limit(handler, rate=100, burst=1)
+
+    start = monotonic()
+
+    for i in range(3):
+        await message_bus.handle(SignalReceived(message=str(i)))
+
+    # Over the limit events are delayed rather than dropped
+    assert monotonic() - start >= 0.015
+    assert handled == ["0", "1", "2"]
+    assert rate_limiter.get_limit(handler).delayed == 2
@@ -0,0 +1,123 @@
+import io
+import json
+import warnings
+
+import pytest
+
+from cosmic_toolkit import Event, LightweightEvent
+from cosmic_toolkit.events import EventValidationError
+from cosmic_toolkit.registry import (
+    EventRegistry,
+    EventTypeCollisionWarning,
+    UnknownEventType,
+    event_registry,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+class SuiteLeased(Event):
+    __event_type__ = "suite.leased"
+
+    suite_id: str
+    square_feet: int
+
+
+class SuiteLeasedAgain(SuiteLeased):
+    ...
+
+
+class MeterReadingReceived(LightweightEvent):
+    device_id: str
+    value: float
+
+
+def _create_jsonl(count: int) -> str:
+    lines = []
+
+    for i in range(count):
+        lines.append(
+            json.dumps(
+                {"type": "suite.leased", "data": {"suite_id": str(i), "square_feet": i}}
+            )
+        )
+        lines.append("")
+
+    return "\n".join(lines)
+
+
+def test_event_registry():
+    # Subclasses are registered automatically, and don't inherit __event_type__
+    assert event_registry.get("suite.leased") is SuiteLeased
+    assert event_registry.get("SuiteLeasedAgain") is SuiteLeasedAgain
+    assert event_registry.get("MeterReadingReceived") is MeterReadingReceived
+
+    event = SuiteLeased(suite_id="a", square_feet=10)
+    record = event_registry.encode(event)
+
+    assert record == {
+        "type": "suite.leased",
+        "data": {"suite_id": "a", "square_feet": 10},
+    }
+    assert event_registry.decode(record) == event
+    assert event_registry.decode(record, trusted=True) == event
+
+    with pytest.raises(UnknownEventType):
+        event_registry.decode({"type": "suite.vacated", "data": {}})
+
+    # Untrusted data is validated
+    with pytest.raises(EventValidationError):
+        event_registry.decode(
+            {"type": "MeterReadingReceived", "data": {"device_id": "a", "value": "x"}}
+        )
+
+    # Types are shared with registries for other record layouts
+    flat = EventRegistry(data_key=None, types=event_registry)
+    telemetry = MeterReadingReceived(device_id="a", value=1.5)
+
+    assert flat.encode(telemetry) == {
+        "type": "MeterReadingReceived",
+        "device_id": "a",
+        "value": 1.5,
+    }
+    assert flat.decode_many([flat.encode(telemetry)], trusted=True) == [telemetry]
+
+
+def test_event_registry_last_definition_wins():
+    registry = EventRegistry()
+    registry.register(SuiteLeased)
+
+    # Registering the same class again, e.g. if its module is reloaded, is expected
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        registry.register(SuiteLeased)
+
+    with pytest.warns(EventTypeCollisionWarning, match="test_registry.SuiteLeased"):
+        registry.register(SuiteLeasedAgain, name="suite.leased")
+
+    assert registry.get("suite.leased") is SuiteLeasedAgain
+    assert list(registry) == ["suite.leased"]
+
+
+def test_event_registry_iter_jsonl():
+    batches = list(
+        event_registry.iter_jsonl(io.StringIO(_create_jsonl(5)), batch_size=2)
+    )
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[2][0] == SuiteLeased(suite_id="4", square_feet=4)
+
+
+async def test_event_registry_aiter_jsonl():
+    async def stream():
+        for line in io.BytesIO(_create_jsonl(3).encode()):
+            yield line
+
+    batches = [
+        batch
+        async for batch in event_registry.aiter_jsonl(
+            stream(), batch_size=2, trusted=True
+        )
+    ]
+
+    assert [[e.suite_id for e in batch] for batch in batches] == [["0", "1"], ["2"]]
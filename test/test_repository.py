@@ -1,6 +1,7 @@
 import pytest
 
 from cosmic_toolkit import AbstractRepository, AggregateRoot
+from cosmic_toolkit.repository import ConcurrencyError
 
 pytestmark = pytest.mark.asyncio
 
@@ -61,3 +62,62 @@ def test_abstract_repository_subclass_kwargs(test_entities):
     a_repository = ARepository()
 
     assert a_repository._init_kwargs == {"collection_name": "test"}
+
+
+class Meter(AggregateRoot):
+    def __init__(self, id: str, reading: int = 0, version: int = 0):
+        super().__init__()
+
+        self.id = id
+        self.reading = reading
+        self.version = version
+
+    def record(self, reading: int):
+        self.reading = reading
+        self._add_event(reading)
+
+
+class MeterRepository(AbstractRepository, entity_type=Meter, versioned=True):
+    def __init__(self, store: dict):
+        super().__init__()
+
+        self.store = store
+
+    async def _add(self, entity: Meter):
+        self.store[entity.id] = (entity.version, entity.reading)
+
+    async def _get(self, id: str) -> Meter:
+        version, reading = self.store[id]
+
+        return Meter(id, reading, version)
+
+    async def _update(self, entity: Meter):
+        self._check_version(entity, self.store[entity.id][0])
+        self.store[entity.id] = (entity.version, entity.reading)
+
+
+async def test_abstract_repository_versioned_update():
+    store = {}
+    repository = MeterRepository(store)
+    await repository.add(Meter("a"))
+
+    meter = await repository.get("a")
+    stale = await MeterRepository(store).get("a")
+
+    meter.record(1)
+    await repository.update(meter)
+
+    assert meter.version == 1
+    assert store["a"] == (1, 1)
+
+    stale.record(2)
+
+    with pytest.raises(ConcurrencyError) as e:
+        await repository.update(stale)
+
+    assert (e.value.expected_version, e.value.actual_version) == (0, 1)
+    assert store["a"] == (1, 1)
+
+    # The rejected change isn't published
+    assert stale.version == 0
+    assert list(stale.events) == []
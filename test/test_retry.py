@@ -0,0 +1,235 @@
+import asyncio
+from functools import partial
+
+import pytest
+
+from cosmic_toolkit import (
+    AbstractRepository,
+    AggregateRoot,
+    BaseUnitOfWork,
+    Event,
+    MessageBus,
+)
+from cosmic_toolkit.repository import ConcurrencyError
+from cosmic_toolkit.retry import DeadLetterStore, RetryPolicy, retry_on_conflict
+
+pytestmark = pytest.mark.asyncio
+
+
+class StorageUnavailable(Exception):
+    ...
+
+
+class MeasurementReceived(Event):
+    message: str
+
+
+class FlakyStorage:
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.saved = []
+
+    async def save(self, event: MeasurementReceived, log: list):
+        if self.failures:
+            self.failures -= 1
+            log.append(f"failed {event.message}")
+
+            raise StorageUnavailable()
+
+        log.append(f"saved {event.message}")
+        self.saved.append(event.message)
+
+
+async def log_telemetry(event: MeasurementReceived, log: list):
+    log.append(f"logged {event.message}")
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(base_delay=1, max_delay=3, jitter=0)
+
+    assert [policy.get_delay(attempt) for attempt in range(1, 5)] == [1, 2, 3, 3]
+    assert 0.9 <= RetryPolicy(base_delay=1, jitter=0.1).get_delay(1) <= 1.1
+
+    assert policy.should_retry(StorageUnavailable(), 2)
+    assert not policy.should_retry(StorageUnavailable(), 3)
+    assert not RetryPolicy(retry_on=(KeyError,)).should_retry(ValueError(), 1)
+
+
+async def test_message_bus_retry():
+    log = []
+    storage = FlakyStorage(failures=2)
+    message_bus = MessageBus(
+        {MeasurementReceived: [storage.save, log_telemetry]},
+        retry_policies={storage.save: RetryPolicy(base_delay=0.01, jitter=0)},
+        log=log,
+    )
+
+    await message_bus.handle(MeasurementReceived(message="a"))
+
+    # Other handlers don't wait for the retry
+    assert log == ["failed a", "logged a", "failed a", "saved a"]
+
+
+async def test_message_bus_dead_letters():
+    log = []
+    storage = FlakyStorage(failures=3)
+    dead_letters = DeadLetterStore()
+    message_bus = MessageBus(
+        {MeasurementReceived: [storage.save, log_telemetry]},
+        default_retry_policy=RetryPolicy(max_attempts=2, base_delay=0),
+        dead_letters=dead_letters,
+        log=log,
+    )
+
+    await message_bus.handle(MeasurementReceived(message="a"))
+    await message_bus.handle(MeasurementReceived(message="b"))
+
+    assert log == [
+        "failed a",
+        "logged a",
+        "failed a",
+        "failed b",
+        "logged b",
+        "saved b",
+    ]
+
+    dead_letter = list(dead_letters)[0]
+
+    assert len(dead_letters) == 1
+    assert dead_letter.event.message == "a"
+    assert dead_letter.handler == storage.save
+    assert dead_letter.attempts == 2
+    assert isinstance(dead_letter.exception, StorageUnavailable)
+
+    # Replaying only re-runs the handler that failed
+    await dead_letters.replay(message_bus)
+
+    assert log[-1] == "saved a"
+    assert storage.saved == ["b", "a"]
+    assert len(dead_letters) == 0
+
+
+async def test_message_bus_raises_without_retry_policy():
+    storage = FlakyStorage(failures=1)
+    message_bus = MessageBus({MeasurementReceived: [storage.save]}, log=[])
+
+    with pytest.raises(StorageUnavailable):
+        await message_bus.handle(MeasurementReceived(message="a"))
+
+
+class SensorInstalled(Event):
+    sensor_id: str
+
+
+class SensorActivated(Event):
+    sensor_id: str
+
+
+async def test_message_bus_retry_discards_events_of_failed_attempts(
+    test_unit_of_work, test_entities
+):
+    activated = []
+    storage = FlakyStorage(failures=1)
+
+    async def install_sensor(event: SensorInstalled, uow, log: list):
+        async with uow:
+            entity = test_entities["EntityA"].init(event.sensor_id)
+            entity._add_event(SensorActivated(sensor_id=event.sensor_id))
+            await uow.a_items.add(entity)
+
+        await storage.save(MeasurementReceived(message=event.sensor_id), log)
+
+    def count_activation(event: SensorActivated):
+        activated.append(event.sensor_id)
+
+    message_bus = MessageBus(
+        {SensorInstalled: [install_sensor], SensorActivated: [count_activation]},
+        default_retry_policy=RetryPolicy(base_delay=0),
+        uow=test_unit_of_work(),
+        log=[],
+    )
+
+    await message_bus.handle(SensorInstalled(sensor_id="s1"))
+
+    # Only the attempt that succeeded publishes its event
+    assert activated == ["s1"]
+
+
+class Visit(Event):
+    building_id: str
+
+
+class VisitCounter(AggregateRoot):
+    def __init__(self, id: str, visits: int, version: int):
+        super().__init__()
+
+        self.id = id
+        self.visits = visits
+        self.version = version
+
+
+class VisitCounterRepository(
+    AbstractRepository, entity_type=VisitCounter, versioned=True
+):
+    def __init__(self, store: dict):
+        super().__init__()
+
+        self.store = store
+
+    async def _add(self, entity: VisitCounter):
+        ...
+
+    async def _get(self, id: str) -> VisitCounter:
+        version, visits = self.store.get(id, (0, 0))
+
+        return VisitCounter(id, visits, version)
+
+    async def _update(self, entity: VisitCounter):
+        self._check_version(entity, self.store.get(entity.id, (0, 0))[0])
+        self.store[entity.id] = (entity.version, entity.visits)
+
+
+class VisitUnitOfWork(BaseUnitOfWork, counters=VisitCounterRepository):
+    async def commit(self):
+        ...
+
+    async def rollback(self):
+        ...
+
+
+async def test_retry_on_conflict():
+    store = {}
+    conflicts = []
+
+    @retry_on_conflict
+    async def count_visit(event: Visit, uow: VisitUnitOfWork):
+        async with uow:
+            counter = await uow.counters.get(event.building_id)
+            counter.visits += 1
+
+            # Let the other cascade load the same version
+            await asyncio.sleep(0.01)
+
+            try:
+                await uow.counters.update(counter)
+            except ConcurrencyError:
+                conflicts.append(counter.visits)
+                raise
+
+    message_bus = MessageBus(
+        {Visit: [count_visit]},
+        unit_of_work_factory=partial(VisitUnitOfWork, store),
+    )
+
+    await asyncio.gather(*(message_bus.handle(Visit(building_id="a")) for _ in "ab"))
+
+    # No update is lost
+    assert store["a"] == (2, 2)
+    assert conflicts == [1]
+
+    @retry_on_conflict(policy=RetryPolicy(max_attempts=1))
+    async def conflict(event: Visit):
+        raise ConcurrencyError(VisitCounter("a", 0, 0), 0, 1)
+
+    with pytest.raises(ConcurrencyError):
+        await MessageBus({Visit: [conflict]}).handle(Visit(building_id="a"))
@@ -0,0 +1,112 @@
+import asyncio
+from typing import ClassVar
+
+import pytest
+
+from cosmic_toolkit import Event, MessageBus
+from cosmic_toolkit.scheduling import AsyncEventQueue, EventScheduler
+
+pytestmark = pytest.mark.asyncio
+
+
+class ReadingsReceived(Event):
+    count: int
+
+
+class ReadingRecorded(Event):
+    number: int
+
+
+class AlarmRaised(Event):
+    priority: ClassVar[int] = 10
+
+
+def test_event_scheduler_priority_and_aging():
+    scheduler = EventScheduler(lambda e: e[1], aging=0.5)
+    scheduler.extend([("a", 0), ("b", 0), ("c", 1), ("d", 0), ("e", 5)])
+
+    # c overtakes b and d, but not a which has aged enough to stay ahead of c
+    assert [scheduler.popleft()[0] for _ in range(len(scheduler))] == [
+        "e",
+        "a",
+        "c",
+        "b",
+        "d",
+    ]
+    assert not scheduler
+
+
+async def test_async_event_queue():
+    queue = AsyncEventQueue(priority=lambda e: e[1], aging=0)
+
+    for event in [("a", 0), ("b", 5), ("c", 1)]:
+        queue.put_nowait(event)
+
+    assert "_queue=[('b', 5), ('c', 1), ('a', 0)]" in repr(queue)
+    assert [(await queue.get())[0] for _ in range(3)] == ["b", "c", "a"]
+
+    # FIFO without priority
+    queue = AsyncEventQueue()
+    queue.put_nowait(("a", 0))
+    queue.put_nowait(("b", 5))
+
+    assert (await queue.get())[0] == "a"
+
+
+async def test_message_bus_priorities(test_entities, test_unit_of_work):
+    handled = []
+
+    async def record_readings(event: ReadingsReceived, uow):
+        async with uow:
+            entity = test_entities["EntityA"].init("meter")
+
+            for number in range(event.count):
+                entity._add_event(ReadingRecorded(number=number))
+
+            entity._add_event(AlarmRaised())
+
+            await uow.a_items.add(entity)
+            await uow.commit()
+
+    async def record(event):
+        handled.append(event)
+
+    message_bus = MessageBus(
+        {
+            ReadingsReceived: [record_readings],
+            ReadingRecorded: [record],
+            AlarmRaised: [record],
+        },
+        priorities={ReadingRecorded: -1},
+        uow=test_unit_of_work(),
+    )
+
+    await message_bus.handle(ReadingsReceived(count=3))
+
+    # The alarm is handled before bulk events that were raised before it
+    assert isinstance(handled[0], AlarmRaised)
+    assert [e.number for e in handled[1:]] == [0, 1, 2]
+
+
+async def test_message_bus_run():
+    handled = []
+
+    async def record(event):
+        handled.append(event)
+
+    message_bus = MessageBus(
+        {ReadingRecorded: [record], AlarmRaised: [record]}, priorities={}
+    )
+    queue = message_bus.create_queue()
+
+    for number in range(3):
+        queue.put_nowait(ReadingRecorded(number=number))
+
+    queue.put_nowait(AlarmRaised())
+
+    worker = asyncio.ensure_future(message_bus.run(queue))
+    await queue.join()
+    worker.cancel()
+
+    assert isinstance(handled[0], AlarmRaised)
+    assert len(handled) == 4
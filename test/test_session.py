@@ -0,0 +1,96 @@
+import asyncio
+from itertools import count
+
+import pytest
+
+from cosmic_toolkit import SessionPool
+from cosmic_toolkit.session import SessionPoolTimeout
+
+pytestmark = pytest.mark.asyncio
+
+
+class Connection:
+    _ids = count()
+
+    def __init__(self):
+        self.id = next(self._ids)
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+async def test_session_pool_reuses_sessions():
+    pool = SessionPool(Connection, max_size=2)
+
+    session_a = await pool.acquire()
+    await pool.release(session_a)
+    session_b = await pool.acquire()
+
+    assert session_a is session_b
+    assert pool.metrics.created == 1
+    assert pool.metrics.acquired == 2
+    assert pool.in_use == 1
+
+
+async def test_session_pool_acquire_timeout():
+    pool = SessionPool(Connection, max_size=1, acquire_timeout=0.01)
+    session = await pool.acquire()
+
+    with pytest.raises(SessionPoolTimeout):
+        await pool.acquire()
+
+    assert pool.metrics.timeouts == 1
+    assert pool.metrics.waits == 1
+    assert pool.metrics.max_wait_time > 0
+
+    # A waiter gets the session as soon as it's released
+    waiter = asyncio.ensure_future(pool.acquire(timeout=1))
+    await asyncio.sleep(0)
+    await pool.release(session)
+
+    assert await waiter is session
+    assert pool.size == 1
+
+
+async def test_session_pool_close():
+    pool = SessionPool(Connection, close=lambda c: c.close(), max_size=2)
+    session_a = await pool.acquire()
+    session_b = await pool.acquire()
+    await pool.release(session_a)
+
+    await pool.close()
+
+    assert session_a.closed
+    assert not session_b.closed
+
+    await pool.release(session_b)
+
+    assert session_b.closed
+
+    with pytest.raises(RuntimeError):
+        await pool.acquire()
+
+
+async def test_unit_of_work_shares_session(test_unit_of_work):
+    pool = SessionPool(Connection, max_size=1)
+    uow = test_unit_of_work(session_provider=pool)
+
+    async with uow:
+        session = uow.session
+
+        assert isinstance(session, Connection)
+        assert uow.a_items.session is session
+        assert uow.b_items.session is session
+
+        # Nested usage doesn't lease another session
+        async with uow:
+            assert uow.session is session
+
+        assert pool.in_use == 1
+
+    # Session is returned to the pool on exit
+    assert uow.session is None
+    assert uow.a_items.session is None
+    assert pool.in_use == 0
+    assert pool.idle == 1
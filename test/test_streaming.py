@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+
+from cosmic_toolkit import Event, MessageBus
+from cosmic_toolkit.streaming import tail_file
+
+pytestmark = pytest.mark.asyncio
+
+
+class ReadingStreamed(Event):
+    sequence: int
+
+
+async def test_consume_checkpoints_after_cascades_complete():
+    checkpoints = []
+    handled = []
+    pulled = []
+
+    async def handle_reading(event: ReadingStreamed):
+        # Earlier events take longer, so they complete out of order
+        await asyncio.sleep((10 - event.sequence) * 0.001)
+        handled.append(event.sequence)
+
+    async def stream():
+        for i in range(1, 10):
+            pulled.append(i)
+            # Only one event is pulled ahead while max_in_flight are in flight
+            assert i - len(handled) <= 4
+            yield ReadingStreamed(sequence=i)
+
+    message_bus = MessageBus({ReadingStreamed: [handle_reading]})
+    stats = await message_bus.consume(
+        stream(), batch_size=2, max_in_flight=3, on_checkpoint=checkpoints.append
+    )
+
+    assert handled != sorted(handled)
+    assert sorted(handled) == pulled
+    assert checkpoints == sorted(checkpoints)
+    assert checkpoints[-1] == 9
+    assert stats.dict()["max_in_flight"] == 3
+    assert stats.consumed == stats.handled == 9
+    assert stats.throughput > 0
+
+
+async def test_consume_resumes_from_checkpoint():
+    handled = []
+    checkpoints = []
+
+    async def handle_reading(event: ReadingStreamed):
+        if event.sequence == 4:
+            raise ValueError()
+
+        handled.append(event.sequence)
+
+    async def save(offset: int):
+        checkpoints.append(offset)
+
+    message_bus = MessageBus({ReadingStreamed: [handle_reading]})
+    events = [ReadingStreamed(sequence=i) for i in range(1, 6)]
+    stats = await message_bus.consume(events, on_checkpoint=save, start_offset=2)
+
+    # Failed events are logged and hold back the checkpoint, so that they're handled
+    # again when resuming
+    assert handled == [3, 5]
+    assert checkpoints == [3]
+    assert (stats.consumed, stats.failed, stats.checkpoint) == (3, 1, 3)
+
+    stats = await message_bus.consume(
+        events, on_checkpoint=save, start_offset=3, skip_failed=True
+    )
+
+    assert handled == [3, 5, 5]
+    assert checkpoints == [3, 5]
+    assert (stats.consumed, stats.failed, stats.checkpoint) == (2, 1, 5)
+
+    # Also when events after the failed one complete first
+    stats = await message_bus.consume(events, max_in_flight=3)
+
+    assert (stats.failed, stats.checkpoint) == (1, 3)
+
+    with pytest.raises(ValueError):
+        await message_bus.consume([], max_in_flight=0)
+
+
+async def test_tail_file(tmp_path):
+    path = tmp_path / "events.jsonl"
+    record = {"type": "ReadingStreamed", "data": {"sequence": 1}}
+    line = json.dumps(record).encode()
+    path.write_bytes(line + b"\n\n" + line)
+
+    events = [event async for event in tail_file(str(path), follow=False)]
+
+    assert events == [ReadingStreamed(sequence=1)] * 2
+
+    # Following holds back the partial line until it's complete
+    path.write_bytes(line + b"\n" + line[:10])
+    received = []
+
+    async def follow():
+        async for event in tail_file(str(path), poll_interval=0.001):
+            received.append(event)
+
+    task = asyncio.ensure_future(follow())
+    await asyncio.sleep(0.01)
+
+    assert len(received) == 1
+
+    with open(path, "ab") as file:
+        file.write(line[10:] + b"\n")
+
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    assert received == [ReadingStreamed(sequence=1)] * 2
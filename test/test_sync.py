@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cosmic_toolkit import Event, MessageBus
+from cosmic_toolkit.sync import SyncRunner
+
+
+class SampleReceived(Event):
+    value: int
+
+
+def _create_bus(handled: list) -> MessageBus:
+    # Handlers can be plain functions
+    def store(event: SampleReceived, factor: int):
+        handled.append(event.value * factor)
+
+    async def check(event: SampleReceived):
+        if event.value < 0:
+            raise ValueError(event.value)
+
+    return MessageBus({SampleReceived: [store, check]}, factor=2)
+
+
+def test_sync_runner():
+    handled = []
+
+    with SyncRunner(_create_bus(handled)) as runner:
+        runner.handle(SampleReceived(value=1))
+        runner.handle(SampleReceived(value=1), factor=3)
+        runner.handle_many([SampleReceived(value=2), SampleReceived(value=3)])
+
+        with pytest.raises(ValueError):
+            runner.handle(SampleReceived(value=-1))
+
+    assert handled == [2, 3, 4, 6, -2]
+    assert runner.loop.is_closed()
+
+    with pytest.raises(RuntimeError):
+        runner.handle(SampleReceived(value=1))
+
+
+def test_sync_runner_background():
+    handled = []
+
+    with SyncRunner(_create_bus(handled), background=True) as runner:
+        with ThreadPoolExecutor(4) as executor:
+            list(
+                executor.map(
+                    lambda value: runner.handle(SampleReceived(value=value)),
+                    range(100),
+                )
+            )
+
+    assert sorted(handled) == [value * 2 for value in range(100)]
@@ -0,0 +1,208 @@
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from cosmic_toolkit import Event, MessageBus
+from cosmic_toolkit.retry import RetryPolicy
+from cosmic_toolkit.transport import (
+    EventCodec,
+    InMemoryTransport,
+    TransportError,
+    UnixSocketTransport,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+class TelemetryPublished(Event):
+    device_id: str
+    value: Decimal
+    received_at: datetime
+
+
+class TelemetryArchived(Event):
+    device_id: str
+
+
+def _create_events(count: int):
+    return [
+        TelemetryPublished(
+            device_id=str(i), value=Decimal("1.5"), received_at=datetime(2022, 1, 1)
+        )
+        for i in range(count)
+    ]
+
+
+def test_event_codec():
+    codec = EventCodec([TelemetryPublished, TelemetryArchived])
+    events = _create_events(2) + [TelemetryArchived(device_id="a")]
+
+    assert codec.decode(codec.encode(events)) == events
+
+    with pytest.raises(TransportError):
+        EventCodec([TelemetryArchived]).decode(codec.encode(events))
+
+
+async def test_in_memory_transport():
+    transport = InMemoryTransport(codec=EventCodec([TelemetryPublished]))
+    events = _create_events(5)
+
+    await transport.publish(events)
+
+    batches = transport.subscribe(batch_size=2)
+    batch = await batches.__anext__()
+
+    assert batch.events == events[:2]
+
+    # Rejected batches are delivered again
+    batch.nack()
+    batch = await batches.__anext__()
+
+    assert batch.events == events[:2]
+    assert batch.deliveries == 2
+
+    batch.ack()
+
+    with pytest.raises(TransportError):
+        batch.nack()
+
+    # With a prefetch of 1, the next batch waits for the previous one to be settled
+    batch = await batches.__anext__()
+    next_batch = asyncio.ensure_future(batches.__anext__())
+    await asyncio.sleep(0)
+
+    assert not next_batch.done()
+
+    batch.ack()
+    (await next_batch).ack()
+
+    assert (await next_batch).events == events[4:]
+    assert (transport.acked, transport.nacked, transport.pending) == (3, 1, 0)
+
+
+async def test_message_bus_run_transport():
+    handled = []
+    transport = InMemoryTransport()
+    forward = transport.create_handler()
+
+    async def store(event: TelemetryPublished):
+        handled.append(event.device_id)
+
+        if handled == ["0", "1"]:
+            raise ValueError()
+
+    # Events are forwarded to the transport by a handler and handled by another bus
+    publisher = MessageBus({TelemetryPublished: [forward]})
+    subscriber = MessageBus({TelemetryPublished: [store]})
+
+    for event in _create_events(3):
+        await publisher.handle(event)
+
+    task = asyncio.ensure_future(subscriber.run_transport(transport, batch_size=2))
+
+    while transport.acked < 2:
+        await asyncio.sleep(0)
+
+    task.cancel()
+
+    # The batch with a failure is delivered again
+    assert handled == ["0", "1", "0", "1", "2"]
+    assert (transport.acked, transport.nacked, transport.pending) == (2, 1, 0)
+
+
+async def test_message_bus_run_transport_gives_up_on_failing_events():
+    handled = []
+    transport = InMemoryTransport()
+
+    async def store(event: TelemetryPublished):
+        handled.append(event.device_id)
+
+        raise ValueError()
+
+    subscriber = MessageBus({TelemetryPublished: [store]})
+    policy = RetryPolicy(max_attempts=3, base_delay=0)
+    task = asyncio.ensure_future(
+        subscriber.run_transport(transport, redelivery_policy=policy)
+    )
+
+    await transport.publish(_create_events(1))
+
+    # Redeliveries don't keep the event loop busy
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    assert handled == ["0", "0", "0"]
+    assert (transport.acked, transport.nacked, transport.pending) == (1, 2, 0)
+
+
+async def test_unix_socket_transport(tmp_path):
+    path = str(tmp_path / "events.sock")
+    codec = EventCodec([TelemetryPublished])
+    subscriber = UnixSocketTransport(path, codec, prefetch=2)
+    publisher = UnixSocketTransport(path, codec, max_batch_size=4)
+    events = _create_events(10)
+    received = []
+    deliveries = []
+
+    await subscriber.listen()
+
+    async def consume():
+        nacked = False
+
+        async for batch in subscriber.subscribe(batch_size=4):
+            deliveries.append(batch.deliveries)
+
+            # Reject the first batch to have its frame sent again. Batches are the
+            # same size as frames here, otherwise every batch in the frame is resent
+            if not nacked:
+                nacked = True
+                batch.nack()
+            else:
+                received.extend(batch.events)
+                batch.ack()
+
+    task = asyncio.ensure_future(consume())
+
+    await publisher.publish(events[:6])
+    await publisher.publish(events[6:])
+    await publisher.flush()
+
+    task.cancel()
+    await publisher.close()
+    await subscriber.close()
+
+    assert sorted(received, key=lambda e: int(e.device_id)) == events
+    assert publisher.frames_sent == 4
+    assert publisher.frames_acked == 3
+    assert publisher.frames_resent == 1
+    assert (subscriber.acked, subscriber.nacked) == (3, 1)
+    assert sorted(deliveries) == [1, 1, 1, 2]
+
+
+async def test_unix_socket_transport_prefetch(tmp_path):
+    path = str(tmp_path / "events.sock")
+    codec = EventCodec([TelemetryPublished])
+    subscriber = UnixSocketTransport(path, codec, prefetch=1)
+    publisher = UnixSocketTransport(path, codec, max_batch_size=4)
+
+    await subscriber.listen()
+    await publisher.publish(_create_events(6))
+
+    batches = subscriber.subscribe(batch_size=2)
+    batch = await batches.__anext__()
+    next_batch = asyncio.ensure_future(batches.__anext__())
+    await asyncio.sleep(0.01)
+
+    # Batches of a frame that's already received wait for unacknowledged batches
+    assert not next_batch.done()
+
+    batch.ack()
+    (await next_batch).ack()
+    (await batches.__anext__()).ack()
+
+    await publisher.close()
+    await subscriber.close()
+
+    assert publisher.frames_acked == 2
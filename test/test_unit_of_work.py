@@ -1,6 +1,8 @@
+import gc
+
 import pytest
 
-from cosmic_toolkit import AbstractRepository
+from cosmic_toolkit import AbstractRepository, UnitOfWorkPool
 
 pytestmark = pytest.mark.asyncio
 
@@ -58,3 +60,113 @@ async def test_base_unit_of_work_collect_new_events(
 
     # Events should be cleared out
     assert len(list(uow.collect_new_events())) == 0
+
+
+async def test_base_unit_of_work_lazy_repositories(test_unit_of_work):
+    uow = test_unit_of_work()
+
+    async with uow:
+        uow.a_items
+
+        # Only the repository that was accessed is instantiated
+        assert list(uow._repositories.keys()) == ["a_items"]
+        assert uow.a_items is uow.a_items
+
+
+async def test_base_unit_of_work_reset(test_entities, test_events, test_unit_of_work):
+    uow = test_unit_of_work()
+
+    async with uow:
+        entity_a = test_entities["EntityA"].init("hello")
+        entity_a._add_event(test_events["ATriggered"]())
+
+        await uow.a_items.add(entity_a)
+
+        repository = uow.a_items
+
+    uow.reset()
+
+    # Repositories are kept but identity state is cleared
+    assert uow.a_items is repository
+    assert len(uow.a_items.seen) == 0
+    assert len(list(uow.collect_new_events())) == 0
+
+    async with uow:
+        with pytest.raises(RuntimeError):
+            uow.reset()
+
+
+async def test_unit_of_work_pool(test_entities, test_unit_of_work):
+    pool = UnitOfWorkPool(test_unit_of_work, max_size=1)
+    uow = pool.acquire()
+
+    async with uow:
+        await uow.a_items.add(test_entities["EntityA"].init("hello"))
+
+    pool.release(uow)
+    recycled = pool.acquire()
+
+    assert recycled is uow
+    assert len(recycled.a_items.seen) == 0
+
+    # Pool only keeps max_size idle units of work
+    pool.release(recycled)
+    pool.release(test_unit_of_work())
+
+    assert pool.idle == 1
+
+
+async def test_base_unit_of_work_releases_aggregates(
+    test_entities, test_events, test_unit_of_work
+):
+    uow = test_unit_of_work()
+
+    async with uow:
+        entity_a = test_entities["EntityA"].init("hello")
+        entity_a._add_event(test_events["ATriggered"]())
+
+        await uow.a_items.add(entity_a)
+        await uow.a_items.add(test_entities["EntityA"].init("world"))
+
+        assert uow.memory_report()["a_items"]["tracked"] == 2
+
+    # Aggregates are released on exit but their events are kept
+    assert uow.memory_report() == {
+        "a_items": {"tracked": 0, "pending_events": 1, "weak": False}
+    }
+    assert [e.__class__ for e in uow.collect_new_events()] == [
+        test_events["ATriggered"]
+    ]
+    assert uow.memory_report()["a_items"]["pending_events"] == 0
+
+
+async def test_base_unit_of_work_weak_tracking(
+    test_entities, test_events, test_unit_of_work
+):
+    uow = test_unit_of_work(weak_tracking=True)
+
+    async with uow:
+        entity_a = test_entities["EntityA"].init("hello")
+        entity_a._add_event(test_events["ATriggered"]())
+        entity_b = test_entities["EntityA"].init("world")
+
+        await uow.a_items.add(entity_a)
+        await uow.a_items.add(entity_b)
+        await uow.a_items.update(entity_a)
+
+        # Aggregates that are garbage collected aren't tracked but their events are
+        # kept
+        del entity_a
+        gc.collect()
+
+        assert uow.memory_report()["a_items"] == {
+            "tracked": 1,
+            "pending_events": 1,
+            "weak": True,
+        }
+        assert len(list(uow.collect_new_events())) == 1
+
+        del entity_b
+        gc.collect()
+
+        assert uow.memory_report()["a_items"]["tracked"] == 0